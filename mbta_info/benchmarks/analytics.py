@@ -0,0 +1,124 @@
+"""
+Benchmark headway and frequency analytics at full-feed scale.
+
+By default departures are generated in memory at roughly the size of a full
+MBTA weekday and the NumPy group-by implementation is timed against a plain
+Python reference, checking that both agree. With --service-date the departures
+are instead read from the configured database, timing the bulk fetch too.
+
+Run from mbta_info/:
+    python -m benchmarks.analytics [--trips N] [--service-date YYYYMMDD]
+"""
+import argparse
+import datetime
+import time
+import typing
+
+import numpy as np
+
+from flaskr import analytics
+
+
+def synthetic_departures(
+    trip_count: int, stops_per_trip: int, route_count: int, stop_count: int, seed: int
+) -> analytics.DepartureColumns:
+    """Trips of evenly sized routes running between 05:00 and 25:00 over random stops"""
+    rng = np.random.RandomState(seed)
+    trip_route_codes = rng.randint(0, route_count * 2, trip_count)
+    trip_starts = rng.randint(5 * 3600, 25 * 3600, trip_count)
+    run_times = rng.randint(60, 300, (trip_count, stops_per_trip)).cumsum(axis=1)
+
+    return analytics.DepartureColumns(
+        [f"trip{i}" for i in range(trip_count)],
+        trip_route_codes,
+        [(f"route{i // 2}", i % 2) for i in range(route_count * 2)],
+        [f"stop{i}" for i in range(stop_count)],
+        np.repeat(np.arange(trip_count), stops_per_trip),
+        rng.randint(0, stop_count, trip_count * stops_per_trip),
+        (trip_starts[:, None] + run_times - run_times[:, :1]).ravel(),
+    )
+
+
+def reference_stop_medians(
+    departures: analytics.DepartureColumns,
+) -> typing.Dict[str, typing.Optional[float]]:
+    """Median headway at each stop computed one departure at a time"""
+    stop_times = {}  # type: typing.Dict[str, typing.List[int]]
+    for stop_code, departure_time in zip(
+        departures.stop_codes.tolist(), departures.departure_times.tolist()
+    ):
+        stop_times.setdefault(departures.stop_ids[stop_code], []).append(departure_time)
+
+    medians = {}
+    for stop_id, times in stop_times.items():
+        times.sort()
+        headways = [later - earlier for earlier, later in zip(times, times[1:])]
+        medians[stop_id] = float(np.median(headways)) if headways else None
+    return medians
+
+
+def timed(label: str, function: typing.Callable, *args) -> typing.Any:
+    start = time.perf_counter()
+    result = function(*args)
+    print(f"{label}: {time.perf_counter() - start:.3f}s")
+    return result
+
+
+def run_synthetic(args: argparse.Namespace):
+    departures = timed(
+        "Generate departures",
+        synthetic_departures,
+        args.trips,
+        args.stops_per_trip,
+        args.routes,
+        args.stops,
+        args.seed,
+    )
+    print(
+        f"{len(departures)} departures, {len(departures.trip_ids)} trips, "
+        f"{len(departures.route_keys)} route directions, {len(departures.stop_ids)} stops"
+    )
+    timed("Route frequencies", departures.route_frequencies)
+    stop_stats = timed("Stop frequencies", departures.stop_frequencies)
+    reference = timed(
+        "Stop medians, Python reference", reference_stop_medians, departures
+    )
+
+    for stop_id, median in reference.items():
+        summary = stop_stats.summary(stop_id)
+        assert summary["headway_percentiles"][50] == median, stop_id
+    print("NumPy and reference medians agree")
+
+
+def run_database(args: argparse.Namespace):
+    from flaskr import create_app
+
+    service_date = datetime.datetime.strptime(args.service_date, "%Y%m%d").date()
+    with create_app().app_context():
+        departures = timed(
+            "Fetch departures", analytics.DepartureColumns.fetch, service_date
+        )
+        print(f"{len(departures)} departures on {service_date}")
+        timed("Route frequencies", departures.route_frequencies)
+        timed("Stop frequencies", departures.stop_frequencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--trips", type=int, default=20000)
+    parser.add_argument("--stops-per-trip", type=int, default=30)
+    parser.add_argument("--routes", type=int, default=200)
+    parser.add_argument("--stops", type=int, default=8000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--service-date", help="Benchmark the loaded feed on this date (YYYYMMDD)"
+    )
+    args = parser.parse_args()
+    if args.service_date:
+        run_database(args)
+    else:
+        run_synthetic(args)
+
+
+if __name__ == "__main__":
+    main()
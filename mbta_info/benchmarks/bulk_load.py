@@ -0,0 +1,77 @@
+"""
+Compare loading the tables loaded in place with their indexes and foreign keys
+maintained row by row and in bulk load mode (see flaskr.tools.indexes).
+
+Loads a synthetic feed into the configured database twice, wiping it before
+each load, so it requires --reset-database. Prints each table's load time
+both ways, including the rebuild of its indexes and foreign keys in bulk load
+mode, and the time saved. From mbta_info/:
+    FLASK_ENV=development python -m benchmarks.bulk_load --reset-database [--multiple 0.1]
+"""
+import argparse
+import pathlib
+import tempfile
+import time
+import typing
+
+
+def load_tables(bulk_load: bool, index_workers: int) -> typing.Dict[str, float]:
+    """Load every table into a wiped database, returning seconds taken per table loaded in place"""
+    from flaskr import model_utils
+    from flaskr.database import db
+    from flaskr.tools.indexes import BulkLoad
+    from flaskr.tools.loader import Loader
+
+    db.drop_all()
+    loader = Loader(db)
+    loader.bulk_load = BulkLoad(bulk_load, index_workers)
+    seconds = {}
+    for table_name in loader.table_names:
+        start = time.perf_counter()
+        loader.load_table(table_name)
+        table = loader.get_model_for_table(table_name).__table__
+        if not model_utils.is_partitioned_table(table):
+            seconds[table_name] = time.perf_counter() - start
+    db.session.close()
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reset-database", action="store_true", required=True)
+    parser.add_argument("--multiple", type=float, default=0.1, help="of MBTA size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--index-workers", type=int, default=2)
+    args = parser.parse_args()
+
+    from flask import g
+
+    from flaskr import create_app, set_g
+    from flaskr.tools.synthetic_feed import FeedScale, SyntheticFeed
+
+    with tempfile.TemporaryDirectory() as feed_dir, create_app().app_context():
+        set_g()
+        files = g.config["mbta_data"]["files"]
+        SyntheticFeed(FeedScale.mbta(args.multiple), args.seed).write(
+            pathlib.Path(feed_dir), files
+        )
+        g.config["mbta_data"]["path"] = feed_dir
+
+        by_row = load_tables(False, args.index_workers)
+        bulk = load_tables(True, args.index_workers)
+
+    print(f"{'table':>18} {'by row':>9} {'bulk':>9} {'saved':>9}")
+    for table_name, row_seconds in by_row.items():
+        saved = row_seconds - bulk[table_name]
+        print(
+            f"{table_name:>18} {row_seconds:>8.2f}s {bulk[table_name]:>8.2f}s "
+            f"{saved:>8.2f}s"
+        )
+    total_saved = sum(by_row.values()) - sum(bulk.values())
+    print(
+        f"{'total':>18} {sum(by_row.values()):>8.2f}s {sum(bulk.values()):>8.2f}s {total_saved:>8.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
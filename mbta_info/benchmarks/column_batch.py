@@ -0,0 +1,119 @@
+"""
+Compare converting stop_times.txt and shapes.txt a row at a time with their
+schemas and a block at a time with flaskr.tools.column_batch.
+
+Loads a synthetic feed's other tables into the configured database, which it
+wipes first, so it requires --reset-database. Both ways convert every row of
+the two files to staging table rows without inserting them, and the results
+are checked to be identical. From mbta_info/:
+    FLASK_ENV=development python -m benchmarks.column_batch --reset-database [--multiple 0.1]
+"""
+import argparse
+import csv
+import itertools
+import pathlib
+import sys
+import tempfile
+import time
+import typing
+
+TABLE_NAMES = ("stop_time", "shape")
+
+
+def convert_rows(
+    loader, table_name: str
+) -> typing.Tuple[typing.List[typing.Dict], float]:
+    """Stage every row of table_name's file through its schema, returning the rows and seconds taken"""
+    model = loader.get_model_for_table(table_name)
+    model_schema = loader.get_schema_for_table(table_name)
+    loader.staging_table = model.__table__  # Only its column names are read
+    loader.staged_rows = []
+    with open(loader.get_data_file_path(table_name), "r") as f_in:
+        start = time.perf_counter()
+        for data_row in csv.DictReader(f_in):
+            loader.stage_object(model_schema, data_row)
+        elapsed = time.perf_counter() - start
+    staged_rows, loader.staged_rows = loader.staged_rows, []
+    loader.db.session.rollback()
+    return staged_rows, elapsed
+
+
+def convert_blocks(
+    loader, table_name: str
+) -> typing.Tuple[typing.List[typing.Dict], float]:
+    """Convert every row of table_name's file in column batches, returning the rows and seconds taken"""
+    from flaskr.tools import column_batch
+
+    model = loader.get_model_for_table(table_name)
+    model_schema = loader.get_schema_for_table(table_name)
+    loader.staging_table = model.__table__
+    transform = column_batch.transform_for_model(model)
+    staged_rows = []
+    with open(loader.get_data_file_path(table_name), "r") as f_in:
+        start = time.perf_counter()
+        transform.prepare(loader.db)
+        reader = csv.reader(f_in)
+        header = next(reader)
+        while True:
+            block = list(itertools.islice(reader, column_batch.BLOCK_ROWS))
+            if not block:
+                break
+            staged_rows.extend(transform.transform(header, block))
+        elapsed = time.perf_counter() - start
+    fallbacks = sum(staged_row is None for staged_row in staged_rows)
+    if fallbacks:
+        print(f"{fallbacks} {table_name} rows would be loaded by their schema")
+    for staged_row in staged_rows:
+        if staged_row is not None:
+            staged_row["feed_version"] = loader.feed_version
+    return staged_rows, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reset-database", action="store_true", required=True)
+    parser.add_argument("--multiple", type=float, default=0.1, help="of MBTA size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from flask import g
+
+    from flaskr import create_app, set_g
+    from flaskr.database import db
+    from flaskr.tools.loader import Loader
+    from flaskr.tools.synthetic_feed import FeedScale, SyntheticFeed
+
+    mismatched = False
+    with tempfile.TemporaryDirectory() as feed_dir, create_app().app_context():
+        set_g()
+        files = g.config["mbta_data"]["files"]
+        SyntheticFeed(FeedScale.mbta(args.multiple), args.seed).write(
+            pathlib.Path(feed_dir), files
+        )
+        g.config["mbta_data"]["path"] = feed_dir
+
+        db.drop_all()
+        loader = Loader(db)
+        for table_name in loader.table_names:
+            if table_name not in TABLE_NAMES:
+                loader.load_table(table_name)
+        loader.get_feed_version()
+
+        for table_name in TABLE_NAMES:
+            row_results, row_seconds = convert_rows(loader, table_name)
+            block_results, block_seconds = convert_blocks(loader, table_name)
+            rows = len(row_results)
+            print(
+                f"{table_name:>10}: {rows} rows, by row {rows / row_seconds:>10.0f} rows/s, "
+                f"by column batch {rows / block_seconds:>10.0f} rows/s "
+                f"({row_seconds / block_seconds:.1f}x)"
+            )
+            if block_results != row_results:
+                print(f"{table_name}: column batch rows differ from the schema's")
+                mismatched = True
+        db.session.close()
+    sys.exit(1 if mismatched else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark the import time of the modules every process starts by importing.
+
+Each module is imported in a fresh interpreter with -X importtime, several
+times over, and the median cumulative import time is reported together with
+the imports that contributed the most self time. With --budget MODULE=MS the
+run exits non-zero when a module's median exceeds its budget.
+
+Run from mbta_info/:
+    python -m benchmarks.import_time [--repeat N] [--top N] [--budget flaskr.models=150]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import typing
+
+MODULES = (
+    "flaskr",
+    "flaskr.models",
+    "flaskr.schemas",
+    "flaskr.mbta_celery.app",
+    "flaskr.mbta_celery.tasks",
+)
+
+
+class ImportTiming:
+    """One -X importtime report: microseconds per imported module"""
+
+    def __init__(self, module: str, report: str):
+        self.module = module
+        self.self_us = {}  # type: typing.Dict[str, int]
+        self.cumulative_us = {}  # type: typing.Dict[str, int]
+        for line in report.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:") :].split("|")
+            if not self_us.strip().isdigit():
+                continue  # Column headers
+            name = name.strip()
+            self.self_us[name] = int(self_us)
+            self.cumulative_us[name] = int(cumulative_us)
+
+    @property
+    def total_ms(self) -> float:
+        return self.cumulative_us[self.module] / 1000
+
+    def slowest(self, count: int) -> typing.List[typing.Tuple[str, float]]:
+        """The imports with the most self time, in milliseconds"""
+        ranked = sorted(self.self_us.items(), key=lambda item: item[1], reverse=True)
+        return [(name, self_us / 1000) for name, self_us in ranked[:count]]
+
+
+def time_import(module: str) -> ImportTiming:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"),
+        check=True,
+    )
+    return ImportTiming(module, result.stderr)
+
+
+def parse_budgets(budgets: typing.Iterable[str]) -> typing.Dict[str, float]:
+    parsed = {}
+    for budget in budgets:
+        module, _, milliseconds = budget.partition("=")
+        parsed[module] = float(milliseconds)
+    return parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS")
+    args = parser.parse_args()
+    budgets = parse_budgets(args.budget)
+
+    over_budget = []
+    for module in args.modules:
+        time_import(module)  # Warm the bytecode and file system caches
+        timings = [time_import(module) for _ in range(args.repeat)]
+        median_ms = statistics.median(timing.total_ms for timing in timings)
+        print(f"{module}: median {median_ms:.1f}ms over {args.repeat} runs")
+        for name, self_ms in timings[-1].slowest(args.top):
+            print(f"    {self_ms:8.1f}ms  {name}")
+        if module in budgets and median_ms > budgets[module]:
+            over_budget.append(module)
+            print(f"    over budget of {budgets[module]:.1f}ms")
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
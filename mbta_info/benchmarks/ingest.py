@@ -0,0 +1,236 @@
+"""
+Benchmark the ingest pipeline against a local Postgres and compare with a baseline.
+
+`run` generates a synthetic feed, loads it table by table with the Loader into
+the configured database, then re-parses a sample of each table's rows with its
+schema. Per table it records load throughput, peak traced memory during the
+load (from a second, traced load), the cost of a schema load per row and of
+each StringForeignKey field's validation per call. `compare` flags any figure
+that got worse than a baseline by more than a threshold, exiting 1 if any did.
+
+The run drops and recreates every table of the configured database, so it
+requires --reset-database. From mbta_info/:
+    FLASK_ENV=development python -m benchmarks.ingest run --reset-database [--multiple 0.1]
+        [--output results.json] [--save-baseline]
+    python -m benchmarks.ingest compare [--baseline benchmarks/baselines/ingest.json]
+        results.json [--threshold 0.15]
+"""
+import argparse
+import csv
+import datetime
+import itertools
+import json
+import pathlib
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import typing
+
+BASELINE_PATH = pathlib.Path(__file__).absolute().parent / "baselines" / "ingest.json"
+# Figures where a larger value is a regression, and those where a smaller one is
+HIGHER_IS_WORSE = (
+    "load_seconds",
+    "peak_memory_bytes",
+    "schema_load_us_per_row",
+    "foreign_key_us_per_call",
+)
+LOWER_IS_WORSE = ("rows_per_second",)
+
+
+def load_tables(loader, traced: bool) -> typing.Dict[str, typing.Dict[str, float]]:
+    """Load every table, timing each one or tracing its peak memory use"""
+    results = {}
+    for table_name in loader.table_names:
+        if traced:
+            tracemalloc.start()
+        start = time.perf_counter()
+        rows = loader.load_table(table_name)
+        elapsed = time.perf_counter() - start
+        if traced:
+            results[table_name] = {
+                "peak_memory_bytes": tracemalloc.get_traced_memory()[1]
+            }
+            tracemalloc.stop()
+        else:
+            results[table_name] = {
+                "rows": rows,
+                "load_seconds": round(elapsed, 4),
+                "rows_per_second": round(rows / elapsed, 1) if elapsed else 0.0,
+            }
+    return results
+
+
+def schema_costs(
+    loader, table_name: str, sample_size: int
+) -> typing.Dict[str, typing.Any]:
+    """Time the schema load of a sample of table_name's rows, and each of its
+    StringForeignKey fields' validation, against the loaded database"""
+    from flaskr.fields.foreign_key import StringForeignKey
+
+    with open(loader.get_data_file_path(table_name), "r") as f_in:
+        rows = list(itertools.islice(csv.DictReader(f_in), sample_size))
+    if not rows:
+        return {}
+    schema = loader.get_schema_for_table(table_name)
+
+    start = time.perf_counter()
+    for row in rows:
+        schema.load(dict(row))
+    costs = {
+        "schema_load_us_per_row": round(
+            (time.perf_counter() - start) / len(rows) * 1e6, 2
+        )
+    }  # type: typing.Dict[str, typing.Any]
+
+    foreign_key_costs = {}
+    for name, field in schema.fields.items():
+        if not isinstance(field, StringForeignKey):
+            continue
+        values = [row[name] for row in rows if row.get(name)]
+        if not values:
+            continue
+        start = time.perf_counter()
+        for value in values:
+            field.deserialize(value)
+        foreign_key_costs[name] = round(
+            (time.perf_counter() - start) / len(values) * 1e6, 2
+        )
+    if foreign_key_costs:
+        costs["foreign_key_us_per_call"] = foreign_key_costs
+    loader.db.session.rollback()
+    loader.db.session.expunge_all()
+    return costs
+
+
+def run(args: argparse.Namespace) -> typing.Dict:
+    from flask import g
+
+    from flaskr import create_app, set_g
+    from flaskr.database import db
+    from flaskr.tools.loader import Loader
+    from flaskr.tools.synthetic_feed import FeedScale, SyntheticFeed
+
+    scale = FeedScale.mbta(args.multiple)
+    with tempfile.TemporaryDirectory() as feed_dir, create_app().app_context():
+        set_g()
+        files = g.config["mbta_data"]["files"]
+        SyntheticFeed(scale, args.seed).write(pathlib.Path(feed_dir), files)
+        g.config["mbta_data"]["path"] = feed_dir
+
+        db.drop_all()
+        tables = load_tables(Loader(db), traced=False)
+        if not args.skip_memory:
+            db.session.close()
+            db.drop_all()
+            for table_name, memory in load_tables(Loader(db), traced=True).items():
+                tables[table_name].update(memory)
+        loader = Loader(db)
+        for table_name in loader.table_names:
+            tables[table_name].update(schema_costs(loader, table_name, args.sample))
+        postgres_version = db.session.execute("SHOW server_version").scalar()
+        db.session.close()
+
+    return {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "multiple": args.multiple,
+            "seed": args.seed,
+            "sample": args.sample,
+            "python": platform.python_version(),
+            "postgres": postgres_version,
+        },
+        "tables": tables,
+    }
+
+
+def regressions(
+    baseline: typing.Dict, results: typing.Dict, threshold: float
+) -> typing.List[str]:
+    """Describe every figure of results that is worse than baseline's by more than threshold"""
+    found = []
+    for table_name, figures in results["tables"].items():
+        baseline_figures = baseline["tables"].get(table_name, {})
+        for key, value, baseline_value in _paired_figures(figures, baseline_figures):
+            if not baseline_value:
+                continue
+            change = (value - baseline_value) / baseline_value
+            metric = key.split(".")[0]
+            if (metric in HIGHER_IS_WORSE and change > threshold) or (
+                metric in LOWER_IS_WORSE and change < -threshold
+            ):
+                found.append(
+                    f"{table_name}.{key}: {baseline_value} -> {value} ({change:+.1%})"
+                )
+    return found
+
+
+def _paired_figures(
+    figures: typing.Dict, baseline_figures: typing.Dict
+) -> typing.Iterator[typing.Tuple[str, float, float]]:
+    for key, value in figures.items():
+        baseline_value = baseline_figures.get(key)
+        if isinstance(value, dict) and isinstance(baseline_value, dict):
+            for field_name, field_value in value.items():
+                if field_name in baseline_value:
+                    yield f"{key}.{field_name}", field_value, baseline_value[field_name]
+        elif isinstance(value, (int, float)) and isinstance(
+            baseline_value, (int, float)
+        ):
+            yield key, value, baseline_value
+
+
+def compare(args: argparse.Namespace) -> int:
+    baseline = json.loads(args.baseline.read_text())
+    results = json.loads(args.results.read_text())
+    if baseline["meta"].get("multiple") != results["meta"].get("multiple"):
+        print("Warning: baseline and results were run at different feed sizes")
+    found = regressions(baseline, results, args.threshold)
+    for regression in found:
+        print(f"REGRESSION {regression}")
+    print(f"{len(found)} regressions beyond {args.threshold:.0%}")
+    return 1 if found else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="benchmark the configured database")
+    run_parser.add_argument("--reset-database", action="store_true", required=True)
+    run_parser.add_argument("--multiple", type=float, default=0.1, help="of MBTA size")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--sample", type=int, default=2000, help="rows per table")
+    run_parser.add_argument("--skip-memory", action="store_true")
+    run_parser.add_argument("--output", type=pathlib.Path)
+    run_parser.add_argument("--save-baseline", action="store_true")
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="compare results to a baseline"
+    )
+    compare_parser.add_argument("results", type=pathlib.Path)
+    compare_parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE_PATH)
+    compare_parser.add_argument("--threshold", type=float, default=0.15)
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        sys.exit(compare(args))
+
+    results = run(args)
+    output = json.dumps(results, indent=2, sort_keys=True)
+    for table_name, figures in results["tables"].items():
+        print(
+            f"{table_name:>20}: {figures['rows']:>9} rows {figures['rows_per_second']:>10} rows/s"
+            f"  {figures.get('schema_load_us_per_row', 0):>8}us/row schema load"
+        )
+    if args.output:
+        args.output.write_text(output + "\n")
+    if args.save_baseline:
+        BASELINE_PATH.parent.mkdir(exist_ok=True)
+        BASELINE_PATH.write_text(output + "\n")
+        print(f"Saved baseline to {BASELINE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
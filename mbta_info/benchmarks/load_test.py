@@ -0,0 +1,156 @@
+"""
+Load test the departure reads of the Flask API against the asyncio read service.
+
+The same seeded list of departure requests (random stops and start times, so
+that response caches rarely hit) is replayed against each target at each
+concurrency level, and throughput and latency percentiles are reported.
+Start both services against the same loaded database first, e.g. from
+mbta_info/:
+    python main.py
+    python -m flaskr.async_api --port 8081
+    python -m benchmarks.load_test --service-date YYYYMMDD \
+        --target flask=http://127.0.0.1:5000 --target async=http://127.0.0.1:8081
+"""
+import argparse
+import asyncio
+import random
+import time
+import typing
+
+import aiohttp
+
+
+class LoadResult:
+    def __init__(self, label: str, concurrency: int):
+        self.label = label
+        self.concurrency = concurrency
+        self.latencies = []  # type: typing.List[float]
+        self.errors = 0
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+    def percentile_ms(self, percent: float) -> float:
+        if not self.latencies:
+            return float("nan")
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return ordered[index] * 1000
+
+    def summary(self) -> str:
+        return (
+            f"{self.label:>8} c={self.concurrency:<4} {self.throughput:8.1f} req/s  "
+            f"p50 {self.percentile_ms(50):7.1f}ms  p95 {self.percentile_ms(95):7.1f}ms  "
+            f"p99 {self.percentile_ms(99):7.1f}ms  errors {self.errors}"
+        )
+
+
+def departure_paths(
+    stop_ids: typing.Sequence[str], service_date: str, count: int, seed: int
+) -> typing.List[str]:
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        seconds = rng.randrange(5 * 3600, 24 * 3600)
+        after = f"{seconds // 3600:02}:{seconds // 60 % 60:02}:{seconds % 60:02}"
+        paths.append(
+            f"/api/stops/{rng.choice(stop_ids)}/departures"
+            f"?date={service_date}&after={after}&limit=10"
+        )
+    return paths
+
+
+async def run_load(
+    label: str, base_url: str, paths: typing.Sequence[str], concurrency: int
+) -> LoadResult:
+    """Request every path from base_url with at most concurrency requests in flight"""
+    result = LoadResult(label, concurrency)
+    queue = asyncio.Queue()  # type: asyncio.Queue
+    for path in paths:
+        queue.put_nowait(path)
+
+    async def worker(session: aiohttp.ClientSession):
+        while not queue.empty():
+            path = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                async with session.get(base_url + path) as response:
+                    await response.read()
+                    if response.status != 200:
+                        result.errors += 1
+                        continue
+            except aiohttp.ClientError:
+                result.errors += 1
+                continue
+            result.latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        result.elapsed = time.perf_counter() - start
+    return result
+
+
+async def fetch_stop_ids(base_url: str, count: int) -> typing.List[str]:
+    """Read stop ids from the Flask API's stop list"""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base_url}/api/stops") as response:
+            stops = await response.json()
+    return [stop["stop_id"] for stop in stops][:count]
+
+
+async def run(args: argparse.Namespace) -> typing.List[LoadResult]:
+    targets = [target.split("=", 1) for target in args.target]
+    stop_ids = args.stop_id or await fetch_stop_ids(targets[0][1], args.stops)
+    results = []
+    for concurrency in args.concurrency:
+        paths = departure_paths(
+            stop_ids, args.service_date, args.requests, args.seed + concurrency
+        )
+        for label, base_url in targets:
+            await run_load(label, base_url, paths[: args.warmup], concurrency)
+            result = await run_load(label, base_url, paths, concurrency)
+            print(result.summary())
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--service-date", required=True, help="YYYYMMDD")
+    parser.add_argument(
+        "--target",
+        action="append",
+        required=True,
+        metavar="LABEL=URL",
+        help="service to load, repeated to compare",
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument(
+        "--stop-id",
+        action="append",
+        help="default: read from the first target's /api/stops",
+    )
+    parser.add_argument(
+        "--stops", type=int, default=500, help="stops to draw requests from"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for concurrency in args.concurrency:
+        compared = [result for result in results if result.concurrency == concurrency]
+        baseline = compared[0].throughput or float("nan")
+        ratios = ", ".join(
+            f"{result.label} {result.throughput / baseline:.2f}x" for result in compared
+        )
+        print(f"c={concurrency} throughput relative to {compared[0].label}: {ratios}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Query-plan benchmark for the hot read paths.
+
+Each canonical query is made through the flaskr.queries function the API uses
+while its SQL is captured, and every captured statement is then run again
+under EXPLAIN (ANALYZE, FORMAT JSON). Execution times are printed, and the run
+exits non-zero if any plan reads one of the large tables with a sequential
+scan, i.e. a hot query lost its index.
+
+Run from mbta_info/ against a loaded database:
+    python -m benchmarks.query_plans [--service-date YYYYMMDD]
+"""
+import argparse
+import datetime
+import sys
+import typing
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from flaskr import queries, models as mbta_models
+
+# Tables large enough that a sequential scan on a hot path is a regression
+HOT_TABLES = frozenset(
+    ("stop_time", "trip", "shape", "pattern_stop", "route_stop")
+)  # type: typing.FrozenSet[str]
+
+Statement = typing.Tuple[str, typing.Any]  # (SQL, DBAPI parameters)
+
+
+class PlanCase:
+    """A canonical query: a flaskr.queries function and the arguments to call it with"""
+
+    def __init__(self, name: str, function: typing.Callable, *args):
+        self.name = name
+        self.function = function
+        self.args = args
+
+    def __repr__(self):
+        return f"<PlanCase: {self.name}>"
+
+
+class PlanResult:
+    def __init__(
+        self, case: PlanCase, execution_ms: float, seq_scans: typing.List[str]
+    ):
+        self.case = case
+        self.execution_ms = execution_ms
+        self.seq_scans = seq_scans
+
+    def __repr__(self):
+        return f"<PlanResult: {self.case.name} {self.execution_ms:.2f}ms>"
+
+
+def capture_statements(
+    session: Session, function: typing.Callable, *args
+) -> typing.List[Statement]:
+    """Call function, returning the statements it executed on the session's engine"""
+    statements = []  # type: typing.List[Statement]
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        function(*args)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return statements
+
+
+def explain(session: Session, statement: str, parameters: typing.Any) -> typing.Dict:
+    """Run statement under EXPLAIN ANALYZE on the session's connection, returning the plan"""
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + statement, parameters)
+        return cursor.fetchone()[0][0]
+    finally:
+        cursor.close()
+
+
+def seq_scans(plan: typing.Dict, tables: typing.AbstractSet[str]) -> typing.List[str]:
+    """
+    Return the relations of `tables` read by a sequential scan anywhere in plan.
+    Partitions (named <table>_<suffix>, see flaskr.partitions) count as their table.
+    """
+    scanned = []
+    nodes = [plan["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if node["Node Type"] == "Seq Scan" and any(
+            node["Relation Name"] == table
+            or node["Relation Name"].startswith(table + "_")
+            for table in tables
+        ):
+            scanned.append(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return scanned
+
+
+def run_case(
+    session: Session, case: PlanCase, tables: typing.AbstractSet[str] = HOT_TABLES
+) -> PlanResult:
+    execution_ms = 0.0
+    scanned = []  # type: typing.List[str]
+    for statement, parameters in capture_statements(session, case.function, *case.args):
+        plan = explain(session, statement, parameters)
+        execution_ms += plan["Execution Time"]
+        scanned.extend(seq_scans(plan, tables))
+    return PlanResult(case, execution_ms, scanned)
+
+
+def canonical_cases(
+    session: Session, service_date: datetime.date
+) -> typing.List[PlanCase]:
+    """Build the canonical queries around the busiest stop and one of its trips"""
+    StopTime = mbta_models.StopTime
+    Trip = mbta_models.Trip
+
+    busiest = (
+        session.query(StopTime.stop_id)
+        .group_by(StopTime.stop_id)
+        .order_by(func.count().desc(), StopTime.stop_id)
+        .first()
+    )
+    if busiest is None:
+        raise ValueError("No stop times loaded")
+    stop_id = busiest[0]
+    trip = (
+        session.query(Trip)
+        .join(StopTime, StopTime.trip_id == Trip.trip_id)
+        .filter(StopTime.stop_id == stop_id)
+        .first()
+    )
+
+    cases = [
+        PlanCase(
+            "departures", queries.get_departures, stop_id, service_date, 0, None, 20
+        ),
+        PlanCase("trip stop times", queries.get_trip_stop_times, trip.trip_id),
+        PlanCase("route trips", queries.get_route_trips, trip.route_id, None, 20),
+        PlanCase("stop routes", queries.get_stop_route_ids, stop_id),
+        PlanCase("route stops", queries.get_route_stop_ids, trip.route_id),
+        PlanCase("route pattern stops", queries.get_route_pattern_stops, trip.route_id),
+    ]
+    next_cursor = queries.get_departures(stop_id, service_date, 0, None, 20).next_cursor
+    if next_cursor:
+        cases.append(
+            PlanCase(
+                "departures, next page",
+                queries.get_departures,
+                stop_id,
+                service_date,
+                0,
+                next_cursor,
+                20,
+            )
+        )
+    if trip.shape_id:
+        cases.append(
+            PlanCase("shape points", queries.get_shape_points, trip.shape_id, None, 100)
+        )
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--service-date",
+        default=datetime.date.today().strftime("%Y%m%d"),
+        help="Service date for departure queries (YYYYMMDD), default today",
+    )
+    args = parser.parse_args()
+    service_date = datetime.datetime.strptime(args.service_date, "%Y%m%d").date()
+
+    from flaskr import create_app
+    from flaskr.database import db
+
+    with create_app().app_context():
+        results = [
+            run_case(db.session, case)
+            for case in canonical_cases(db.session, service_date)
+        ]
+
+    regressions = [result for result in results if result.seq_scans]
+    for result in results:
+        status = "SEQ SCAN " + ", ".join(result.seq_scans) if result.seq_scans else "ok"
+        print(f"{result.case.name:<24} {result.execution_ms:>10.2f}ms  {status}")
+    if regressions:
+        print(f"{len(regressions)} queries regressed to a sequential scan")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Time the trip update overlay: decoding a feed, applying each trip's update,
+and predicting departures from the overlays.
+
+Trip updates are synthetic, with absolute departure times like the MBTA's
+feed, so predicting also resolves delays against a stand-in schedule.
+From mbta_info/:
+    python -m benchmarks.trip_updates [--trips 1500] [--stops 30] [--budget-us 1000]
+"""
+import argparse
+import datetime
+import random
+import sys
+import time
+import typing
+
+import pytz
+
+from flaskr.realtime import gtfs_rt, trip_updates
+
+SERVICE_DATE = datetime.date(2020, 1, 6)
+
+
+def synthetic_feed(trips: int, stops: int, seed: int) -> typing.List[typing.Dict]:
+    rng = random.Random(seed)
+    day_start = trip_updates.service_day_start(
+        SERVICE_DATE, pytz.timezone("America/New_York")
+    )
+    entities = []
+    for trip_index in range(trips):
+        first_departure = day_start + rng.randrange(5 * 3600, 24 * 3600)
+        delay = rng.randrange(-60, 900)
+        entities.append(
+            {
+                "id": f"trip{trip_index}",
+                "trip_update": {
+                    "trip": {"trip_id": f"trip{trip_index}", "start_date": "20200106"},
+                    "stop_time_update": [
+                        {
+                            "stop_sequence": stop_sequence,
+                            "arrival": {
+                                "time": first_departure + delay + 90 * stop_sequence
+                            },
+                            "departure": {
+                                "time": first_departure
+                                + delay
+                                + 90 * stop_sequence
+                                + 20
+                            },
+                        }
+                        # Like a trip in progress, from a stop part way along
+                        for stop_sequence in range(rng.randrange(stops // 2), stops)
+                    ],
+                    "timestamp": 1578300000,
+                },
+            }
+        )
+    return entities
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--trips", type=int, default=1500, help="in the feed")
+    parser.add_argument("--stops", type=int, default=30, help="per trip")
+    parser.add_argument("--departures", type=int, default=20000, help="to predict")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--budget-us",
+        type=float,
+        help="exit 1 if applying a trip's update takes longer on average",
+    )
+    args = parser.parse_args()
+
+    entities = synthetic_feed(args.trips, args.stops, args.seed)
+    feed = gtfs_rt.encode_message(
+        {
+            "header": {"gtfs_realtime_version": "2.0", "timestamp": 1578300000},
+            "entity": entities,
+        },
+        "FeedMessage",
+    )
+
+    start = time.perf_counter()
+    decoder = gtfs_rt.FeedDecoder()
+    decoded = []
+    for offset in range(0, len(feed), 16384):
+        decoded.extend(decoder.feed(feed[offset : offset + 16384]))
+    decoder.close()
+    decode_seconds = time.perf_counter() - start
+
+    store = trip_updates.TripUpdateStore()
+    start = time.perf_counter()
+    for entity in decoded:
+        store.apply_entity(entity)
+    store.finish_feed(decoder.header, {entity["id"] for entity in decoded})
+    apply_us = (time.perf_counter() - start) / len(decoded) * 1e6
+
+    rng = random.Random(args.seed)
+    departures = [
+        {
+            "trip_id": f"trip{rng.randrange(args.trips)}",
+            "stop_sequence": rng.randrange(args.stops),
+            "arrival_time": 8 * 3600,
+            "departure_time": 8 * 3600 + 20,
+        }
+        for _ in range(args.departures)
+    ]
+    schedule = {
+        (f"trip{trip_index}", stop_sequence): (8 * 3600, 8 * 3600 + 20)
+        for trip_index in range(args.trips)
+        for stop_sequence in range(args.stops)
+    }
+    start = time.perf_counter()
+    for offset in range(0, len(departures), 20):  # Pages of the departures API
+        trip_updates.overlay_departures(
+            store,
+            departures[offset : offset + 20],
+            SERVICE_DATE,
+            lambda pairs: {pair: schedule[pair] for pair in pairs},
+        )
+    predict_us = (time.perf_counter() - start) / len(departures) * 1e6
+
+    print(f"feed: {len(feed) / 1024:.0f} KiB, {len(decoded)} trips")
+    print(
+        f"decode: {decode_seconds * 1000:.1f}ms ({decode_seconds / len(decoded) * 1e6:.1f}us/trip)"
+    )
+    print(f"apply: {apply_us:.1f}us/trip")
+    print(f"predict: {predict_us:.2f}us/departure")
+    if args.budget_us is not None and apply_us > args.budget_us:
+        print(f"Applying a trip update is over the {args.budget_us}us budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,7 @@ worker_send_task_events = True
 
 beat_schedule = {
     "update-mbta-data": {
-        "task": "flaskr.mbta_celery.tasks.run_update_mbta_data",
+        "task": "flaskr.mbta_celery.tasks.run_update_feeds",
         "schedule": 60.0 * 60 * 24,  # seconds (once every 24 hours)
     },
 }
@@ -1,26 +1,64 @@
-from flask import Flask, g
+import os
+import typing
 
-from config import Config
+from flask import Flask, current_app, g
 
 
-def create_app():
+def create_app(celery_worker: bool = False, feed_id: typing.Optional[str] = None):
+    """Create the app working on feed_id, by default MBTA_FEED_ID or the default feed"""
+    from config import Config  # Parses yaml; not needed by importers of flaskr.models
+    from flaskr import feeds
+    from flaskr.database import engine_options
+
     app = Flask(__name__)
     c = Config()
+    feed_id = feed_id or os.getenv("MBTA_FEED_ID") or feeds.DEFAULT_FEED_ID
+    feeds.feed_data_config(c.config, feed_id)  # Fail early on an unknown feed
     app.config.from_mapping(c.config["flask"])
+    app.config["FEED_ID"] = feed_id
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(
+        c.config.get("database", {}), celery_worker, feed_id
+    )
     register_extensions(app, c.flask_env == "testing")
+    register_blueprints(app)
+    realtime_config = c.config.get("realtime", {})
+    if realtime_config.get("vehicle_positions", False):
+        from flaskr.realtime import vehicles
+
+        vehicles.init_app(app, realtime_config)
+    if realtime_config.get("trip_updates", False):
+        from flaskr.realtime import trip_updates
+
+        trip_updates.init_app(app, realtime_config)
+    if realtime_config.get("service_alerts", False):
+        from flaskr.realtime import alerts
+
+        alerts.init_app(app, realtime_config)
     return app
 
 
 def register_extensions(app: Flask, testing: bool):
     from flaskr.database import db
-    from flaskr import models as mbta_models
+    from flaskr import model_utils, models as mbta_models, partitions, views
 
     if testing:
         from tests import models as test_models
     db.init_app(app)
+    model_utils.entity_cache.resize(
+        app.config.get("ENTITY_CACHE_SIZE", model_utils.DEFAULT_ENTITY_CACHE_SIZE)
+    )
+
+
+def register_blueprints(app: Flask):
+    from flaskr import api
+
+    api.init_app(app)
 
 
 def set_g():
+    from config import Config
+
     c = Config()
     g.config = c.config
     g.env = c.flask_env
+    g.feed_id = current_app.config["FEED_ID"]
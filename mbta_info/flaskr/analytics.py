@@ -0,0 +1,282 @@
+"""
+Headway and service-frequency analytics for a service date.
+
+The departures running on the date are fetched in bulk as a few columns, ids
+are replaced by integer codes, and each metric is computed with NumPy group-by
+operations over arrays sorted by (group, departure time) rather than by
+looping over StopTime instances.
+"""
+import datetime
+import typing
+
+import numpy as np
+
+from flaskr import queries, models as mbta_models
+from flaskr.database import db
+
+DEFAULT_PERCENTILES = (10, 50, 90)
+SECONDS_PER_HOUR = 3600
+NO_TIME = -1  # First/last departure of a group without departures
+FETCH_BATCH_SIZE = 100000
+
+RouteKey = typing.Tuple[str, typing.Optional[int]]  # (route_id, direction_id)
+
+
+class FrequencyStats:
+    """
+    Service frequency of each group (a route direction or a stop) on one date.
+    Times are seconds since 00:00:00 of the service date and headways are
+    seconds between consecutive departures; both are NaN/NO_TIME where a group
+    has too few departures to define them. trips_per_hour[i, h] counts the
+    departures of group i from hour h, which may exceed 23 for late service.
+    """
+
+    def __init__(
+        self,
+        labels: typing.Sequence,
+        trip_counts: np.ndarray,
+        first_departures: np.ndarray,
+        last_departures: np.ndarray,
+        percentiles: typing.Sequence[float],
+        headway_percentiles: np.ndarray,
+        trips_per_hour: np.ndarray,
+    ):
+        self.labels = list(labels)
+        self.trip_counts = trip_counts
+        self.first_departures = first_departures
+        self.last_departures = last_departures
+        self.percentiles = tuple(percentiles)
+        self.headway_percentiles = headway_percentiles
+        self.trips_per_hour = trips_per_hour
+        self._label_index = {label: i for i, label in enumerate(self.labels)}
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __contains__(self, label: typing.Hashable) -> bool:
+        return label in self._label_index
+
+    def __repr__(self):
+        return f"<FrequencyStats: {len(self)} groups>"
+
+    def summary(self, label: typing.Hashable) -> typing.Dict:
+        i = self._label_index[label]
+        return {
+            "trip_count": int(self.trip_counts[i]),
+            "first_departure": _optional_time(self.first_departures[i]),
+            "last_departure": _optional_time(self.last_departures[i]),
+            "headway_percentiles": {
+                percentile: _optional_float(headway)
+                for percentile, headway in zip(
+                    self.percentiles, self.headway_percentiles[i]
+                )
+            },
+            "trips_per_hour": self.trips_per_hour[i].tolist(),
+        }
+
+
+class DepartureColumns:
+    """
+    Departures running on a service date as parallel arrays.
+    trip_codes and stop_codes index into trip_ids and stop_ids, and
+    trip_route_codes maps each trip to an index into route_keys, the
+    (route_id, direction_id) pairs the trips run on.
+    """
+
+    def __init__(
+        self,
+        trip_ids: typing.Sequence[str],
+        trip_route_codes: np.ndarray,
+        route_keys: typing.Sequence[RouteKey],
+        stop_ids: typing.Sequence[str],
+        trip_codes: np.ndarray,
+        stop_codes: np.ndarray,
+        departure_times: np.ndarray,
+    ):
+        self.trip_ids = list(trip_ids)
+        self.trip_route_codes = trip_route_codes
+        self.route_keys = list(route_keys)
+        self.stop_ids = list(stop_ids)
+        self.trip_codes = trip_codes
+        self.stop_codes = stop_codes
+        self.departure_times = departure_times
+
+    def __len__(self) -> int:
+        return len(self.departure_times)
+
+    @classmethod
+    def fetch(cls, service_date: datetime.date) -> "DepartureColumns":
+        """Read the departures of every trip running on service_date in one query"""
+        StopTime = mbta_models.StopTime
+        Trip = mbta_models.Trip
+
+        trip_index = {}  # type: typing.Dict[str, int]
+        route_index = {}  # type: typing.Dict[RouteKey, int]
+        stop_index = {}  # type: typing.Dict[str, int]
+        trip_route_codes = []  # type: typing.List[int]
+        trip_codes = []  # type: typing.List[int]
+        stop_codes = []  # type: typing.List[int]
+        departure_times = []  # type: typing.List[int]
+
+        service_ids = queries.active_service_ids(service_date)
+        if service_ids:
+            rows = (
+                db.session.query(
+                    StopTime.trip_id,
+                    Trip.route_id,
+                    Trip.direction_id,
+                    StopTime.stop_id,
+                    StopTime.departure_time,
+                )
+                .join(Trip, StopTime.trip_id == Trip.trip_id)
+                .filter(
+                    StopTime.feed_version == queries.current_feed_version(),
+                    Trip.service_id.in_(service_ids),
+                )
+                .yield_per(FETCH_BATCH_SIZE)
+            )
+            for trip_id, route_id, direction_id, stop_id, departure_time in rows:
+                trip_code = trip_index.get(trip_id)
+                if trip_code is None:
+                    trip_code = trip_index[trip_id] = len(trip_index)
+                    route_key = (route_id, direction_id)
+                    trip_route_codes.append(
+                        route_index.setdefault(route_key, len(route_index))
+                    )
+                trip_codes.append(trip_code)
+                stop_codes.append(stop_index.setdefault(stop_id, len(stop_index)))
+                departure_times.append(departure_time)
+
+        return cls(
+            list(trip_index),
+            np.array(trip_route_codes, dtype=np.int64),
+            list(route_index),
+            list(stop_index),
+            np.array(trip_codes, dtype=np.int64),
+            np.array(stop_codes, dtype=np.int64),
+            np.array(departure_times, dtype=np.int64),
+        )
+
+    def trip_start_times(self) -> np.ndarray:
+        """The first departure of each trip, indexed by trip code"""
+        starts = np.full(len(self.trip_ids), NO_TIME, dtype=np.int64)
+        order = np.lexsort((self.departure_times, self.trip_codes))
+        sorted_codes = self.trip_codes[order]
+        first_of_trip = np.ones(len(order), dtype=bool)
+        first_of_trip[1:] = sorted_codes[1:] != sorted_codes[:-1]
+        starts[sorted_codes[first_of_trip]] = self.departure_times[order][first_of_trip]
+        return starts
+
+    def route_frequencies(
+        self, percentiles: typing.Sequence[float] = DEFAULT_PERCENTILES
+    ) -> FrequencyStats:
+        """Frequency of each route direction, counting each trip at its first departure"""
+        return frequency_stats(
+            self.route_keys,
+            self.trip_route_codes,
+            self.trip_start_times(),
+            percentiles,
+        )
+
+    def stop_frequencies(
+        self, percentiles: typing.Sequence[float] = DEFAULT_PERCENTILES
+    ) -> FrequencyStats:
+        """Frequency of departures from each stop, across all routes serving it"""
+        return frequency_stats(
+            self.stop_ids, self.stop_codes, self.departure_times, percentiles
+        )
+
+
+def route_frequencies(
+    service_date: datetime.date,
+    percentiles: typing.Sequence[float] = DEFAULT_PERCENTILES,
+) -> FrequencyStats:
+    return DepartureColumns.fetch(service_date).route_frequencies(percentiles)
+
+
+def stop_frequencies(
+    service_date: datetime.date,
+    percentiles: typing.Sequence[float] = DEFAULT_PERCENTILES,
+) -> FrequencyStats:
+    return DepartureColumns.fetch(service_date).stop_frequencies(percentiles)
+
+
+def frequency_stats(
+    labels: typing.Sequence,
+    group_codes: np.ndarray,
+    times: np.ndarray,
+    percentiles: typing.Sequence[float] = DEFAULT_PERCENTILES,
+) -> FrequencyStats:
+    """Compute the FrequencyStats of departures at times, grouped by codes indexing labels"""
+    group_count = len(labels)
+    order = np.lexsort((times, group_codes))
+    codes = group_codes[order]
+    times = times[order]
+
+    trip_counts = np.bincount(codes, minlength=group_count)
+    ends = np.cumsum(trip_counts)
+    starts = ends - trip_counts
+    has_departures = trip_counts > 0
+    first_departures = np.full(group_count, NO_TIME, dtype=np.int64)
+    last_departures = np.full(group_count, NO_TIME, dtype=np.int64)
+    first_departures[has_departures] = times[starts[has_departures]]
+    last_departures[has_departures] = times[ends[has_departures] - 1]
+
+    same_group = codes[1:] == codes[:-1]
+    headway_percentiles = grouped_percentiles(
+        codes[1:][same_group], np.diff(times)[same_group], group_count, percentiles
+    )
+
+    hours = times // SECONDS_PER_HOUR
+    hour_count = int(hours.max()) + 1 if len(hours) else 0
+    trips_per_hour = np.bincount(
+        codes * hour_count + hours, minlength=group_count * hour_count
+    ).reshape(group_count, hour_count)
+
+    return FrequencyStats(
+        labels,
+        trip_counts,
+        first_departures,
+        last_departures,
+        percentiles,
+        headway_percentiles,
+        trips_per_hour,
+    )
+
+
+def grouped_percentiles(
+    group_codes: np.ndarray,
+    values: np.ndarray,
+    group_count: int,
+    percentiles: typing.Sequence[float],
+) -> np.ndarray:
+    """
+    Return a (group_count, len(percentiles)) array of the percentiles of values
+    in each group, interpolated linearly as np.percentile does. Groups without
+    values get NaN.
+    """
+    result = np.full((group_count, len(percentiles)), np.nan)
+    order = np.lexsort((values, group_codes))
+    values = values[order].astype(np.float64)
+    counts = np.bincount(group_codes, minlength=group_count)
+    starts = np.cumsum(counts) - counts
+
+    has_values = counts > 0
+    counts = counts[has_values, None]
+    starts = starts[has_values, None]
+    positions = (counts - 1) * (np.asarray(percentiles, dtype=np.float64) / 100)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, counts - 1)
+    fractions = positions - lower
+    lower_values = values[starts + lower]
+    upper_values = values[starts + upper]
+    result[has_values] = lower_values + (upper_values - lower_values) * fractions
+    return result
+
+
+def _optional_time(value: int) -> typing.Optional[int]:
+    return None if value == NO_TIME else int(value)
+
+
+def _optional_float(value: float) -> typing.Optional[float]:
+    return None if np.isnan(value) else float(value)
@@ -0,0 +1,354 @@
+"""
+Read-only JSON API over the loaded feed.
+
+Responses carry an ETag derived from the loaded feed version and the request,
+and response bodies are kept in an in-process LRU cache, so repeat reads are
+answered without touching the database until a new feed is loaded.
+"""
+
+import datetime
+import enum
+import functools
+import hashlib
+import json
+import typing
+
+import marshmallow as mm
+from flask import Blueprint, Flask, Response, abort, current_app, jsonify, request
+from flask_sqlalchemy import Model
+from sqlalchemy import inspect
+from werkzeug.datastructures import MultiDict
+
+from flaskr import model_utils, pagination, queries, schema_utils, models as mbta_models
+from flaskr.cache import FeedVersionTracker, LRUCache
+from flaskr.database import db, pool_status
+from flaskr.realtime.alerts import Alert, AlertStore
+from flaskr.realtime.trip_updates import overlay_departures
+from flaskr.realtime.vehicles import VehicleStore
+
+DATE_PARAM_FORMAT = "%Y%m%d"
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 1000
+DEFAULT_VEHICLE_RADIUS = 500  # meters
+MAX_VEHICLE_RADIUS = 10000
+
+blueprint = Blueprint("api", __name__, url_prefix="/api")
+
+
+class ResponseCache(LRUCache):
+    """JSON response bodies keyed by ETag, discarded whenever the loaded feed version changes"""
+
+    def __init__(self, max_size: int):
+        super().__init__(max_size)
+        self.feed_version = None  # type: typing.Optional[str]
+
+    def use_feed_version(self, feed_version: typing.Optional[str]):
+        if feed_version != self.feed_version:
+            self.clear()
+            self.feed_version = feed_version
+
+
+def init_app(app: Flask):
+    app.extensions["api_response_cache"] = ResponseCache(
+        app.config.get("API_CACHE_SIZE", 1024)
+    )
+    app.extensions["api_feed_version"] = FeedVersionTracker(
+        app.config.get("API_VERSION_CHECK_INTERVAL", 30)
+    )
+    app.register_blueprint(blueprint)
+
+
+def make_etag(
+    feed_version: typing.Optional[str],
+    path: str,
+    args: MultiDict,
+    realtime_version: typing.Optional[int] = None,
+) -> str:
+    versions = [feed_version]
+    if realtime_version is not None:
+        versions.append(realtime_version)
+    key = json.dumps(versions + [path, sorted(args.items(multi=True))])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def feed_cached(view: typing.Callable, realtime: bool = False) -> typing.Callable:
+    """Serve the value returned by view as JSON, honoring If-None-Match and
+    reusing cached bodies for the current feed version, and if realtime, for
+    the current trip updates"""
+
+    @functools.wraps(view)
+    def wrapper(**kwargs) -> Response:
+        response_cache = current_app.extensions["api_response_cache"]
+        feed_version = current_app.extensions["api_feed_version"].current()
+        response_cache.use_feed_version(feed_version)
+        model_utils.entity_cache.use_feed_version(feed_version)
+
+        trip_updates = current_app.extensions.get("trip_updates")
+        etag = make_etag(
+            feed_version,
+            request.path,
+            request.args,
+            trip_updates.feed_timestamp
+            if realtime and trip_updates is not None
+            else None,
+        )
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            body = response_cache.get(etag)
+            if body is None:
+                body = json.dumps(view(**kwargs))
+                response_cache.put(etag, body)
+            response = current_app.response_class(body, mimetype="application/json")
+        response.set_etag(etag)
+        return response
+
+    return wrapper
+
+
+def realtime_cached(view: typing.Callable) -> typing.Callable:
+    return feed_cached(view, realtime=True)
+
+
+def serialize(instance: Model) -> typing.Dict:
+    """Convert a model instance's column values to JSON-compatible values"""
+    lonlat_field = getattr(instance, "lonlat_field", None)
+    data = {}
+    for column in inspect(instance).mapper.column_attrs:
+        if column.key == lonlat_field:
+            continue
+        value = getattr(instance, column.key)
+        if isinstance(value, enum.Enum):
+            value = value.value
+        elif isinstance(value, datetime.date):
+            value = value.isoformat()
+        data[column.key] = value
+    if lonlat_field:
+        has_point = getattr(instance, lonlat_field) is not None
+        data["longitude"] = instance.longitude if has_point else None
+        data["latitude"] = instance.latitude if has_point else None
+    return data
+
+
+def page_params() -> typing.Tuple[typing.Optional[str], int]:
+    """Return the cursor and page size requested, aborting on bad values"""
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        abort(400)
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        abort(400)
+    return request.args.get("cursor"), limit
+
+
+def serialize_page(
+    page: pagination.Page, serialize_item: typing.Callable = serialize
+) -> typing.Dict:
+    return {
+        "data": [serialize_item(item) for item in page.items],
+        "next_cursor": page.next_cursor,
+    }
+
+
+@blueprint.errorhandler(pagination.InvalidCursor)
+def invalid_cursor(error: pagination.InvalidCursor):
+    return jsonify(error=str(error)), 400
+
+
+@blueprint.route("/status/pool")
+def connection_pool():
+    """This process's database connection pool use, to size pools by worker count"""
+    return jsonify(pool_status(db.get_engine()))
+
+
+def active_alerts(
+    lookup: typing.Callable[[AlertStore], typing.List[Alert]]
+) -> Response:
+    """The alerts lookup finds in the polled service alerts; not cached, as alerts expire"""
+    alert_store = current_app.extensions.get("service_alerts")
+    if alert_store is None:  # An empty store is falsy but still answers with []
+        abort(404)
+    return jsonify([alert.serialize() for alert in lookup(alert_store)])
+
+
+@blueprint.route("/stops/<stop_id>/alerts")
+def stop_alerts(stop_id: str):
+    return active_alerts(lambda alert_store: alert_store.for_stop(stop_id))
+
+
+@blueprint.route("/routes/<route_id>/alerts")
+def route_alerts(route_id: str):
+    return active_alerts(lambda alert_store: alert_store.for_route(route_id))
+
+
+@blueprint.route("/trips/<trip_id>/alerts")
+def trip_alerts(trip_id: str):
+    return active_alerts(lambda alert_store: alert_store.for_trip(trip_id))
+
+
+def vehicle_store() -> VehicleStore:
+    """The polled vehicle positions; not cached, as they change with every poll"""
+    store = current_app.extensions.get("vehicle_positions")
+    if store is None:  # An empty store is falsy but still answers with []
+        abort(404)
+    return store
+
+
+def near_params() -> typing.Optional[typing.Tuple[float, float, float]]:
+    """The point and radius in meters requested, if any, aborting on bad values"""
+    if "latitude" not in request.args and "longitude" not in request.args:
+        return None
+    try:
+        latitude = float(request.args["latitude"])
+        longitude = float(request.args["longitude"])
+        radius = float(request.args.get("radius", DEFAULT_VEHICLE_RADIUS))
+    except (KeyError, ValueError):
+        abort(400)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        abort(400)
+    if not 0 < radius <= MAX_VEHICLE_RADIUS:
+        abort(400)
+    return latitude, longitude, radius
+
+
+@blueprint.route("/vehicles")
+def vehicles():
+    """Every vehicle's position, or with latitude and longitude, the vehicles within
+    radius meters of the point, nearest first"""
+    store = vehicle_store()
+    near = near_params()
+    if near is None:
+        return jsonify([position.serialize() for position in store.positions()])
+    return jsonify(
+        [
+            dict(position.serialize(), distance=distance)
+            for distance, position in store.near(*near)
+        ]
+    )
+
+
+@blueprint.route("/vehicles/<vehicle_id>")
+def vehicle(vehicle_id: str):
+    return jsonify((vehicle_store().get(vehicle_id) or abort(404)).serialize())
+
+
+@blueprint.route("/stops")
+@feed_cached
+def stops():
+    return [
+        serialize(stop)
+        for stop in queries.get_stops(parent_station=request.args.get("parent_station"))
+    ]
+
+
+@blueprint.route("/stops/<stop_id>")
+@feed_cached
+def stop(stop_id: str):
+    return serialize(queries.get_stop(stop_id) or abort(404))
+
+
+@blueprint.route("/stops/<stop_id>/departures")
+@realtime_cached
+def departures(stop_id: str):
+    """Departures on the service day given by `date` (YYYYMMDD), optionally `after` a HH:MM:SS time.
+    When trip updates are polled, each has the `realtime` prediction of
+    flaskr.realtime.trip_updates.overlay_departures; order stays by schedule."""
+    if not queries.get_stop(stop_id):
+        abort(404)
+    try:
+        service_date = datetime.datetime.strptime(
+            request.args["date"], DATE_PARAM_FORMAT
+        ).date()
+        after = schema_utils.time_as_seconds(request.args.get("after", "00:00:00"))
+    except (KeyError, ValueError, mm.ValidationError):
+        abort(400)
+    page = queries.get_departures(stop_id, service_date, after, *page_params())
+    page_data = serialize_page(
+        page,
+        lambda row: dict(serialize(row[0]), route_id=row[1], trip_headsign=row[2]),
+    )
+    trip_updates = current_app.extensions.get("trip_updates")
+    if trip_updates is not None:  # Even while empty, so every departure has "realtime"
+        overlay_departures(
+            trip_updates, page_data["data"], service_date, queries.get_scheduled_times
+        )
+    return page_data
+
+
+@blueprint.route("/stops/<stop_id>/routes")
+@feed_cached
+def stop_routes(stop_id: str):
+    if not queries.get_stop(stop_id):
+        abort(404)
+    return queries.get_stop_route_ids(stop_id)
+
+
+@blueprint.route("/shapes/<shape_id>")
+@feed_cached
+def shape(shape_id: str):
+    return serialize_page(queries.get_shape_points(shape_id, *page_params()))
+
+
+@blueprint.route("/routes")
+@feed_cached
+def routes():
+    route_type = None
+    if "route_type" in request.args:
+        try:
+            route_type = mbta_models.RouteType[
+                schema_utils.numbered_type_enum_key(request.args["route_type"])
+            ]
+        except (KeyError, mm.ValidationError):
+            abort(400)
+    return [serialize(route) for route in queries.get_routes(route_type=route_type)]
+
+
+@blueprint.route("/routes/<route_id>")
+@feed_cached
+def route(route_id: str):
+    return serialize(queries.get_route(route_id) or abort(404))
+
+
+@blueprint.route("/routes/<route_id>/trips")
+@feed_cached
+def route_trips(route_id: str):
+    return serialize_page(queries.get_route_trips(route_id, *page_params()))
+
+
+@blueprint.route("/routes/<route_id>/stops")
+@feed_cached
+def route_stops(route_id: str):
+    """The ordered stops of each of the route's patterns"""
+    if not queries.get_route(route_id):
+        abort(404)
+    patterns = {}  # type: typing.Dict[str, typing.List[typing.Dict]]
+    for pattern_stop in queries.get_route_pattern_stops(route_id):
+        patterns.setdefault(pattern_stop.route_pattern_id, []).append(
+            serialize(pattern_stop)
+        )
+    return patterns
+
+
+@blueprint.route("/patterns/<route_pattern_id>/stops")
+@feed_cached
+def pattern_stops(route_pattern_id: str):
+    return [
+        serialize(pattern_stop)
+        for pattern_stop in queries.get_pattern_stops(route_pattern_id)
+    ]
+
+
+@blueprint.route("/services/<service_id>/dates")
+@feed_cached
+def service_dates(service_id: str):
+    return serialize_page(queries.get_service_dates(service_id, *page_params()))
+
+
+@blueprint.route("/trips/<trip_id>")
+@feed_cached
+def trip(trip_id: str):
+    trip_data = serialize(queries.get_trip(trip_id) or abort(404))
+    trip_data["stop_times"] = [
+        serialize(stop_time) for stop_time in queries.get_trip_stop_times(trip_id)
+    ]
+    return trip_data
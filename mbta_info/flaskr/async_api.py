@@ -0,0 +1,311 @@
+"""
+Asyncio read service for the busiest API reads: stops, the routes at a stop
+and departures from a stop.
+
+It serves the same paths and JSON as flaskr.api from an aiohttp app, running
+alongside the Flask app, so many small concurrent reads share one event loop
+and a bounded asyncpg pool instead of each holding a thread and a connection.
+Queries are built from the models with SQLAlchemy Core and compiled to
+asyncpg's $1, $2, ... parameter style.
+
+Run from mbta_info/:
+    python -m flaskr.async_api [--host HOST] [--port PORT] [--feed-id FEED_ID]
+"""
+import argparse
+import datetime
+import os
+import typing
+
+import asyncpg
+import marshmallow as mm
+from aiohttp import web
+from sqlalchemy import func, inspect, select, tuple_
+from sqlalchemy.dialects.postgresql.base import PGCompiler, PGDialect
+from sqlalchemy.sql import Select
+
+from flaskr import feeds, pagination, queries, schema_utils, views
+from flaskr import models as mbta_models
+from flaskr.api import DATE_PARAM_FORMAT, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+routes = web.RouteTableDef()
+
+
+class AsyncpgCompiler(PGCompiler):
+    """Render bind parameters as $1, $2, ... in the order they appear"""
+
+    def bindparam_string(self, name, **kwargs):
+        return "$" + super().bindparam_string(name, **kwargs)[1:]
+
+
+class AsyncpgDialect(PGDialect):
+    statement_compiler = AsyncpgCompiler
+
+    def __init__(self):
+        super().__init__(paramstyle="numeric")
+
+
+DIALECT = AsyncpgDialect()
+
+
+def compile_query(query: Select) -> typing.Tuple[str, typing.List]:
+    """Return the SQL of query and its parameters in positional order"""
+    compiled = query.compile(dialect=DIALECT)
+    return str(compiled), [compiled.params[name] for name in compiled.positiontup]
+
+
+def model_columns(model) -> typing.List:
+    """Select a model's columns labelled by attribute, with its point as longitude and latitude"""
+    lonlat_field = getattr(model, "lonlat_field", None)
+    columns = [
+        prop.columns[0].label(prop.key)
+        for prop in inspect(model).column_attrs
+        if prop.key != lonlat_field
+    ]
+    if lonlat_field:
+        lonlat_column = getattr(model, lonlat_field)
+        columns.append(func.ST_X(lonlat_column).label("longitude"))
+        columns.append(func.ST_Y(lonlat_column).label("latitude"))
+    return columns
+
+
+def serialize_record(model, record: typing.Mapping) -> typing.Dict:
+    """Convert a row of model_columns to the JSON flaskr.api.serialize gives for an instance"""
+    lonlat_field = getattr(model, "lonlat_field", None)
+    data = {}
+    for prop in inspect(model).column_attrs:
+        if prop.key == lonlat_field:
+            continue
+        value = record[prop.key]
+        column_type = prop.columns[0].type
+        if value is not None and getattr(column_type, "enum_class", None):
+            # Enum columns store member names
+            value = column_type.enum_class[value].value
+        elif isinstance(value, datetime.date):
+            value = value.isoformat()
+        data[prop.key] = value
+    if lonlat_field:
+        data["longitude"] = record["longitude"]
+        data["latitude"] = record["latitude"]
+    return data
+
+
+class AsyncReader:
+    """The read queries of flaskr.queries, run on an asyncpg pool"""
+
+    def __init__(self, pool: asyncpg.pool.Pool):
+        self.pool = pool
+
+    async def fetch(self, query: Select) -> typing.List[asyncpg.Record]:
+        sql, params = compile_query(query)
+        async with self.pool.acquire() as connection:
+            return await connection.fetch(sql, *params)
+
+    async def get_stop(self, stop_id: str) -> typing.Optional[typing.Dict]:
+        Stop = mbta_models.Stop
+        records = await self.fetch(
+            select(model_columns(Stop)).where(Stop.stop_id == stop_id)
+        )
+        return serialize_record(Stop, records[0]) if records else None
+
+    async def get_stop_route_ids(self, stop_id: str) -> typing.List[str]:
+        route_stop = views.route_stop
+        records = await self.fetch(
+            select([route_stop.c.route_id])
+            .where(route_stop.c.stop_id == stop_id)
+            .order_by(route_stop.c.route_id)
+        )
+        return [record["route_id"] for record in records]
+
+    async def active_service_ids(self, service_date: datetime.date) -> typing.Set[str]:
+        Calendar = mbta_models.Calendar
+        CalendarDate = mbta_models.CalendarDate
+
+        weekday_column = getattr(Calendar, queries.WEEKDAYS[service_date.weekday()])
+        calendars = await self.fetch(
+            select([Calendar.service_id]).where(
+                weekday_column.is_(True)
+                & (Calendar.start_date <= service_date)
+                & (Calendar.end_date >= service_date)
+            )
+        )
+        exceptions = await self.fetch(
+            select([CalendarDate.service_id, CalendarDate.exception_type]).where(
+                CalendarDate.date == service_date
+            )
+        )
+        return queries.apply_date_exceptions(
+            {record["service_id"] for record in calendars},
+            (
+                (service_id, mbta_models.DateExceptionType[exception_type])
+                for service_id, exception_type in exceptions
+            ),
+        )
+
+    async def get_departures(
+        self,
+        stop_id: str,
+        service_date: datetime.date,
+        after: int,
+        cursor: typing.Optional[str],
+        limit: int,
+    ) -> pagination.Page:
+        """Page through the departures of queries.get_departures as JSON-ready dicts"""
+        StopTime = mbta_models.StopTime
+        Trip = mbta_models.Trip
+        sort_key = queries.DEPARTURE_SORT_KEY
+
+        service_ids = await self.active_service_ids(service_date)
+        if not service_ids:
+            return pagination.Page([], None)
+        query = (
+            select(model_columns(StopTime) + [Trip.route_id, Trip.trip_headsign])
+            .select_from(
+                StopTime.__table__.join(
+                    Trip.__table__, StopTime.trip_id == Trip.trip_id
+                )
+            )
+            .where(
+                (StopTime.feed_version == queries.current_feed_version())
+                & (StopTime.stop_id == stop_id)
+                & (StopTime.departure_time >= after)
+                & Trip.service_id.in_(sorted(service_ids))
+            )
+        )
+        if cursor:
+            after_key = pagination.decode_cursor(cursor, sort_key)
+            query = query.where(tuple_(*sort_key) > tuple_(*after_key))
+        records = await self.fetch(query.order_by(*sort_key).limit(limit + 1))
+
+        items = records[:limit]
+        next_cursor = None
+        if len(records) > limit:
+            next_cursor = pagination.encode_cursor(
+                [items[-1][column.key] for column in sort_key]
+            )
+        return pagination.Page(
+            [
+                dict(
+                    serialize_record(StopTime, record),
+                    route_id=record["route_id"],
+                    trip_headsign=record["trip_headsign"],
+                )
+                for record in items
+            ],
+            next_cursor,
+        )
+
+
+def pool_options(
+    database_config: typing.Dict, feed_id: str = feeds.DEFAULT_FEED_ID
+) -> typing.Dict[str, typing.Any]:
+    """Translate the database section of the config into asyncpg.create_pool
+    options for reading feed_id"""
+    settings = database_config.get("async_pool", {})
+    options = {
+        "min_size": settings.get("min_size", 2),
+        "max_size": settings.get("max_size", 20),
+        "command_timeout": settings.get("command_timeout"),
+    }  # type: typing.Dict[str, typing.Any]
+    if database_config.get("pgbouncer", False):
+        # Transaction pooling hands each transaction to any server connection,
+        # where statements asyncpg prepared on another one don't exist
+        options["statement_cache_size"] = 0
+    if feed_id != feeds.DEFAULT_FEED_ID:
+        if database_config.get("pgbouncer", False):
+            # PgBouncer refuses the search_path startup parameter, as it does for psycopg2
+            raise ValueError(f"Feed {feed_id} can't be reached through PgBouncer")
+        options["server_settings"] = {"search_path": feeds.search_path(feed_id)}
+    return options
+
+
+def page_params(request: web.Request) -> typing.Tuple[typing.Optional[str], int]:
+    """Return the cursor and page size requested, raising 400 on bad values"""
+    try:
+        limit = int(request.query.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise web.HTTPBadRequest()
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        raise web.HTTPBadRequest()
+    return request.query.get("cursor"), limit
+
+
+@routes.get("/api/stops/{stop_id}")
+async def stop(request: web.Request) -> web.Response:
+    stop_data = await request.app["reader"].get_stop(request.match_info["stop_id"])
+    if stop_data is None:
+        raise web.HTTPNotFound()
+    return web.json_response(stop_data)
+
+
+@routes.get("/api/stops/{stop_id}/departures")
+async def departures(request: web.Request) -> web.Response:
+    """Departures on the service day given by `date` (YYYYMMDD), optionally `after` a HH:MM:SS time"""
+    reader = request.app["reader"]  # type: AsyncReader
+    stop_id = request.match_info["stop_id"]
+    if not await reader.get_stop(stop_id):
+        raise web.HTTPNotFound()
+    try:
+        service_date = datetime.datetime.strptime(
+            request.query["date"], DATE_PARAM_FORMAT
+        ).date()
+        after = schema_utils.time_as_seconds(request.query.get("after", "00:00:00"))
+    except (KeyError, ValueError, mm.ValidationError):
+        raise web.HTTPBadRequest()
+    try:
+        page = await reader.get_departures(
+            stop_id, service_date, after, *page_params(request)
+        )
+    except pagination.InvalidCursor as error:
+        return web.json_response({"error": str(error)}, status=400)
+    return web.json_response({"data": page.items, "next_cursor": page.next_cursor})
+
+
+@routes.get("/api/stops/{stop_id}/routes")
+async def stop_routes(request: web.Request) -> web.Response:
+    reader = request.app["reader"]  # type: AsyncReader
+    stop_id = request.match_info["stop_id"]
+    if not await reader.get_stop(stop_id):
+        raise web.HTTPNotFound()
+    return web.json_response(await reader.get_stop_route_ids(stop_id))
+
+
+def create_async_app(
+    config: typing.Dict, feed_id: typing.Optional[str] = None
+) -> web.Application:
+    """Create the read service of feed_id, by default MBTA_FEED_ID or the default feed,
+    for a config loaded by config.Config"""
+    feed_id = feed_id or os.getenv("MBTA_FEED_ID") or feeds.DEFAULT_FEED_ID
+    feeds.feed_data_config(config, feed_id)  # Fail early on an unknown feed
+    options = pool_options(config.get("database", {}), feed_id)
+
+    async def open_pool(app: web.Application):
+        pool = await asyncpg.create_pool(
+            config["flask"]["SQLALCHEMY_DATABASE_URI"], **options
+        )
+        app["reader"] = AsyncReader(pool)
+
+    async def close_pool(app: web.Application):
+        await app["reader"].pool.close()
+
+    app = web.Application()
+    app.add_routes(routes)
+    app.on_startup.append(open_pool)
+    app.on_cleanup.append(close_pool)
+    return app
+
+
+def main():
+    from config import Config
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--feed-id", help="default: MBTA_FEED_ID or the default feed")
+    args = parser.parse_args()
+    web.run_app(
+        create_async_app(Config().config, args.feed_id), host=args.host, port=args.port
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import collections
+import threading
+import time
+import typing
+
+from flaskr.database import db
+
+_MISSING = object()
+
+
+class LRUCache:
+    """A thread-safe mapping holding at most max_size entries, evicting the least recently used first"""
+
+    def __init__(self, max_size: int):
+        if max_size < 1:
+            raise ValueError(f"LRUCache max_size must be positive, got {max_size}")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()  # type: collections.OrderedDict
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: typing.Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: typing.Hashable, value: typing.Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def resize(self, max_size: int):
+        if max_size < 1:
+            raise ValueError(f"LRUCache max_size must be positive, got {max_size}")
+        with self._lock:
+            self.max_size = max_size
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class FeedVersionTracker:
+    """
+    Report the version of the most recently loaded feed, re-reading it from
+    the database at most once every check_interval seconds so that frequent
+    callers do not each pay for a query.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._version = None  # type: typing.Optional[str]
+        self._checked_at = None  # type: typing.Optional[float]
+        self._lock = threading.Lock()
+
+    def current(self) -> typing.Optional[str]:
+        with self._lock:
+            now = time.monotonic()
+            if (
+                self._checked_at is None
+                or now - self._checked_at >= self.check_interval
+            ):
+                self._version = self.fetch_version()
+                self._checked_at = now
+            return self._version
+
+    def expire(self):
+        """Force the next call to current() to re-read the version"""
+        with self._lock:
+            self._checked_at = None
+
+    @staticmethod
+    def fetch_version() -> typing.Optional[str]:
+        # Imported here as flaskr.model_utils, which the models import, uses LRUCache
+        from flaskr import models as mbta_models
+
+        FeedInfo = mbta_models.FeedInfo
+        row = (
+            db.session.query(FeedInfo.feed_version)
+            .order_by(FeedInfo.created.desc().nullslast())
+            .first()
+        )
+        return row[0] if row else None
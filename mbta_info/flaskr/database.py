@@ -1,3 +1,156 @@
+"""
+The database handle and the connection pool settings of its engine.
+
+Pool settings come from the database section of config_<FLASK_ENV>.yaml.
+Celery workers run one task at a time, so they may override the web settings
+with a smaller pool. In PgBouncer mode the engine keeps no pool of its own:
+PgBouncer, in transaction pooling mode, is the pool, and every checkout opens
+a fresh client connection to it. psycopg2 never prepares statements on the
+server, so nothing outlives the transaction that set it up. The engine of an
+app working on a feed other than the default connects with the feed's schema
+first on the search_path (see flaskr.feeds), which PgBouncer doesn't pass on.
+
+Every engine pool is instrumented with PoolMetrics, which counts checkouts,
+new connections, checkouts that had to wait for a connection to be returned,
+and checkouts that timed out waiting.
+"""
+import threading
+import time
+import typing
+
 import flask_sqlalchemy
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool, Pool, QueuePool
+
+from flaskr import feeds
 
 db = flask_sqlalchemy.SQLAlchemy()
+
+POOL_OPTIONS = ("pool_size", "max_overflow", "pool_timeout", "pool_recycle")
+
+
+class PoolMetrics:
+    """Counters shared by a pool and the pools that replace it when its engine is disposed"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.connects = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record_checkout(self, waited: bool, seconds: float, timed_out: bool):
+        with self._lock:
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+                self.wait_seconds += seconds
+            if timed_out:
+                self.timeouts += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+
+class MeteredPoolMixin:
+    """Record PoolMetrics for every checkout from a Pool subclass"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)  # type: ignore[call-arg]
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        waited = self._is_exhausted()
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()  # type: ignore[misc]
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.metrics.record_checkout(waited, time.perf_counter() - start, timed_out)
+
+    def _create_connection(self):
+        self.metrics.record_connect()
+        return super()._create_connection()  # type: ignore[misc]
+
+    def recreate(self):
+        pool = super().recreate()  # type: ignore[misc]
+        pool.metrics = self.metrics
+        return pool
+
+    def _is_exhausted(self) -> bool:
+        """Whether a checkout now has to wait for a connection to be checked in"""
+        return False
+
+
+class MeteredQueuePool(MeteredPoolMixin, QueuePool):
+    def _is_exhausted(self) -> bool:
+        return (
+            self._max_overflow > -1
+            and self.checkedin() == 0
+            and self.overflow() >= self._max_overflow
+        )
+
+
+class MeteredNullPool(MeteredPoolMixin, NullPool):
+    pass
+
+
+def engine_options(
+    database_config: typing.Dict,
+    celery_worker: bool = False,
+    feed_id: str = feeds.DEFAULT_FEED_ID,
+) -> typing.Dict:
+    """
+    Translate the database section of the config into SQLAlchemy
+    create_engine options for the web app or a Celery worker working on feed_id
+    """
+    connect_args = feeds.connect_args(feed_id)
+    if database_config.get("pgbouncer", False):
+        if connect_args:
+            # PgBouncer refuses the options startup parameter that sets the search_path
+            raise ValueError(f"Feed {feed_id} can't be reached through PgBouncer")
+        return {"poolclass": MeteredNullPool}
+
+    pool_settings = dict(database_config.get("pool", {}))
+    if celery_worker:
+        pool_settings.update(database_config.get("celery_pool", {}))
+    options = {
+        "poolclass": MeteredQueuePool,
+        "pool_pre_ping": pool_settings.get("pool_pre_ping", True),
+    }  # type: typing.Dict[str, typing.Any]
+    options.update(
+        (option, pool_settings[option])
+        for option in POOL_OPTIONS
+        if option in pool_settings
+    )
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def pool_status(engine: Engine) -> typing.Dict[str, typing.Any]:
+    """Report the engine pool's current use and its PoolMetrics"""
+    pool = engine.pool  # type: Pool
+    metrics = getattr(pool, "metrics", None) or PoolMetrics()
+    status = {
+        "pool": type(pool).__name__,
+        "checkouts": metrics.checkouts,
+        "connects": metrics.connects,
+        "waits": metrics.waits,
+        "wait_seconds": round(metrics.wait_seconds, 6),
+        "timeouts": metrics.timeouts,
+    }  # type: typing.Dict[str, typing.Any]
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+        )
+    return status
@@ -0,0 +1,129 @@
+"""
+Several agencies' GTFS feeds side by side, one Postgres schema per feed.
+
+Each feed has a feed_id naming the schema that holds its copy of every table:
+the default feed keeps the public schema and other feeds get feed_<feed_id>.
+Keys such as route_id and stop_id only need to be unique within their feed,
+and a feed is loaded, replaced or retired without touching the others.
+
+An app works on one feed (create_app's feed_id, or MBTA_FEED_ID), with the
+feed's schema first on the search_path of its connections, so the models,
+schemas, Loader, partitions and raw DDL address the feed's tables without
+naming the schema. Reads spanning feeds open a feed_session per feed.
+"""
+import contextlib
+import re
+import typing
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+DEFAULT_FEED_ID = "mbta"
+DEFAULT_SCHEMA = "public"
+# Feed ids end up in schema names, so they are kept to plain identifiers
+FEED_ID_PATTERN = re.compile(r"[a-z][a-z0-9_]{0,47}")
+
+
+def schema_name(feed_id: str) -> str:
+    if feed_id == DEFAULT_FEED_ID:
+        return DEFAULT_SCHEMA
+    if not FEED_ID_PATTERN.fullmatch(feed_id):
+        raise ValueError(
+            f"Invalid feed_id {feed_id!r}: use lowercase letters, digits and underscores"
+        )
+    return f"feed_{feed_id}"
+
+
+def feed_ids(config: typing.Dict) -> typing.List[str]:
+    """The default feed followed by the other configured feeds"""
+    return [DEFAULT_FEED_ID] + sorted(config["mbta_data"].get("feeds") or {})
+
+
+def feed_data_config(config: typing.Dict, feed_id: str) -> typing.Dict:
+    """
+    Return the mbta_data section of config as it applies to feed_id: the
+    feed's entry under mbta_data.feeds overrides files_url, path and files,
+    and its files are kept under <path>/<feed_id> unless it sets a path
+    """
+    data_config = {
+        key: value for key, value in config["mbta_data"].items() if key != "feeds"
+    }
+    if feed_id == DEFAULT_FEED_ID:
+        return data_config
+    feeds = config["mbta_data"].get("feeds") or {}
+    if feed_id not in feeds:
+        raise ValueError(f"No feed {feed_id!r} under mbta_data.feeds")
+    schema_name(feed_id)  # Validate the id
+    data_config["path"] = f"{data_config['path']}/{feed_id}"
+    data_config.update(feeds[feed_id] or {})
+    return data_config
+
+
+def search_path(feed_id: str) -> str:
+    """The search_path putting feed_id's schema first"""
+    # public stays on the path for the PostGIS types and functions
+    return f"{schema_name(feed_id)},{DEFAULT_SCHEMA}"
+
+
+def connect_args(feed_id: str) -> typing.Dict[str, str]:
+    """psycopg2 connect arguments putting feed_id's schema first on the search_path"""
+    if feed_id == DEFAULT_FEED_ID:
+        return {}
+    return {"options": f"-c search_path={search_path(feed_id)}"}
+
+
+def create_tables(db: SQLAlchemy, feed_id: str):
+    """Create feed_id's schema and the tables of every model missing from it"""
+    if feed_id == DEFAULT_FEED_ID:
+        db.create_all()
+        return
+    schema = schema_name(feed_id)
+    with db.get_engine().begin() as connection:
+        connection.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        # The DDL run after the tables (default partitions, materialized views)
+        # names no schema, so it creates its objects where the search_path points
+        connection.execute(f"SET LOCAL search_path TO {search_path(feed_id)}")
+        # Name the tables' schema explicitly: a table of the public schema is also
+        # visible through the search_path and would otherwise count as already created
+        db.metadata.create_all(
+            bind=connection.execution_options(schema_translate_map={None: schema})
+        )
+
+
+def tables_exist(db: SQLAlchemy, feed_id: str) -> bool:
+    """Whether every model has its table in feed_id's schema"""
+    existing = set(inspect(db.get_engine()).get_table_names(schema_name(feed_id)))
+    return set(db.metadata.tables) <= existing
+
+
+@contextlib.contextmanager
+def feed_session(db: SQLAlchemy, feed_id: str) -> typing.Iterator[Session]:
+    """
+    A read-only Session over feed_id's tables whatever feed the app works on,
+    for queries spanning feeds. Its search_path is set for its one transaction,
+    which is rolled back on exit.
+    """
+    connection = db.get_engine().connect()
+    transaction = connection.begin()
+    session = Session(bind=connection)
+    try:
+        connection.execute(f"SET LOCAL search_path TO {search_path(feed_id)}")
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
+def across_feeds(
+    db: SQLAlchemy,
+    feed_id_list: typing.Iterable[str],
+    query: typing.Callable[[Session], typing.Any],
+) -> typing.Dict[str, typing.Any]:
+    """Run query in a feed_session of each feed, returning its results by feed_id"""
+    results = {}
+    for feed_id in feed_id_list:
+        with feed_session(db, feed_id) as session:
+            results[feed_id] = query(session)
+    return results
@@ -23,8 +23,7 @@ class StringForeignKey(mm.fields.String):
         self.error_messages["missing_entry"] = self.MISSING_MODEL_MESSAGE
 
     def _deserialize(self, value, attr, data, **kwargs) -> typing.Optional[str]:
-        model_pk_field = model_utils.pk_field_name(self.model)
-        if self.model.query.filter_by(**{model_pk_field: value}).count():
+        if model_utils.get_entity(self.model, value) is not None:
             return value
         elif not self.model.query.count():
             raise self.make_error("no_model_data", model_name=self.model_name)
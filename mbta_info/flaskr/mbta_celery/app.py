@@ -1,4 +1,7 @@
+import typing
+
 from celery.app import Celery
+from flask import Flask
 
 import celeryconfig
 
@@ -8,3 +11,19 @@ celery_app = Celery(
 )
 
 celery_app.config_from_object(celeryconfig)
+
+_flask_apps = {}  # type: typing.Dict[typing.Optional[str], Flask]
+
+
+def flask_app(feed_id: typing.Optional[str] = None) -> Flask:
+    """
+    The Flask app tasks on feed_id (by default MBTA_FEED_ID or the default
+    feed) run in, created on first use so that each forked worker process
+    opens its own connection pool per feed, sized by the celery_pool settings
+    of the config
+    """
+    if feed_id not in _flask_apps:
+        from flaskr import create_app
+
+        _flask_apps[feed_id] = create_app(celery_worker=True, feed_id=feed_id)
+    return _flask_apps[feed_id]
@@ -1,8 +1,9 @@
 from datetime import datetime
+import typing
 
-from flaskr.mbta_celery.app import celery_app
-from flaskr.tools.retriever import Retriever
-from flaskr.tools.update import update_mbta_data
+from flask import g
+
+from flaskr.mbta_celery.app import celery_app, flask_app
 
 
 @celery_app.task
@@ -12,11 +13,39 @@ def add(x, y):
 
 
 @celery_app.task
-def run_update_mbta_data():
-    update_mbta_data()
+def run_update_feeds():
+    """Update every configured feed, each in a task of its own so that feeds load concurrently"""
+    from config import Config
+    from flaskr import feeds
+
+    for feed_id in feeds.feed_ids(Config().config):
+        run_update_mbta_data.delay(feed_id)
 
 
 @celery_app.task
-def run_retrieve_data():
-    retriever = Retriever()
-    retriever.retrieve_data()
+def run_update_mbta_data(feed_id: typing.Optional[str] = None):
+    # The update pipeline pulls in numpy and every tool; import it in the task
+    # rather than whenever a worker or client imports the task module
+    from flaskr import set_g
+    from flaskr.database import db, pool_status
+    from flaskr.profiling import Profiler
+    from flaskr.tools.update import update_mbta_data
+
+    with flask_app(feed_id).app_context():
+        set_g()
+        with Profiler.from_config(g.config).profile("run_update_mbta_data") as section:
+            section.feed_version = update_mbta_data()
+        print(f"Connection pool: {pool_status(db.get_engine())}")
+
+
+@celery_app.task
+def run_retrieve_data(feed_id: typing.Optional[str] = None):
+    from flaskr import set_g
+    from flaskr.profiling import Profiler
+    from flaskr.tools.retriever import Retriever
+
+    with flask_app(feed_id).app_context():
+        set_g()
+        with Profiler.from_config(g.config).profile("run_retrieve_data"):
+            retriever = Retriever(feed_id=g.feed_id)
+            retriever.retrieve_data()
@@ -1,6 +1,101 @@
+import typing
+
 from flask_sqlalchemy import Model
-from sqlalchemy import inspect
+from sqlalchemy import Index, Table, inspect
+from sqlalchemy.orm.attributes import set_committed_value
+
+from flaskr.cache import LRUCache
+
+# Index info marking indexes to build once their table is loaded instead of row by row
+POST_LOAD_INDEX_INFO = {"post_load": True}
+# Table args for tables holding one partition per loaded feed
+FEED_VERSION_PARTITIONING = {"postgresql_partition_by": "LIST (feed_version)"}
+DEFAULT_ENTITY_CACHE_SIZE = 4096
+
+
+def extended_statistics_info(*column_groups: typing.Tuple[str, ...]) -> typing.Dict:
+    """Table info asking for extended statistics on each group of correlated columns"""
+    return {"extended_statistics": column_groups}
 
 
 def pk_field_name(model: Model) -> str:
     return inspect(model).primary_key[0].name
+
+
+def is_derived_table(table: Table) -> bool:
+    """Return True for tables populated by the application instead of from a data file"""
+    return table.info.get("derived", False)
+
+
+def is_post_load_index(index: Index) -> bool:
+    """Return True for indexes dropped while their table is bulk loaded and built afterwards"""
+    return index.info.get("post_load", False)
+
+
+def is_partitioned_table(table: Table) -> bool:
+    """Return True for tables stored as one partition per feed version"""
+    return bool(table.dialect_options["postgresql"]["partition_by"])
+
+
+def extended_statistics(table: Table) -> typing.Tuple[typing.Tuple[str, ...], ...]:
+    """Return the groups of correlated columns of table the planner keeps statistics on"""
+    return table.info.get("extended_statistics", ())
+
+
+def transient_copy(instance: Model) -> Model:
+    """A copy of instance outside of any session, holding its column values"""
+    mapper = inspect(instance).mapper
+    copy = mapper.class_manager.new_instance()
+    for column_attr in mapper.column_attrs:
+        set_committed_value(copy, column_attr.key, getattr(instance, column_attr.key))
+    return copy
+
+
+class EntityCache(LRUCache):
+    """
+    Entities by (model, primary key), read through on a miss, for the lookups
+    of the same few routes, stops and calendars repeated by validation and reads.
+    Entries are transient copies of the entities, holding their column values
+    but not their relationships, so they outlive the session they were read in.
+    Keys found missing are not cached, as the Loader may add them next. Emptied
+    whenever the feed version changes, as a load may change any entity.
+    """
+
+    def __init__(self, max_size: int):
+        super().__init__(max_size)
+        self.feed_version = None  # type: typing.Optional[str]
+
+    def use_feed_version(self, feed_version: typing.Optional[str]):
+        if feed_version != self.feed_version:
+            self.clear()
+            self.feed_version = feed_version
+
+    def get_entity(
+        self, model: Model, pk: typing.Union[str, int]
+    ) -> typing.Optional[Model]:
+        key = (model, pk)
+        entity = self.get(key)
+        if entity is None:
+            instance = model.query.get(pk)
+            if instance is None:
+                return None
+            entity = transient_copy(instance)
+            self.put(key, entity)
+        return entity
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {
+            "size": len(self),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Shared by the process, which works on one feed at a time; sized by create_app
+entity_cache = EntityCache(DEFAULT_ENTITY_CACHE_SIZE)
+
+
+def get_entity(model: Model, pk: typing.Union[str, int]) -> typing.Optional[Model]:
+    """Return the entity of model with primary key pk through the entity cache, or None if there's none"""
+    return entity_cache.get_entity(model, pk)
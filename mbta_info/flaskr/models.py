@@ -4,27 +4,22 @@ import enum
 import logging
 import typing
 
-import pycountry
-import pytz
 from flask_sqlalchemy import SQLAlchemy
 from geoalchemy2 import Geometry
 from sqlalchemy import func, inspect
 from sqlalchemy.exc import DataError
 
+from flaskr import codes, model_utils
 from flaskr.database import db  # type: SQLAlchemy
 
 logger = logging.getLogger(__name__)
 
+# Built from pregenerated code tables; reading pytz and pycountry here slows every import
 TimeZone = enum.Enum(  # type: ignore[misc]
-    "TimeZone", {tz.replace("/", "_"): tz for tz in pytz.all_timezones}
+    "TimeZone", {tz.replace("/", "_"): tz for tz in codes.TIME_ZONES}
 )
 LangCode = enum.Enum(  # type: ignore[misc]
-    "LangCode",
-    {
-        lang.alpha_2: lang.alpha_2
-        for lang in pycountry.languages
-        if getattr(lang, "alpha_2", None)
-    },
+    "LangCode", {lang: lang for lang in codes.LANGUAGE_CODES}
 )
 
 
@@ -34,6 +29,13 @@ class TimeStamppedModel(db.Model):
     created = db.Column(db.DateTime)
 
 
+class DerivedModel(db.Model):
+    """An abstract base model for tables maintained by the application rather than loaded from a data file"""
+
+    __abstract__ = True
+    __table_args__ = {"info": {"derived": True}}
+
+
 class GeoMixin:
     """A mixin class for models having a Geometry POINT field - allows convenient, cached access to lon/lat values"""
 
@@ -407,9 +409,14 @@ class CalendarDate(db.Model):
         https://github.com/mbta/gtfs-documentation/blob/master/reference/gtfs.md#calendar_datestxt
     """
 
+    # Keyset pagination sort key (service_id, date); also serves service_id lookups
+    __table_args__ = (
+        db.Index("ix_calendar_date_service_id_date", "service_id", "date"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     service_id = db.Column(
-        db.String(64), db.ForeignKey("calendar.service_id"), nullable=False, index=True
+        db.String(64), db.ForeignKey("calendar.service_id"), nullable=False
     )
     service = db.relationship("Calendar", backref="dates")
     date = db.Column(db.Date(), nullable=False)
@@ -443,9 +450,21 @@ class Shape(db.Model, GeoMixin):
     """
 
     lonlat_field = "shape_pt_lonlat"
+    # Keyset pagination sort key (shape_id, shape_pt_sequence); also serves shape_id lookups
+    __table_args__ = (
+        db.Index(
+            "ix_shape_shape_id_shape_pt_sequence",
+            "shape_id",
+            "shape_pt_sequence",
+            info=model_utils.POST_LOAD_INDEX_INFO,
+        ),
+        model_utils.FEED_VERSION_PARTITIONING,
+    )
 
-    id = db.Column(db.Integer, primary_key=True)
-    shape_id = db.Column(db.String(64), nullable=False, index=True)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # Partition key, set by the Loader from feed_info.txt (see flaskr.partitions)
+    feed_version = db.Column(db.String(128), primary_key=True)
+    shape_id = db.Column(db.String(64), nullable=False)
     shape_pt_lonlat = db.Column(Geometry("POINT"), nullable=False)
     # Increasing but not necessarily consecutive for each subsequent stop
     shape_pt_sequence = db.Column(db.Integer(), nullable=False)
@@ -572,10 +591,20 @@ class Trip(db.Model):
     Reference: https://github.com/google/transit/blob/master/gtfs/spec/en/reference.md#tripstxt
     """
 
-    trip_id = db.Column(db.String(128), primary_key=True)
-    route_id = db.Column(
-        db.String(64), db.ForeignKey("route.route_id"), nullable=False, index=True
+    # Trips of a route in keyset pagination order; also serves route_id lookups
+    __table_args__ = (
+        db.Index(
+            "ix_trip_route_id_trip_id",
+            "route_id",
+            "trip_id",
+            info=model_utils.POST_LOAD_INDEX_INFO,
+        ),
+        # A route's trips mostly run in one direction or the other, not both at random
+        {"info": model_utils.extended_statistics_info(("route_id", "direction_id"))},
     )
+
+    trip_id = db.Column(db.String(128), primary_key=True)
+    route_id = db.Column(db.String(64), db.ForeignKey("route.route_id"), nullable=False)
     route = db.relationship("Route", backref="trips")
     service_id = db.Column(
         db.String(64), db.ForeignKey("calendar.service_id"), nullable=False, index=True
@@ -633,7 +662,34 @@ class StopTime(db.Model):
     Reference: https://github.com/google/transit/blob/master/gtfs/spec/en/reference.md#stop_timestxt
     """
 
-    id = db.Column(db.Integer, primary_key=True)
+    # Keyset pagination sort key (trip_id, stop_sequence); also serves trip_id lookups.
+    # Departures from a stop are read in order from the stop_id index, which ends with
+    # the rest of their sort key (departure_time, trip_id, stop_sequence).
+    __table_args__ = (
+        db.Index(
+            "ix_stop_time_trip_id_stop_sequence",
+            "trip_id",
+            "stop_sequence",
+            info=model_utils.POST_LOAD_INDEX_INFO,
+        ),
+        db.Index(
+            "ix_stop_time_stop_id_departure_time",
+            "stop_id",
+            "departure_time",
+            "trip_id",
+            "stop_sequence",
+            info=model_utils.POST_LOAD_INDEX_INFO,
+        ),
+        dict(
+            model_utils.FEED_VERSION_PARTITIONING,
+            # Each trip has its own short run of stop_sequence values
+            info=model_utils.extended_statistics_info(("trip_id", "stop_sequence")),
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # Partition key, set by the Loader from feed_info.txt (see flaskr.partitions)
+    feed_version = db.Column(db.String(128), primary_key=True)
     trip_id = db.Column(db.String(128), db.ForeignKey("trip.trip_id"), nullable=False)
     trip = db.relationship("Trip", backref="times")
     arrival_time = db.Column(db.Integer(), nullable=False)  # Seconds since 00:00:00
@@ -741,3 +797,178 @@ class MultiRouteTrip(db.Model):
 
     def __repr__(self):
         return f"<MultiRouteTrip: Route {self.added_route_id}, Trip {self.trip_id}>"
+
+
+class FeedInfo(TimeStamppedModel):
+    """
+    Information about the dataset itself, including the version of the feed that was loaded.
+    Requires: feed_publisher_name, feed_publisher_url, feed_lang, feed_version
+    Relies on: None
+    Reference: https://github.com/google/transit/blob/master/gtfs/spec/en/reference.md#feed_infotxt
+    """
+
+    feed_version = db.Column(db.String(128), primary_key=True)
+    feed_publisher_name = db.Column(db.String(64), nullable=False)
+    feed_publisher_url = db.Column(db.String(256), nullable=False)
+    feed_lang = db.Column(db.Enum(LangCode), nullable=False)
+    feed_start_date = db.Column(db.Date(), nullable=True)
+    feed_end_date = db.Column(db.Date(), nullable=True)
+    feed_contact_email = db.Column(db.String(64), nullable=True)
+    feed_contact_url = db.Column(db.String(256), nullable=True)
+
+    def __init__(
+        self,
+        feed_version: str,
+        feed_publisher_name: str,
+        feed_publisher_url: str,
+        feed_lang: LangCode,
+        **kwargs,
+    ):
+        self.feed_version = feed_version
+        self.feed_publisher_name = feed_publisher_name
+        self.feed_publisher_url = feed_publisher_url
+        self.feed_lang = feed_lang
+        # The most recently loaded feed is current
+        self.created = datetime.datetime.utcnow()
+
+        for fieldname, value in kwargs.items():
+            setattr(self, fieldname, value)
+
+    def __repr__(self):
+        return f"<FeedInfo: {self.feed_version}>"
+
+
+class WalkingTransfer(DerivedModel):
+    """
+    A walking connection between two nearby stops, computed from Stop coordinates after each load
+    Requires: from_stop_id, to_stop_id, distance, walk_time
+    Relies on: Stop
+    Reference: None
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    from_stop_id = db.Column(
+        db.String(64), db.ForeignKey("stop.stop_id"), nullable=False, index=True
+    )
+    from_stop = db.relationship(
+        "Stop", foreign_keys=[from_stop_id], backref="transfers_from"
+    )
+    to_stop_id = db.Column(db.String(64), db.ForeignKey("stop.stop_id"), nullable=False)
+    to_stop = db.relationship("Stop", foreign_keys=[to_stop_id], backref="transfers_to")
+    distance = db.Column(db.Float(), nullable=False)  # Great-circle meters
+    walk_time = db.Column(db.Integer(), nullable=False)  # Seconds
+
+    def __init__(
+        self, from_stop_id: str, to_stop_id: str, distance: float, walk_time: int
+    ):
+        self.from_stop_id = from_stop_id
+        self.to_stop_id = to_stop_id
+        self.distance = distance
+        self.walk_time = walk_time
+
+    def __repr__(self):
+        return f"<WalkingTransfer: {self.from_stop_id} -> {self.to_stop_id} ({self.walk_time}s)>"
+
+
+class PatternStop(DerivedModel):
+    """
+    The ordered stops of a route pattern, with typical times since the start of the pattern's trips.
+    Derived from StopTime and Trip.route_pattern_id after each load.
+    Requires: route_pattern_id, route_id, stop_sequence, stop_id, arrival_offset, departure_offset, trip_count
+    Relies on: RoutePattern, Route, Stop, Trip, StopTime
+    Reference: None
+    """
+
+    __table_args__ = (
+        db.Index(
+            "ix_pattern_stop_route_pattern_id_stop_sequence",
+            "route_pattern_id",
+            "stop_sequence",
+            unique=True,
+        ),
+        db.Index(
+            "ix_pattern_stop_route_id_route_pattern_id_stop_sequence",
+            "route_id",
+            "route_pattern_id",
+            "stop_sequence",
+        ),
+        DerivedModel.__table_args__,
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    route_pattern_id = db.Column(
+        db.String(64), db.ForeignKey("route_pattern.route_pattern_id"), nullable=False
+    )
+    route_pattern = db.relationship("RoutePattern", backref="pattern_stops")
+    # Denormalized from RoutePattern so the stops of a route are a single indexed read
+    route_id = db.Column(db.String(64), db.ForeignKey("route.route_id"), nullable=False)
+    direction_id = db.Column(db.SmallInteger, nullable=True)  # 0 or 1
+    stop_sequence = db.Column(db.Integer(), nullable=False)
+    stop_id = db.Column(
+        db.String(64), db.ForeignKey("stop.stop_id"), nullable=False, index=True
+    )
+    stop = db.relationship("Stop", backref="pattern_stops")
+    # Median seconds since the first departure of each of the pattern's trips
+    arrival_offset = db.Column(db.Integer(), nullable=False)
+    departure_offset = db.Column(db.Integer(), nullable=False)
+    trip_count = db.Column(
+        db.Integer(), nullable=False
+    )  # Trips the offsets are taken from
+
+    def __init__(
+        self,
+        route_pattern_id: str,
+        route_id: str,
+        stop_sequence: int,
+        stop_id: str,
+        arrival_offset: int,
+        departure_offset: int,
+        trip_count: int,
+        **kwargs,
+    ):
+        self.route_pattern_id = route_pattern_id
+        self.route_id = route_id
+        self.stop_sequence = stop_sequence
+        self.stop_id = stop_id
+        self.arrival_offset = arrival_offset
+        self.departure_offset = departure_offset
+        self.trip_count = trip_count
+
+        for fieldname, value in kwargs.items():
+            setattr(self, fieldname, value)
+
+    def __repr__(self):
+        return f"<PatternStop: {self.route_pattern_id} #{self.stop_sequence} @ {self.stop_id}>"
+
+
+class LoadCheckpoint(DerivedModel):
+    """
+    How far the Loader got with a feed version, saved with every batch it commits, so a load that
+    was interrupted resumes where it stopped: the tables before table_name in load order are loaded,
+    and so are the first row_offset data rows of table_name, or all of it once table_complete.
+    Requires: feed_version, table_name, row_offset, table_complete, updated
+    Relies on: None
+    Reference: None
+    """
+
+    feed_version = db.Column(db.String(128), primary_key=True)
+    table_name = db.Column(db.String(64), nullable=False)
+    row_offset = db.Column(db.Integer(), nullable=False)  # Data rows, blank lines aside
+    table_complete = db.Column(db.Boolean(), nullable=False)
+    updated = db.Column(db.DateTime, nullable=False)
+
+    def __init__(
+        self,
+        feed_version: str,
+        table_name: str,
+        row_offset: int = 0,
+        table_complete: bool = False,
+    ):
+        self.feed_version = feed_version
+        self.table_name = table_name
+        self.row_offset = row_offset
+        self.table_complete = table_complete
+        self.updated = datetime.datetime.utcnow()
+
+    def __repr__(self):
+        return f"<LoadCheckpoint: {self.feed_version} {self.table_name} @ {self.row_offset}>"
@@ -0,0 +1,121 @@
+"""
+Keyset (cursor) pagination for large collections.
+
+Each page continues from the sort key of the last row of the previous page
+with a row comparison such as (shape_id, shape_pt_sequence) > (:a, :b), so an
+index on the sort columns serves every page with a range scan and page N costs
+the same as page 1. Cursors are opaque to clients: url-safe base64 JSON of the
+last sort key.
+"""
+
+import base64
+import binascii
+import datetime
+import json
+import typing
+
+from flask_sqlalchemy import BaseQuery
+from sqlalchemy import tuple_
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+
+from flaskr import models as mbta_models
+
+# Unique sort keys backed by an index, for paging through each model's rows
+SORT_KEYS = {
+    mbta_models.StopTime: (
+        mbta_models.StopTime.trip_id,
+        mbta_models.StopTime.stop_sequence,
+    ),
+    mbta_models.Shape: (
+        mbta_models.Shape.shape_id,
+        mbta_models.Shape.shape_pt_sequence,
+    ),
+    mbta_models.Trip: (mbta_models.Trip.trip_id,),
+    mbta_models.CalendarDate: (
+        mbta_models.CalendarDate.service_id,
+        mbta_models.CalendarDate.date,
+    ),
+}  # type: typing.Dict[typing.Any, typing.Tuple[InstrumentedAttribute, ...]]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class Page:
+    """A page of query results and the cursor for the page after it, if any"""
+
+    def __init__(self, items: typing.List, next_cursor: typing.Optional[str]):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def __repr__(self):
+        return f"<Page: {len(self.items)} items (next: {self.next_cursor})>"
+
+
+def encode_cursor(values: typing.Sequence) -> str:
+    encoded = json.dumps(
+        [
+            value.isoformat() if isinstance(value, datetime.date) else value
+            for value in values
+        ]
+    ).encode("utf-8")
+    return base64.urlsafe_b64encode(encoded).decode("ascii")
+
+
+def decode_cursor(
+    cursor: str, sort_columns: typing.Sequence[InstrumentedAttribute]
+) -> typing.List:
+    """Return the sort key values encoded in cursor, converted to the types of sort_columns"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise InvalidCursor(f"Malformed cursor: {cursor}") from e
+    if not isinstance(values, list) or len(values) != len(sort_columns):
+        raise InvalidCursor(f"Cursor does not match sort key: {cursor}")
+
+    try:
+        return [
+            (
+                datetime.date.fromisoformat(value)
+                if column.type.python_type is datetime.date
+                else value
+            )
+            for column, value in zip(sort_columns, values)
+        ]
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor(f"Malformed cursor: {cursor}") from e
+
+
+def keyset_page(
+    query: BaseQuery,
+    sort_columns: typing.Sequence[InstrumentedAttribute],
+    cursor: typing.Optional[str],
+    limit: int,
+) -> Page:
+    """
+    Return the page of query results following cursor, ordered by sort_columns.
+
+    sort_columns must uniquely identify a row and belong to the first entity of
+    query. Pass cursor=None for the first page.
+    """
+    if cursor:
+        after = decode_cursor(cursor, sort_columns)
+        query = query.filter(tuple_(*sort_columns) > tuple_(*after))
+    rows = query.order_by(*sort_columns).limit(limit + 1).all()
+
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last_entity = items[-1][0] if isinstance(items[-1], tuple) else items[-1]
+        next_cursor = encode_cursor(
+            [getattr(last_entity, column.key) for column in sort_columns]
+        )
+    return Page(items, next_cursor)
+
+
+def model_page(
+    model, query: BaseQuery, cursor: typing.Optional[str], limit: int
+) -> Page:
+    """Page through query over model ordered by the model's SORT_KEYS"""
+    return keyset_page(query, SORT_KEYS[model], cursor, limit)
@@ -0,0 +1,144 @@
+"""
+Per-feed partitions of the tables that grow with every feed.
+
+stop_time and shape are LIST partitioned on feed_version. A feed is loaded into
+a standalone staging table that becomes the version's partition once it is
+full: attaching it builds the partition's share of the parent's indexes and
+checks its foreign keys in one pass, and readers never see a half-loaded
+partition. Retiring a feed drops its partitions rather than deleting rows, and
+queries filtered on the current feed version prune to its partition. Each
+partitioned table also has a DEFAULT partition for rows of versions without a
+partition of their own.
+"""
+import hashlib
+import time
+import typing
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, Column, MetaData, Table, event
+
+from flaskr import model_utils, models as mbta_models
+from flaskr.database import db
+
+
+def partitioned_tables() -> typing.List[Table]:
+    return [
+        table
+        for table in db.metadata.sorted_tables
+        if model_utils.is_partitioned_table(table)
+    ]
+
+
+for partitioned_table in partitioned_tables():
+    event.listen(
+        partitioned_table,
+        "after_create",
+        DDL(
+            "CREATE TABLE IF NOT EXISTS %(table)s_default PARTITION OF %(table)s DEFAULT"
+        ).execute_if(dialect="postgresql"),
+    )
+
+
+def partition_name(table: Table, feed_version: str) -> str:
+    """Feed versions are free text, so partitions are named by a digest of the version"""
+    digest = hashlib.sha1(feed_version.encode("utf-8")).hexdigest()[:12]
+    return f"{table.name}_{digest}"
+
+
+def staging_name(table: Table, feed_version: str) -> str:
+    return partition_name(table, feed_version) + "_staging"
+
+
+def create_staging_table(db: SQLAlchemy, table: Table, feed_version: str) -> Table:
+    """
+    Create an empty table shaped like table to load feed_version's rows into,
+    returning a Table to insert with. Its CHECK constraint matches the partition
+    bound, so attaching it doesn't need to scan it again.
+    """
+    name = staging_name(table, feed_version)
+    with db.get_engine().begin() as connection:
+        connection.execute(f"DROP TABLE IF EXISTS {name}")
+        connection.execute(
+            f"CREATE TABLE {name} (LIKE {table.name} INCLUDING DEFAULTS)"
+        )
+        connection.execute(
+            f"ALTER TABLE {name} ADD CONSTRAINT {name}_feed_version "
+            f"CHECK (feed_version = {_literal(feed_version)})"
+        )
+    return staging_table(table, feed_version)
+
+
+def staging_table(table: Table, feed_version: str) -> Table:
+    """A Table to insert into feed_version's existing staging table of table with"""
+    return Table(
+        staging_name(table, feed_version),
+        MetaData(),
+        *(Column(column.name, column.type) for column in table.columns),
+    )
+
+
+def staging_table_exists(db: SQLAlchemy, table: Table, feed_version: str) -> bool:
+    return db.get_engine().has_table(staging_name(table, feed_version))
+
+
+def attach_staging_table(db: SQLAlchemy, table: Table, feed_version: str) -> float:
+    """
+    Make the loaded staging table feed_version's partition of table, replacing
+    any partition the version already had. Returns the seconds taken.
+    """
+    start = time.perf_counter()
+    staging = staging_name(table, feed_version)
+    partition = partition_name(table, feed_version)
+    with db.get_engine().begin() as connection:
+        connection.execute(f"DROP TABLE IF EXISTS {partition}")
+        connection.execute(f"ALTER TABLE {staging} RENAME TO {partition}")
+        connection.execute(
+            f"ALTER TABLE {table.name} ATTACH PARTITION {partition} "
+            f"FOR VALUES IN ({_literal(feed_version)})"
+        )
+    elapsed = time.perf_counter() - start
+    print(f"Attached partition {partition} of {table.name} in {elapsed:.2f}s")
+    return elapsed
+
+
+def drop_partitions(db: SQLAlchemy, feed_version: str):
+    with db.get_engine().begin() as connection:
+        for table in partitioned_tables():
+            connection.execute(
+                f"DROP TABLE IF EXISTS {partition_name(table, feed_version)}"
+            )
+
+
+def drop_staging_tables(db: SQLAlchemy, feed_version: str):
+    """Drop the staging tables left by an interrupted load of feed_version"""
+    with db.get_engine().begin() as connection:
+        for table in partitioned_tables():
+            connection.execute(
+                f"DROP TABLE IF EXISTS {staging_name(table, feed_version)}"
+            )
+
+
+def retire_feed(db: SQLAlchemy, feed_version: str):
+    """Drop the partitions of feed_version and forget the feed"""
+    print(f"Retiring feed {feed_version}")
+    drop_partitions(db, feed_version)
+    db.session.query(mbta_models.FeedInfo).filter(
+        mbta_models.FeedInfo.feed_version == feed_version
+    ).delete()
+    db.session.commit()
+
+
+def retire_other_feeds(db: SQLAlchemy, current_version: str):
+    """Retire every loaded feed except current_version"""
+    FeedInfo = mbta_models.FeedInfo
+    retired_versions = (
+        db.session.query(FeedInfo.feed_version)
+        .filter(FeedInfo.feed_version != current_version)
+        .all()
+    )
+    for (feed_version,) in retired_versions:
+        retire_feed(db, feed_version)
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
@@ -0,0 +1,199 @@
+"""
+Opt-in cProfile and tracemalloc profiling of the loader's tables and the Celery tasks.
+
+Profiling is off unless the `profiling` section of the config turns on `cpu`
+and/or `memory`, or the MBTA_PROFILE environment variable names them
+(`cpu`, `memory`, `cpu,memory` or `all`; `none` turns both off whatever the
+config says). MBTA_PROFILE_DIR overrides the output `path`.
+
+Each profiled section writes, under <path>/<feed version>/:
+    <name>.prof          cProfile stats, for `python -m pstats` or snakeviz
+    <name>.memory.txt    traced memory peak and the top allocations made
+                         during the section and still held at its end
+Before Python 3.9 (no tracemalloc.reset_peak), the peak of a nested section
+counts from the start of the outermost one, and its report says so.
+A section nested in another (a table load inside the update task) is
+profiled on its own, and its time is left out of its parent's stats.
+"""
+import contextlib
+import cProfile
+import datetime
+import os
+import pathlib
+import re
+import tracemalloc
+import typing
+
+PROFILE_ENV = "MBTA_PROFILE"
+PROFILE_DIR_ENV = "MBTA_PROFILE_DIR"
+UNVERSIONED = "unversioned"
+# Frames of the profiler itself, left out of the allocation listing
+IGNORED_FRAMES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class ProfiledSection:
+    """A running profiled section. Set feed_version if it is only known once the section has run."""
+
+    def __init__(self, name: str, feed_version: typing.Optional[str]):
+        self.name = name
+        self.feed_version = feed_version
+        self.cpu_profile = None  # type: typing.Optional[cProfile.Profile]
+        self.start_snapshot = None  # type: typing.Optional[tracemalloc.Snapshot]
+        self.peak_memory = 0
+        self.cumulative_peak = False  # Whether peak_memory includes enclosing sections
+
+
+# The sections running in this process, innermost last
+_active_sections = []  # type: typing.List[ProfiledSection]
+
+
+def file_stem(text: str) -> str:
+    """Make a feed version or section name safe to use in a file path"""
+    return re.sub(r"[^\w.-]+", "_", text).strip("_") or UNVERSIONED
+
+
+class Profiler:
+    def __init__(
+        self,
+        path: pathlib.Path,
+        cpu: bool = False,
+        memory: bool = False,
+        top_allocations: int = 25,
+    ):
+        self.path = pathlib.Path(path)
+        self.cpu = cpu
+        self.memory = memory
+        self.top_allocations = top_allocations
+
+    @classmethod
+    def from_config(cls, config: typing.Dict) -> "Profiler":
+        """Create the profiler set up by the config's profiling section and the environment"""
+        settings = config.get("profiling", {})
+        cpu = settings.get("cpu", False)
+        memory = settings.get("memory", False)
+        modes = os.getenv(PROFILE_ENV)
+        if modes is not None:
+            modes_set = {mode.strip().lower() for mode in modes.split(",")}
+            unknown = modes_set - {"cpu", "memory", "all", "none", ""}
+            if unknown:
+                raise ValueError(
+                    f"Unknown {PROFILE_ENV} modes {sorted(unknown)}, "
+                    "expected cpu, memory, all or none"
+                )
+            cpu = bool(modes_set & {"cpu", "all"})
+            memory = bool(modes_set & {"memory", "all"})
+        path = os.getenv(PROFILE_DIR_ENV) or pathlib.Path(
+            pathlib.Path(__name__).absolute().parent, settings.get("path", "profiles")
+        )
+        return cls(path, cpu, memory, settings.get("top_allocations", 25))
+
+    @property
+    def enabled(self) -> bool:
+        return self.cpu or self.memory
+
+    @contextlib.contextmanager
+    def profile(
+        self, name: str, feed_version: typing.Optional[str] = None
+    ) -> typing.Iterator[ProfiledSection]:
+        """Profile the body of the with statement as section name of feed_version"""
+        section = ProfiledSection(name, feed_version)
+        if not self.enabled:
+            yield section
+            return
+
+        parent = _active_sections[-1] if _active_sections else None
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            else:
+                if parent:
+                    parent.peak_memory = max(
+                        parent.peak_memory, tracemalloc.get_traced_memory()[1]
+                    )
+                if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+                    tracemalloc.reset_peak()
+                else:
+                    # The peak can't be restarted, so it still counts from when
+                    # tracing began in an enclosing section
+                    section.cumulative_peak = True
+            section.start_snapshot = tracemalloc.take_snapshot()
+        if self.cpu:
+            if parent and parent.cpu_profile:
+                parent.cpu_profile.disable()
+            section.cpu_profile = cProfile.Profile()
+            section.cpu_profile.enable()
+        _active_sections.append(section)
+        try:
+            yield section
+        finally:
+            _active_sections.pop()
+            if section.cpu_profile:
+                section.cpu_profile.disable()
+                if parent and parent.cpu_profile:
+                    parent.cpu_profile.enable()
+            snapshot = None
+            if section.start_snapshot:
+                section.peak_memory = max(
+                    section.peak_memory, tracemalloc.get_traced_memory()[1]
+                )
+                snapshot = tracemalloc.take_snapshot()
+                if parent:
+                    parent.peak_memory = max(parent.peak_memory, section.peak_memory)
+                if not any(active.start_snapshot for active in _active_sections):
+                    tracemalloc.stop()
+            self.write(section, snapshot)
+
+    def write(
+        self, section: ProfiledSection, snapshot: typing.Optional[tracemalloc.Snapshot]
+    ) -> typing.List[pathlib.Path]:
+        """Write the stats of a finished section, returning the files written"""
+        directory = pathlib.Path(self.path, file_stem(section.feed_version or ""))
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = file_stem(section.name)
+        written = []
+        if section.cpu_profile:
+            stats_path = pathlib.Path(directory, f"{stem}.prof")
+            section.cpu_profile.dump_stats(str(stats_path))
+            written.append(stats_path)
+        if snapshot:
+            memory_path = pathlib.Path(directory, f"{stem}.memory.txt")
+            memory_path.write_text(
+                self.memory_report(section, snapshot), encoding="utf-8"
+            )
+            written.append(memory_path)
+        print(f"Profiled {section.name}: {', '.join(str(path) for path in written)}")
+        return written
+
+    def memory_report(
+        self, section: ProfiledSection, snapshot: tracemalloc.Snapshot
+    ) -> str:
+        differences = snapshot.filter_traces(IGNORED_FRAMES).compare_to(
+            section.start_snapshot.filter_traces(IGNORED_FRAMES), "lineno"
+        )
+        growth = sorted(
+            (difference for difference in differences if difference.size_diff > 0),
+            key=lambda difference: difference.size_diff,
+            reverse=True,
+        )
+        lines = [
+            f"{section.name} of feed {section.feed_version or UNVERSIONED}",
+            f"Written {datetime.datetime.now().isoformat(timespec='seconds')}",
+            f"Peak traced memory: {section.peak_memory / 2 ** 20:.1f} MiB"
+            + (
+                " (since an enclosing section began; no reset_peak before Python 3.9)"
+                if section.cumulative_peak
+                else ""
+            ),
+            f"Top {self.top_allocations} allocations still held at the end:",
+        ]
+        for difference in growth[: self.top_allocations]:
+            frame = difference.traceback[0]
+            lines.append(
+                f"{difference.size_diff / 1024:10.1f} KiB {difference.count_diff:9} blocks"
+                f"  {frame.filename}:{frame.lineno}"
+            )
+        return "\n".join(lines) + "\n"
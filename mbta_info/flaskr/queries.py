@@ -0,0 +1,253 @@
+"""Read queries over the loaded feed, shared by the API and other consumers"""
+
+import datetime
+import typing
+
+from sqlalchemy import func, select, tuple_
+
+from flaskr import pagination, views, models as mbta_models
+from flaskr.database import db
+
+WEEKDAYS = (
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+)
+# A stop may be visited twice by looping trips, so stop_sequence completes the key
+DEPARTURE_SORT_KEY = (
+    mbta_models.StopTime.departure_time,
+    mbta_models.StopTime.trip_id,
+    mbta_models.StopTime.stop_sequence,
+)
+
+
+def current_feed_version():
+    """The version of the most recently loaded feed as a scalar subquery, so that
+    filtering stop_time or shape on it prunes their other partitions at run time"""
+    FeedInfo = mbta_models.FeedInfo
+    return (
+        select([FeedInfo.feed_version])
+        .order_by(FeedInfo.created.desc().nullslast())
+        .limit(1)
+        .as_scalar()
+    )
+
+
+def active_service_ids(service_date: datetime.date) -> typing.Set[str]:
+    """Return the ids of services running on service_date, applying calendar_dates exceptions"""
+    Calendar = mbta_models.Calendar
+    CalendarDate = mbta_models.CalendarDate
+
+    weekday_column = getattr(Calendar, WEEKDAYS[service_date.weekday()])
+    service_ids = {
+        row[0]
+        for row in db.session.query(Calendar.service_id).filter(
+            weekday_column.is_(True),
+            Calendar.start_date <= service_date,
+            Calendar.end_date >= service_date,
+        )
+    }
+    exceptions = db.session.query(
+        CalendarDate.service_id, CalendarDate.exception_type
+    ).filter(CalendarDate.date == service_date)
+    return apply_date_exceptions(service_ids, exceptions)
+
+
+def apply_date_exceptions(
+    service_ids: typing.Set[str],
+    exceptions: typing.Iterable[typing.Tuple[str, mbta_models.DateExceptionType]],
+) -> typing.Set[str]:
+    """Add the services calendar_dates adds on a date and remove those it removes"""
+    for service_id, exception_type in exceptions:
+        if exception_type is mbta_models.DateExceptionType.type_1:
+            service_ids.add(service_id)
+        else:
+            service_ids.discard(service_id)
+    return service_ids
+
+
+def get_stops(
+    parent_station: typing.Optional[str] = None,
+) -> typing.List[mbta_models.Stop]:
+    Stop = mbta_models.Stop
+    query = _with_coordinates(db.session.query(Stop), Stop)
+    if parent_station:
+        query = query.filter(Stop.parent_station == parent_station)
+    return _cache_coordinates(query.order_by(Stop.stop_id))
+
+
+def get_stop(stop_id: str) -> typing.Optional[mbta_models.Stop]:
+    Stop = mbta_models.Stop
+    query = _with_coordinates(db.session.query(Stop), Stop)
+    stops = _cache_coordinates(query.filter(Stop.stop_id == stop_id))
+    return stops[0] if stops else None
+
+
+def get_routes(
+    route_type: typing.Optional[mbta_models.RouteType] = None,
+) -> typing.List[mbta_models.Route]:
+    Route = mbta_models.Route
+    query = db.session.query(Route)
+    if route_type:
+        query = query.filter(Route.route_type == route_type)
+    return query.order_by(Route.route_sort_order, Route.route_id).all()
+
+
+def get_route(route_id: str) -> typing.Optional[mbta_models.Route]:
+    return db.session.query(mbta_models.Route).get(route_id)
+
+
+def get_stop_route_ids(stop_id: str) -> typing.List[str]:
+    """Return the ids of routes serving stop_id, read from the route_stop view's index alone"""
+    route_stop = views.route_stop
+    query = (
+        db.session.query(route_stop.c.route_id)
+        .filter(route_stop.c.stop_id == stop_id)
+        .order_by(route_stop.c.route_id)
+    )
+    return [route_id for route_id, in query]
+
+
+def get_route_stop_ids(route_id: str) -> typing.List[str]:
+    """Return the ids of stops served by route_id, read from the route_stop view's index alone"""
+    route_stop = views.route_stop
+    query = (
+        db.session.query(route_stop.c.stop_id)
+        .filter(route_stop.c.route_id == route_id)
+        .order_by(route_stop.c.stop_id)
+    )
+    return [stop_id for stop_id, in query]
+
+
+def get_trip(trip_id: str) -> typing.Optional[mbta_models.Trip]:
+    return db.session.query(mbta_models.Trip).get(trip_id)
+
+
+def get_trip_stop_times(trip_id: str) -> typing.List[mbta_models.StopTime]:
+    StopTime = mbta_models.StopTime
+    return (
+        db.session.query(StopTime)
+        .filter(
+            StopTime.feed_version == current_feed_version(),
+            StopTime.trip_id == trip_id,
+        )
+        .order_by(StopTime.stop_sequence)
+        .all()
+    )
+
+
+def get_scheduled_times(
+    trip_stops: typing.Set[typing.Tuple[str, int]]
+) -> typing.Dict[typing.Tuple[str, int], typing.Tuple[int, int]]:
+    """Map (trip_id, stop_sequence) pairs to their scheduled (arrival_time, departure_time)"""
+    StopTime = mbta_models.StopTime
+    rows = db.session.query(
+        StopTime.trip_id,
+        StopTime.stop_sequence,
+        StopTime.arrival_time,
+        StopTime.departure_time,
+    ).filter(
+        StopTime.feed_version == current_feed_version(),
+        tuple_(StopTime.trip_id, StopTime.stop_sequence).in_(sorted(trip_stops)),
+    )
+    return {
+        (trip_id, stop_sequence): (arrival_time, departure_time)
+        for trip_id, stop_sequence, arrival_time, departure_time in rows
+    }
+
+
+def get_pattern_stops(route_pattern_id: str) -> typing.List[mbta_models.PatternStop]:
+    PatternStop = mbta_models.PatternStop
+    return (
+        db.session.query(PatternStop)
+        .filter(PatternStop.route_pattern_id == route_pattern_id)
+        .order_by(PatternStop.stop_sequence)
+        .all()
+    )
+
+
+def get_route_pattern_stops(route_id: str) -> typing.List[mbta_models.PatternStop]:
+    """Return the stops of every pattern of route_id, in order along each pattern"""
+    PatternStop = mbta_models.PatternStop
+    return (
+        db.session.query(PatternStop)
+        .filter(PatternStop.route_id == route_id)
+        .order_by(PatternStop.route_pattern_id, PatternStop.stop_sequence)
+        .all()
+    )
+
+
+def get_departures(
+    stop_id: str,
+    service_date: datetime.date,
+    after: int,
+    cursor: typing.Optional[str],
+    limit: int,
+) -> pagination.Page:
+    """Page through (StopTime, route_id, trip_headsign) for departures from stop_id
+    at or after `after` seconds past midnight on service_date"""
+    StopTime = mbta_models.StopTime
+    Trip = mbta_models.Trip
+
+    service_ids = active_service_ids(service_date)
+    if not service_ids:
+        return pagination.Page([], None)
+    query = (
+        db.session.query(StopTime, Trip.route_id, Trip.trip_headsign)
+        .join(Trip, StopTime.trip_id == Trip.trip_id)
+        .filter(
+            StopTime.feed_version == current_feed_version(),
+            StopTime.stop_id == stop_id,
+            StopTime.departure_time >= after,
+            Trip.service_id.in_(service_ids),
+        )
+    )
+    return pagination.keyset_page(query, DEPARTURE_SORT_KEY, cursor, limit)
+
+
+def get_shape_points(
+    shape_id: str, cursor: typing.Optional[str], limit: int
+) -> pagination.Page:
+    Shape = mbta_models.Shape
+    query = _with_coordinates(db.session.query(Shape), Shape).filter(
+        Shape.feed_version == current_feed_version(), Shape.shape_id == shape_id
+    )
+    page = pagination.model_page(Shape, query, cursor, limit)
+    page.items = _cache_coordinates(page.items)
+    return page
+
+
+def get_route_trips(
+    route_id: str, cursor: typing.Optional[str], limit: int
+) -> pagination.Page:
+    Trip = mbta_models.Trip
+    query = db.session.query(Trip).filter(Trip.route_id == route_id)
+    return pagination.model_page(Trip, query, cursor, limit)
+
+
+def get_service_dates(
+    service_id: str, cursor: typing.Optional[str], limit: int
+) -> pagination.Page:
+    CalendarDate = mbta_models.CalendarDate
+    query = db.session.query(CalendarDate).filter(CalendarDate.service_id == service_id)
+    return pagination.model_page(CalendarDate, query, cursor, limit)
+
+
+def _with_coordinates(query, model):
+    lonlat_column = getattr(model, model.lonlat_field)
+    return query.add_columns(func.ST_X(lonlat_column), func.ST_Y(lonlat_column))
+
+
+def _cache_coordinates(rows: typing.Iterable) -> typing.List:
+    """Fill GeoMixin lon/lat caches from columns fetched alongside each instance,
+    so serializing many instances doesn't cost a query apiece"""
+    instances = []
+    for instance, longitude, latitude in rows:
+        instance._longitude_cache = longitude
+        instance._latitude_cache = latitude
+        instances.append(instance)
+    return instances
@@ -0,0 +1,307 @@
+"""
+Active GTFS-realtime service alerts, indexed by the routes, stops and trips they inform.
+
+Each alert is filed under every route_id, stop_id, trip_id and route_type its
+informed entities name, or as agency-wide when an entity names none of them,
+so the alerts of a stop are one dictionary lookup plus the agency-wide ones.
+Alerts are kept until the end of their last active period, held in a heap so
+that each read evicts what has expired without scanning the rest.
+"""
+import heapq
+import threading
+import time
+import typing
+
+from flask import Flask
+
+from flaskr.realtime.gtfs_rt import (
+    Cause,
+    Effect,
+    Incrementality,
+    SeverityLevel,
+    enum_member,
+)
+
+OPEN_ENDED = 2 ** 64  # End of an active period without one
+DEFAULT_LANGUAGE = "en"
+
+
+def translated_text(
+    translated_string: typing.Optional[typing.Dict], language: str = DEFAULT_LANGUAGE
+) -> typing.Optional[str]:
+    """Pick the language's translation of a decoded TranslatedString, or else its first"""
+    translations = (translated_string or {}).get("translation", [])
+    for translation in translations:
+        if translation.get("language", language) == language:
+            return translation.get("text")
+    return translations[0].get("text") if translations else None
+
+
+class Alert:
+    __slots__ = (
+        "alert_id",
+        "active_periods",
+        "route_ids",
+        "stop_ids",
+        "trip_ids",
+        "route_types",
+        "agency_wide",
+        "cause",
+        "effect",
+        "severity_level",
+        "header_text",
+        "description_text",
+        "url",
+    )
+
+    def __init__(
+        self,
+        alert_id: str,
+        active_periods: typing.Sequence[typing.Tuple[int, int]] = (),
+        route_ids: typing.FrozenSet[str] = frozenset(),
+        stop_ids: typing.FrozenSet[str] = frozenset(),
+        trip_ids: typing.FrozenSet[str] = frozenset(),
+        route_types: typing.FrozenSet[int] = frozenset(),
+        agency_wide: bool = False,
+        cause: Cause = Cause.UNKNOWN_CAUSE,
+        effect: Effect = Effect.UNKNOWN_EFFECT,
+        severity_level: SeverityLevel = SeverityLevel.UNKNOWN_SEVERITY,
+        header_text: typing.Optional[str] = None,
+        description_text: typing.Optional[str] = None,
+        url: typing.Optional[str] = None,
+    ):
+        self.alert_id = alert_id
+        # (start, end) POSIX times, with 0 and OPEN_ENDED for missing bounds
+        self.active_periods = tuple(active_periods)
+        self.route_ids = route_ids
+        self.stop_ids = stop_ids
+        self.trip_ids = trip_ids
+        self.route_types = route_types
+        self.agency_wide = agency_wide
+        self.cause = cause
+        self.effect = effect
+        self.severity_level = severity_level
+        self.header_text = header_text
+        self.description_text = description_text
+        self.url = url
+
+    @classmethod
+    def from_entity(cls, entity: typing.Dict) -> typing.Optional["Alert"]:
+        """Build an alert from a decoded FeedEntity, or None if it has no alert"""
+        alert = entity.get("alert")
+        if alert is None:
+            return None
+        route_ids, stop_ids, trip_ids, route_types = set(), set(), set(), set()
+        agency_wide = False
+        for selector in alert.get("informed_entity", []):
+            trip_id = selector.get("trip", {}).get("trip_id")
+            if trip_id:
+                trip_ids.add(trip_id)
+            if "route_id" in selector:
+                route_ids.add(selector["route_id"])
+            if "stop_id" in selector:
+                stop_ids.add(selector["stop_id"])
+            if "route_type" in selector and "route_id" not in selector:
+                route_types.add(selector["route_type"])
+            if not (trip_id or {"route_id", "stop_id", "route_type"} & set(selector)):
+                agency_wide = True
+        return cls(
+            entity["id"],
+            [
+                (period.get("start", 0), period.get("end") or OPEN_ENDED)
+                for period in alert.get("active_period", [])
+            ],
+            frozenset(route_ids),
+            frozenset(stop_ids),
+            frozenset(trip_ids),
+            frozenset(route_types),
+            agency_wide,
+            enum_member(Cause, alert.get("cause"), Cause.UNKNOWN_CAUSE),
+            enum_member(Effect, alert.get("effect"), Effect.UNKNOWN_EFFECT),
+            enum_member(
+                SeverityLevel,
+                alert.get("severity_level"),
+                SeverityLevel.UNKNOWN_SEVERITY,
+            ),
+            translated_text(alert.get("header_text")),
+            translated_text(alert.get("description_text")),
+            translated_text(alert.get("url")),
+        )
+
+    @property
+    def expires(self) -> int:
+        """The end of the last active period; an alert without periods is always active"""
+        return max((end for _, end in self.active_periods), default=OPEN_ENDED)
+
+    def is_active(self, now: float) -> bool:
+        if not self.active_periods:
+            return True
+        return any(start <= now < end for start, end in self.active_periods)
+
+    def serialize(self) -> typing.Dict:
+        return {
+            "alert_id": self.alert_id,
+            "active_periods": [
+                {"start": start or None, "end": None if end == OPEN_ENDED else end}
+                for start, end in self.active_periods
+            ],
+            "route_ids": sorted(self.route_ids),
+            "stop_ids": sorted(self.stop_ids),
+            "trip_ids": sorted(self.trip_ids),
+            "route_types": sorted(self.route_types),
+            "agency_wide": self.agency_wide,
+            "cause": self.cause.name,
+            "effect": self.effect.name,
+            "severity_level": self.severity_level.name,
+            "header_text": self.header_text,
+            "description_text": self.description_text,
+            "url": self.url,
+        }
+
+    def __repr__(self):
+        return f"<Alert(alert_id={self.alert_id}, effect={self.effect.name})>"
+
+
+class AlertStore:
+    """Alerts by id and by informed route, stop, trip and route type. Safe to read while a poller updates it."""
+
+    def __init__(self, clock: typing.Callable[[], float] = time.time):
+        self.clock = clock
+        self.feed_timestamp = 0
+        self._alerts = {}  # type: typing.Dict[str, Alert]
+        self._by_route = {}  # type: typing.Dict[str, typing.Set[str]]
+        self._by_stop = {}  # type: typing.Dict[str, typing.Set[str]]
+        self._by_trip = {}  # type: typing.Dict[str, typing.Set[str]]
+        self._by_route_type = {}  # type: typing.Dict[int, typing.Set[str]]
+        self._agency_wide = set()  # type: typing.Set[str]
+        # (expires, alert_id), with entries of replaced alerts left to be skipped
+        self._expiry_heap = []  # type: typing.List[typing.Tuple[int, str]]
+        self._scheduled = set()  # type: typing.Set[typing.Tuple[int, str]]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def get(self, alert_id: str) -> typing.Optional[Alert]:
+        return self._alerts.get(alert_id)
+
+    def _indexes(self, alert: Alert):
+        for index, keys in (
+            (self._by_route, alert.route_ids),
+            (self._by_stop, alert.stop_ids),
+            (self._by_trip, alert.trip_ids),
+            (self._by_route_type, alert.route_types),
+        ):
+            for key in keys:
+                yield index, key
+
+    def update(self, alert: Alert):
+        with self._lock:
+            self._remove(alert.alert_id)
+            self._alerts[alert.alert_id] = alert
+            for index, key in self._indexes(alert):
+                index.setdefault(key, set()).add(alert.alert_id)
+            if alert.agency_wide:
+                self._agency_wide.add(alert.alert_id)
+            expiry = (alert.expires, alert.alert_id)
+            # Alerts are re-sent every poll; schedule each expiry once
+            if alert.expires != OPEN_ENDED and expiry not in self._scheduled:
+                heapq.heappush(self._expiry_heap, expiry)
+                self._scheduled.add(expiry)
+
+    def remove(self, alert_id: str):
+        with self._lock:
+            self._remove(alert_id)
+
+    def _remove(self, alert_id: str):
+        alert = self._alerts.pop(alert_id, None)
+        if alert is None:
+            return
+        for index, key in self._indexes(alert):
+            index[key].discard(alert_id)
+            if not index[key]:
+                del index[key]
+        self._agency_wide.discard(alert_id)
+
+    def evict_expired(self, now: typing.Optional[float] = None) -> int:
+        """Remove the alerts whose last active period has ended, returning how many"""
+        now = self.clock() if now is None else now
+        evicted = 0
+        with self._lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                expires, alert_id = heapq.heappop(self._expiry_heap)
+                self._scheduled.discard((expires, alert_id))
+                alert = self._alerts.get(alert_id)
+                # Skip entries left by alerts since replaced with other periods
+                if alert and alert.expires == expires:
+                    self._remove(alert_id)
+                    evicted += 1
+        return evicted
+
+    def _active(
+        self, index: typing.Dict, key: typing.Hashable, now: typing.Optional[float]
+    ) -> typing.List[Alert]:
+        now = self.clock() if now is None else now
+        self.evict_expired(now)
+        with self._lock:
+            alert_ids = index.get(key, set()) | self._agency_wide
+            alerts = [self._alerts[alert_id] for alert_id in alert_ids]
+        return sorted(
+            (alert for alert in alerts if alert.is_active(now)),
+            key=lambda alert: alert.alert_id,
+        )
+
+    def for_route(
+        self, route_id: str, now: typing.Optional[float] = None
+    ) -> typing.List[Alert]:
+        """The alerts active now (or at now) that inform route_id or the whole agency"""
+        return self._active(self._by_route, route_id, now)
+
+    def for_stop(
+        self, stop_id: str, now: typing.Optional[float] = None
+    ) -> typing.List[Alert]:
+        return self._active(self._by_stop, stop_id, now)
+
+    def for_trip(
+        self, trip_id: str, now: typing.Optional[float] = None
+    ) -> typing.List[Alert]:
+        return self._active(self._by_trip, trip_id, now)
+
+    def for_route_type(
+        self, route_type: int, now: typing.Optional[float] = None
+    ) -> typing.List[Alert]:
+        return self._active(self._by_route_type, route_type, now)
+
+    def apply_entity(self, entity: typing.Dict) -> typing.Optional[str]:
+        if entity.get("is_deleted"):
+            self.remove(entity["id"])
+            return None
+        alert = Alert.from_entity(entity)
+        if alert is None:
+            return None
+        self.update(alert)
+        return alert.alert_id
+
+    def finish_feed(self, header: typing.Dict, alert_ids: typing.Set[str]):
+        incrementality = header.get("incrementality", Incrementality.FULL_DATASET.value)
+        if incrementality == Incrementality.FULL_DATASET.value:
+            # Alerts missing from a full dataset were withdrawn
+            for alert_id in set(self._alerts) - alert_ids:
+                self.remove(alert_id)
+        self.evict_expired()
+        self.feed_timestamp = header.get("timestamp", 0)
+
+
+def init_app(app: Flask, realtime_config: typing.Dict):
+    """Poll service alerts in this web process for the API's alert reads"""
+    from flaskr.realtime.poller import poll_in_app
+
+    store = AlertStore()
+    app.extensions["service_alerts"] = store
+    poll_in_app(
+        app,
+        store,
+        "service_alerts",
+        realtime_config.get("service_alerts_url"),
+        realtime_config.get("poll_interval", 15),
+    )
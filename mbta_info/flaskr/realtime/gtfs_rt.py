@@ -0,0 +1,370 @@
+"""
+Decode GTFS-realtime feeds without the generated protobuf bindings.
+
+Messages are read straight from the protobuf wire format into dicts keyed by
+the field names of gtfs-realtime.proto, for the messages and fields listed in
+MESSAGES; other fields are skipped. Enum fields are returned as their numbers.
+
+FeedDecoder is fed a FeedMessage as it downloads, chunk by chunk, and returns
+each FeedEntity as soon as its bytes have arrived, so only one entity is ever
+buffered rather than the whole feed.
+
+Reference: https://gtfs.org/realtime/reference/
+"""
+import enum
+import struct
+import typing
+
+VARINT = 0
+FIXED64 = 1
+LENGTH_DELIMITED = 2
+FIXED32 = 5
+
+# Field value kinds; any other kind is the name of a nested message
+STRING = "string"
+UINT = "uint"
+INT = "int"
+BOOL = "bool"
+FLOAT = "float"
+DOUBLE = "double"
+
+# Message name: {field number: (field name, kind, repeated)}
+MESSAGES = {
+    "FeedMessage": {
+        1: ("header", "FeedHeader", False),
+        2: ("entity", "FeedEntity", True),
+    },
+    "FeedHeader": {
+        1: ("gtfs_realtime_version", STRING, False),
+        2: ("incrementality", UINT, False),
+        3: ("timestamp", UINT, False),
+    },
+    "FeedEntity": {
+        1: ("id", STRING, False),
+        2: ("is_deleted", BOOL, False),
+        3: ("trip_update", "TripUpdate", False),
+        4: ("vehicle", "VehiclePosition", False),
+        5: ("alert", "Alert", False),
+    },
+    "TripUpdate": {
+        1: ("trip", "TripDescriptor", False),
+        2: ("stop_time_update", "StopTimeUpdate", True),
+        3: ("vehicle", "VehicleDescriptor", False),
+        4: ("timestamp", UINT, False),
+        5: ("delay", INT, False),
+    },
+    "StopTimeUpdate": {
+        1: ("stop_sequence", UINT, False),
+        2: ("arrival", "StopTimeEvent", False),
+        3: ("departure", "StopTimeEvent", False),
+        4: ("stop_id", STRING, False),
+        5: ("schedule_relationship", UINT, False),
+    },
+    "StopTimeEvent": {
+        1: ("delay", INT, False),
+        2: ("time", INT, False),
+        3: ("uncertainty", INT, False),
+    },
+    "VehiclePosition": {
+        1: ("trip", "TripDescriptor", False),
+        2: ("position", "Position", False),
+        3: ("current_stop_sequence", UINT, False),
+        4: ("current_status", UINT, False),
+        5: ("timestamp", UINT, False),
+        6: ("congestion_level", UINT, False),
+        7: ("stop_id", STRING, False),
+        8: ("vehicle", "VehicleDescriptor", False),
+        9: ("occupancy_status", UINT, False),
+    },
+    "Position": {
+        1: ("latitude", FLOAT, False),
+        2: ("longitude", FLOAT, False),
+        3: ("bearing", FLOAT, False),
+        4: ("odometer", DOUBLE, False),
+        5: ("speed", FLOAT, False),
+    },
+    "TripDescriptor": {
+        1: ("trip_id", STRING, False),
+        2: ("start_time", STRING, False),
+        3: ("start_date", STRING, False),
+        4: ("schedule_relationship", UINT, False),
+        5: ("route_id", STRING, False),
+        6: ("direction_id", UINT, False),
+    },
+    "Alert": {
+        1: ("active_period", "TimeRange", True),
+        5: ("informed_entity", "EntitySelector", True),
+        6: ("cause", UINT, False),
+        7: ("effect", UINT, False),
+        8: ("url", "TranslatedString", False),
+        10: ("header_text", "TranslatedString", False),
+        11: ("description_text", "TranslatedString", False),
+        14: ("severity_level", UINT, False),
+    },
+    "TimeRange": {1: ("start", UINT, False), 2: ("end", UINT, False)},
+    "EntitySelector": {
+        1: ("agency_id", STRING, False),
+        2: ("route_id", STRING, False),
+        3: ("route_type", INT, False),
+        4: ("trip", "TripDescriptor", False),
+        5: ("stop_id", STRING, False),
+        6: ("direction_id", UINT, False),
+    },
+    "TranslatedString": {1: ("translation", "Translation", True)},
+    "Translation": {1: ("text", STRING, False), 2: ("language", STRING, False)},
+    "VehicleDescriptor": {
+        1: ("id", STRING, False),
+        2: ("label", STRING, False),
+        3: ("license_plate", STRING, False),
+    },
+}  # type: typing.Dict[str, typing.Dict[int, typing.Tuple[str, str, bool]]]
+
+WIRE_TYPES = {
+    STRING: LENGTH_DELIMITED,
+    UINT: VARINT,
+    INT: VARINT,
+    BOOL: VARINT,
+    FLOAT: FIXED32,
+    DOUBLE: FIXED64,
+}
+
+
+class Incrementality(enum.Enum):
+    FULL_DATASET = 0
+    DIFFERENTIAL = 1
+
+
+class TripScheduleRelationship(enum.Enum):
+    SCHEDULED = 0
+    ADDED = 1
+    UNSCHEDULED = 2
+    CANCELED = 3
+
+
+class StopScheduleRelationship(enum.Enum):
+    SCHEDULED = 0
+    SKIPPED = 1
+    NO_DATA = 2
+
+
+class Cause(enum.Enum):
+    UNKNOWN_CAUSE = 1
+    OTHER_CAUSE = 2
+    TECHNICAL_PROBLEM = 3
+    STRIKE = 4
+    DEMONSTRATION = 5
+    ACCIDENT = 6
+    HOLIDAY = 7
+    WEATHER = 8
+    MAINTENANCE = 9
+    CONSTRUCTION = 10
+    POLICE_ACTIVITY = 11
+    MEDICAL_EMERGENCY = 12
+
+
+class Effect(enum.Enum):
+    NO_SERVICE = 1
+    REDUCED_SERVICE = 2
+    SIGNIFICANT_DELAYS = 3
+    DETOUR = 4
+    ADDITIONAL_SERVICE = 5
+    MODIFIED_SERVICE = 6
+    OTHER_EFFECT = 7
+    UNKNOWN_EFFECT = 8
+    STOP_MOVED = 9
+    NO_EFFECT = 10
+    ACCESSIBILITY_ISSUE = 11
+
+
+class SeverityLevel(enum.Enum):
+    UNKNOWN_SEVERITY = 1
+    INFO = 2
+    WARNING = 3
+    SEVERE = 4
+
+
+class VehicleStopStatus(enum.Enum):
+    INCOMING_AT = 0
+    STOPPED_AT = 1
+    IN_TRANSIT_TO = 2
+
+
+EnumMember = typing.TypeVar("EnumMember", bound=enum.Enum)
+
+
+def enum_member(
+    enum_class: typing.Type[EnumMember],
+    value: typing.Optional[int],
+    default: EnumMember,
+) -> EnumMember:
+    """The member of enum_class with value, or default for a missing value or one
+    without a member, such as a value added to the spec since or an agency extension"""
+    try:
+        return enum_class(value)
+    except ValueError:
+        return default
+
+
+class DecodeError(ValueError):
+    pass
+
+
+class _Incomplete(Exception):
+    """More bytes are needed to decode the next field"""
+
+
+def read_varint(data: bytes, pos: int) -> typing.Tuple[int, int]:
+    """Return the varint at pos and the position after it"""
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise _Incomplete()
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+        if shift >= 70:
+            raise DecodeError("Varint longer than 10 bytes")
+
+
+def read_field(
+    data: bytes, pos: int
+) -> typing.Tuple[int, int, typing.Union[int, bytes], int]:
+    """Return the field number, wire type and raw value of the field at pos, and the position after it"""
+    key, pos = read_varint(data, pos)
+    field_number, wire_type = key >> 3, key & 0x7
+    if wire_type == VARINT:
+        value, pos = read_varint(data, pos)
+        return field_number, wire_type, value, pos
+    if wire_type == LENGTH_DELIMITED:
+        length, pos = read_varint(data, pos)
+        end = pos + length
+    elif wire_type == FIXED64:
+        end = pos + 8
+    elif wire_type == FIXED32:
+        end = pos + 4
+    else:
+        raise DecodeError(f"Unsupported wire type {wire_type} of field {field_number}")
+    if end > len(data):
+        raise _Incomplete()
+    return field_number, wire_type, bytes(data[pos:end]), end
+
+
+def convert_value(kind: str, value: typing.Union[int, bytes]) -> typing.Any:
+    if kind == STRING:
+        return value.decode("utf-8")
+    if kind == UINT:
+        return value
+    if kind == INT:
+        # Negative int32 and int64 values are sent as 64-bit two's complement
+        return value - (1 << 64) if value >= 1 << 63 else value
+    if kind == BOOL:
+        return bool(value)
+    if kind == FLOAT:
+        return struct.unpack("<f", value)[0]
+    if kind == DOUBLE:
+        return struct.unpack("<d", value)[0]
+    return decode_message(value, kind)
+
+
+def decode_message(data: bytes, message_name: str) -> typing.Dict[str, typing.Any]:
+    """Decode the known fields of a whole message_name message"""
+    fields = MESSAGES[message_name]
+    message = {}  # type: typing.Dict[str, typing.Any]
+    pos = 0
+    try:
+        while pos < len(data):
+            field_number, wire_type, value, pos = read_field(data, pos)
+            if field_number not in fields:
+                continue
+            name, kind, repeated = fields[field_number]
+            expected_wire_type = WIRE_TYPES.get(kind, LENGTH_DELIMITED)
+            if wire_type != expected_wire_type:
+                raise DecodeError(
+                    f"{message_name}.{name} has wire type {wire_type}, expected {expected_wire_type}"
+                )
+            if repeated:
+                message.setdefault(name, []).append(convert_value(kind, value))
+            else:
+                message[name] = convert_value(kind, value)
+    except _Incomplete:
+        raise DecodeError(f"Truncated {message_name} message")
+    return message
+
+
+class FeedDecoder:
+    """Decode a FeedMessage fed in chunks, keeping its header and returning its entities as they complete"""
+
+    def __init__(self):
+        self.header = None  # type: typing.Optional[typing.Dict[str, typing.Any]]
+        self.entity_count = 0
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes) -> typing.List[typing.Dict[str, typing.Any]]:
+        self._buffer += chunk
+        entities = []
+        pos = 0
+        while pos < len(self._buffer):
+            try:
+                field_number, _, value, end = read_field(self._buffer, pos)
+            except _Incomplete:
+                break
+            pos = end
+            if field_number == 1:
+                self.header = decode_message(value, "FeedHeader")
+            elif field_number == 2:
+                entities.append(decode_message(value, "FeedEntity"))
+        del self._buffer[:pos]
+        self.entity_count += len(entities)
+        return entities
+
+    def close(self):
+        """Check that the feed ended on a field boundary"""
+        if self._buffer:
+            raise DecodeError(f"Feed ended inside a field ({len(self._buffer)} bytes)")
+        if self.header is None:
+            raise DecodeError("Feed has no header")
+
+
+def encode_varint(value: int) -> bytes:
+    if value < 0:
+        value += 1 << 64
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+
+def encode_message(
+    message: typing.Mapping[str, typing.Any], message_name: str
+) -> bytes:
+    """Encode a dict as decode_message returns it, e.g. to record a feed for tests"""
+    encoded = bytearray()
+    for field_number, (name, kind, repeated) in sorted(MESSAGES[message_name].items()):
+        if name not in message:
+            continue
+        wire_type = WIRE_TYPES.get(kind, LENGTH_DELIMITED)
+        for value in message[name] if repeated else [message[name]]:
+            encoded += encode_varint(field_number << 3 | wire_type)
+            if kind in (UINT, INT, BOOL):
+                encoded += encode_varint(int(value))
+            elif kind == FLOAT:
+                encoded += struct.pack("<f", value)
+            elif kind == DOUBLE:
+                encoded += struct.pack("<d", value)
+            else:
+                body = (
+                    value.encode("utf-8")
+                    if kind == STRING
+                    else encode_message(value, kind)
+                )
+                encoded += encode_varint(len(body)) + body
+    return bytes(encoded)
@@ -0,0 +1,132 @@
+"""
+Poll a GTFS-realtime feed into an in-memory store.
+
+Each poll streams the feed through a FeedDecoder, handing the store each
+entity as soon as it is decoded, then tells the store the feed is complete so
+it can drop what a full dataset no longer lists. Polls send If-Modified-Since,
+so an unchanged feed costs a 304 and no decoding.
+
+A store is any object with the methods:
+    apply_entity(entity: dict) -> key of what it stored, or None to ignore it
+    finish_feed(header: dict, keys: set of the keys applied from this feed)
+"""
+import threading
+import time
+import traceback
+import typing
+
+import requests
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from flaskr import models as mbta_models
+from flaskr.realtime.gtfs_rt import DecodeError, FeedDecoder
+
+CONNECT_TIMEOUT = 3.1
+READ_TIMEOUT = 6.2
+CHUNK_SIZE = 16384
+
+
+def linked_dataset_url(db: SQLAlchemy, feed_column: str) -> typing.Optional[str]:
+    """Return the URL of the unauthenticated linked dataset providing feed_column,
+    e.g. "vehicle_positions", if the loaded feed has one"""
+    LinkedDataset = mbta_models.LinkedDataset
+    linked_dataset = (
+        db.session.query(LinkedDataset)
+        .filter(getattr(LinkedDataset, feed_column) == 1)
+        .filter(
+            LinkedDataset.authentication_type == mbta_models.AuthenticationType.type_0
+        )
+        .order_by(LinkedDataset.id)
+        .first()
+    )
+    return linked_dataset.url if linked_dataset else None
+
+
+class FeedPoller:
+    def __init__(
+        self,
+        url: str,
+        store: typing.Any,
+        poll_interval: float,
+        chunk_size: int = CHUNK_SIZE,
+    ):
+        self.url = url
+        self.store = store
+        self.poll_interval = poll_interval
+        self.chunk_size = chunk_size
+        self.last_modified = None  # type: typing.Optional[str]
+        self.polls = 0
+        self.errors = 0
+
+    def poll(self) -> bool:
+        """Fetch the feed into the store, returning whether it had changed"""
+        headers = {}
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        self.polls += 1
+        with requests.get(
+            self.url,
+            headers=headers,
+            stream=True,
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+        ) as response:
+            if response.status_code == requests.codes.not_modified:
+                return False
+            response.raise_for_status()
+            decoder = FeedDecoder()
+            keys = set()
+            for chunk in response.iter_content(self.chunk_size):
+                for entity in decoder.feed(chunk):
+                    key = self.store.apply_entity(entity)
+                    if key is not None:
+                        keys.add(key)
+            decoder.close()
+            self.store.finish_feed(decoder.header, keys)
+            self.last_modified = response.headers.get("Last-Modified")
+        return True
+
+    def run(self, stop: threading.Event):
+        """Poll every poll_interval seconds until stop is set, reporting rather than raising errors"""
+        while not stop.is_set():
+            started = time.monotonic()
+            try:
+                self.poll()
+            except (requests.RequestException, DecodeError) as e:
+                self.errors += 1
+                print(f"Polling {self.url} failed: {e}")
+            except Exception as e:  # Whatever else a poll raises, the next may not
+                self.errors += 1
+                print(f"Polling {self.url} failed unexpectedly: {e!r}")
+                traceback.print_exc()
+            stop.wait(max(0.0, self.poll_interval - (time.monotonic() - started)))
+
+    def start(self) -> typing.Tuple[threading.Thread, threading.Event]:
+        """Poll in a daemon thread, returning it and the event that stops it"""
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self.run, args=(stop,), name=f"poll {self.url}", daemon=True
+        )
+        thread.start()
+        return thread, stop
+
+
+def poll_in_app(
+    app: Flask,
+    store: typing.Any,
+    feed_column: str,
+    url: typing.Optional[str],
+    poll_interval: float,
+):
+    """Poll a feed into store in a thread of the web process, from its first request on.
+    Without a url, the linked dataset providing feed_column is polled."""
+
+    @app.before_first_request
+    def start_polling():
+        from flaskr.database import db
+
+        feed_url = url or linked_dataset_url(db, feed_column)
+        if not feed_url:
+            print(f"No {feed_column} feed among the linked datasets; not polling")
+            return
+        FeedPoller(feed_url, store, poll_interval).start()
@@ -0,0 +1,314 @@
+"""
+GTFS-realtime trip updates, held as per-trip delay overlays on the static schedule.
+
+Each trip's StopTimeUpdates are kept in stop_sequence order in flat arrays.
+A departure's prediction comes from the trip's last update at or before its
+stop: the update's own time at its stop, and its delay carried forward to
+the later stops it does not list. Updates that only give absolute times are
+turned into delays against the static schedule the first time they are
+needed, and the delay is kept with the overlay. The static tables are never
+written to; overlay_departures annotates departures read from them.
+"""
+import array
+import bisect
+import datetime
+import threading
+import typing
+
+import pytz
+from flask import Flask
+
+from flaskr.realtime.gtfs_rt import (
+    Incrementality,
+    StopScheduleRelationship,
+    TripScheduleRelationship,
+)
+
+UNSET = -(2 ** 63)  # No value in an overlay array
+GTFS_DATE_FORMAT = "%Y%m%d"
+
+# (trip_id, stop_sequence) -> (scheduled arrival, scheduled departure), in
+# seconds past the start of the service day
+ScheduleLookup = typing.Callable[
+    [typing.Set[typing.Tuple[str, int]]],
+    typing.Dict[typing.Tuple[str, int], typing.Tuple[int, int]],
+]
+
+
+def service_day_start(service_date: datetime.date, timezone: pytz.BaseTzInfo) -> int:
+    """Return the POSIX time that GTFS times on service_date count from: noon minus 12 hours"""
+    noon = timezone.localize(datetime.datetime.combine(service_date, datetime.time(12)))
+    return int(noon.timestamp()) - 12 * 3600
+
+
+class TripOverlay:
+    """The stop time updates of one trip, ordered by stop_sequence"""
+
+    __slots__ = (
+        "trip_id",
+        "start_date",
+        "timestamp",
+        "canceled",
+        "stop_sequences",
+        "relationships",
+        "arrival_delays",
+        "arrival_times",
+        "departure_delays",
+        "departure_times",
+        "_resolved_delays",
+    )
+
+    def __init__(
+        self,
+        trip_id: str,
+        start_date: typing.Optional[str] = None,
+        timestamp: int = 0,
+        canceled: bool = False,
+    ):
+        self.trip_id = trip_id
+        self.start_date = start_date
+        self.timestamp = timestamp
+        self.canceled = canceled
+        self.stop_sequences = array.array("q")
+        self.relationships = array.array("b")
+        self.arrival_delays = array.array("q")
+        self.arrival_times = array.array("q")
+        self.departure_delays = array.array("q")
+        self.departure_times = array.array("q")
+        # Delays of absolute-time updates, by update index, worked out from the schedule
+        self._resolved_delays = {}  # type: typing.Dict[int, int]
+
+    @classmethod
+    def from_entity(cls, entity: typing.Dict) -> typing.Optional["TripOverlay"]:
+        """Build the overlay of a decoded FeedEntity, or None if it has no trip update"""
+        trip_update = entity.get("trip_update")
+        if not trip_update or "trip_id" not in trip_update.get("trip", {}):
+            return None
+        trip = trip_update["trip"]
+        overlay = cls(
+            trip["trip_id"],
+            trip.get("start_date"),
+            trip_update.get("timestamp", 0),
+            trip.get("schedule_relationship")
+            == TripScheduleRelationship.CANCELED.value,
+        )
+        # Updates without a stop_sequence can't be placed on the trip
+        updates = sorted(
+            (
+                update
+                for update in trip_update.get("stop_time_update", [])
+                if "stop_sequence" in update
+            ),
+            key=lambda update: update["stop_sequence"],
+        )
+        for update in updates:
+            arrival = update.get("arrival", {})
+            departure = update.get("departure", {})
+            overlay.stop_sequences.append(update["stop_sequence"])
+            overlay.relationships.append(
+                update.get(
+                    "schedule_relationship", StopScheduleRelationship.SCHEDULED.value
+                )
+            )
+            overlay.arrival_delays.append(arrival.get("delay", UNSET))
+            overlay.arrival_times.append(arrival.get("time", UNSET))
+            overlay.departure_delays.append(departure.get("delay", UNSET))
+            overlay.departure_times.append(departure.get("time", UNSET))
+        return overlay
+
+    def governing_update(self, stop_sequence: int) -> typing.Optional[int]:
+        """Return the index of the update whose delay applies at stop_sequence, if any.
+        Skipped stops pass on the delay of the update before them."""
+        index = bisect.bisect_right(self.stop_sequences, stop_sequence) - 1
+        while (
+            index >= 0
+            and self.relationships[index] == StopScheduleRelationship.SKIPPED.value
+            and self.stop_sequences[index] != stop_sequence
+        ):
+            index -= 1
+        return index if index >= 0 else None
+
+    def needs_schedule(self, index: int) -> bool:
+        """Whether the delay of update index can only be known from the schedule"""
+        return (
+            self.departure_delays[index] == UNSET
+            and self.arrival_delays[index] == UNSET
+            and index not in self._resolved_delays
+            and (
+                self.departure_times[index] != UNSET
+                or self.arrival_times[index] != UNSET
+            )
+        )
+
+    def delay(
+        self,
+        index: int,
+        day_start: int,
+        scheduled: typing.Optional[typing.Tuple[int, int]] = None,
+    ) -> typing.Optional[int]:
+        """Return the delay in seconds of update index, given the scheduled
+        (arrival, departure) at its stop when it only has absolute times"""
+        if self.departure_delays[index] != UNSET:
+            return self.departure_delays[index]
+        if self.arrival_delays[index] != UNSET:
+            return self.arrival_delays[index]
+        if index in self._resolved_delays:
+            return self._resolved_delays[index]
+        if scheduled is None:
+            return None
+        if self.departure_times[index] != UNSET:
+            delay = self.departure_times[index] - day_start - scheduled[1]
+        elif self.arrival_times[index] != UNSET:
+            delay = self.arrival_times[index] - day_start - scheduled[0]
+        else:
+            return None
+        self._resolved_delays[index] = delay
+        return delay
+
+    def predict(
+        self,
+        stop_sequence: int,
+        scheduled_departure: int,
+        day_start: int,
+        scheduled_at_update: typing.Optional[typing.Tuple[int, int]] = None,
+    ) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        """Return the realtime departure at stop_sequence, or None if the overlay has none"""
+        if self.canceled:
+            return {"status": "canceled", "departure_time": None, "delay": None}
+        index = self.governing_update(stop_sequence)
+        if index is None:
+            return None
+        relationship = self.relationships[index]
+        if relationship == StopScheduleRelationship.NO_DATA.value:
+            return None
+        if relationship == StopScheduleRelationship.SKIPPED.value:
+            return {"status": "skipped", "departure_time": None, "delay": None}
+        at_update = self.stop_sequences[index] == stop_sequence
+        if at_update and self.departure_times[index] != UNSET:
+            departure_time = self.departure_times[index] - day_start
+            delay = departure_time - scheduled_departure
+        else:
+            delay = self.delay(index, day_start, scheduled_at_update)
+            if delay is None:
+                return None
+            departure_time = scheduled_departure + delay
+        return {"status": "scheduled", "departure_time": departure_time, "delay": delay}
+
+
+class TripUpdateStore:
+    """The latest overlay of each trip. Safe to read while a poller updates it."""
+
+    def __init__(self, timezone: str = "America/New_York"):
+        self.timezone = pytz.timezone(timezone)
+        self.feed_timestamp = 0
+        self._overlays = {}  # type: typing.Dict[str, TripOverlay]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._overlays)
+
+    def get(self, trip_id: str) -> typing.Optional[TripOverlay]:
+        return self._overlays.get(trip_id)
+
+    def update(self, overlay: TripOverlay) -> bool:
+        """Store overlay unless a more recent one of the trip is held"""
+        with self._lock:
+            current = self._overlays.get(overlay.trip_id)
+            if current and overlay.timestamp and overlay.timestamp < current.timestamp:
+                return False
+            self._overlays[overlay.trip_id] = overlay
+            return True
+
+    def remove(self, trip_id: str):
+        with self._lock:
+            self._overlays.pop(trip_id, None)
+
+    def apply_entity(self, entity: typing.Dict) -> typing.Optional[str]:
+        if entity.get("is_deleted"):
+            trip_id = entity.get("trip_update", {}).get("trip", {}).get("trip_id")
+            if trip_id:
+                self.remove(trip_id)
+            return None
+        overlay = TripOverlay.from_entity(entity)
+        if overlay is None:
+            return None
+        self.update(overlay)
+        return overlay.trip_id
+
+    def finish_feed(self, header: typing.Dict, trip_ids: typing.Set[str]):
+        incrementality = header.get("incrementality", Incrementality.FULL_DATASET.value)
+        if incrementality == Incrementality.FULL_DATASET.value:
+            # Trips missing from a full dataset have no realtime information
+            with self._lock:
+                for trip_id in set(self._overlays) - trip_ids:
+                    del self._overlays[trip_id]
+        self.feed_timestamp = header.get("timestamp", 0)
+
+
+def overlay_departures(
+    store: TripUpdateStore,
+    departures: typing.List[typing.Dict],
+    service_date: datetime.date,
+    schedule_lookup: ScheduleLookup,
+):
+    """
+    Add "realtime" to each departure (a dict with trip_id, stop_sequence,
+    arrival_time and departure_time) on service_date: None without realtime information, or its
+    status, predicted departure_time and delay. Scheduled times needed to turn
+    absolute times into delays are read in one schedule_lookup call.
+    """
+    day_start = service_day_start(service_date, store.timezone)
+    gtfs_date = service_date.strftime(GTFS_DATE_FORMAT)
+    governing = []  # type: typing.List[typing.Tuple[TripOverlay, typing.Optional[int]]]
+    lookups = set()  # type: typing.Set[typing.Tuple[str, int]]
+    for departure in departures:
+        overlay = store.get(departure["trip_id"])
+        if overlay and overlay.start_date not in (None, gtfs_date):
+            overlay = None  # An update of another day's run of the trip
+        index = (
+            overlay.governing_update(departure["stop_sequence"]) if overlay else None
+        )
+        if (
+            index is not None
+            and overlay.needs_schedule(index)
+            and overlay.stop_sequences[index] != departure["stop_sequence"]
+        ):
+            lookups.add((overlay.trip_id, overlay.stop_sequences[index]))
+        governing.append((overlay, index))
+    scheduled = schedule_lookup(lookups) if lookups else {}
+
+    for departure, (overlay, index) in zip(departures, governing):
+        if not overlay:
+            departure["realtime"] = None
+            continue
+        scheduled_at_update = None
+        if index is not None:
+            update_sequence = overlay.stop_sequences[index]
+            if update_sequence == departure["stop_sequence"]:
+                scheduled_at_update = (
+                    departure["arrival_time"],
+                    departure["departure_time"],
+                )
+            else:
+                scheduled_at_update = scheduled.get((overlay.trip_id, update_sequence))
+        departure["realtime"] = overlay.predict(
+            departure["stop_sequence"],
+            departure["departure_time"],
+            day_start,
+            scheduled_at_update,
+        )
+
+
+def init_app(app: Flask, realtime_config: typing.Dict):
+    """Poll trip updates in this web process, so that departures include predictions"""
+    from flaskr.realtime.poller import poll_in_app
+
+    store = TripUpdateStore(realtime_config.get("timezone", "America/New_York"))
+    app.extensions["trip_updates"] = store
+    poll_in_app(
+        app,
+        store,
+        "trip_updates",
+        realtime_config.get("trip_updates_url"),
+        realtime_config.get("poll_interval", 15),
+    )
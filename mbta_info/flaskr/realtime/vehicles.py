@@ -0,0 +1,292 @@
+"""
+Latest GTFS-realtime vehicle positions, held in memory with a spatial grid index.
+
+With realtime.vehicle_positions set, each web process polls the feed into a
+VehicleStore for the API's vehicle reads (see init_app). To watch the feed of
+the loaded feed's linked datasets (or --url) from mbta_info/ instead:
+    python -m flaskr.realtime.vehicles [--url URL] [--poll-interval SECONDS] [--once]
+"""
+import argparse
+import math
+import threading
+import typing
+
+import numpy as np
+from flask import Flask
+
+from flaskr.realtime.gtfs_rt import Incrementality, VehicleStopStatus, enum_member
+from flaskr.tools.transfers import EARTH_RADIUS, haversine_distances
+
+GridCell = typing.Tuple[int, int]
+
+
+class VehiclePosition:
+    __slots__ = (
+        "vehicle_id",
+        "label",
+        "trip_id",
+        "route_id",
+        "direction_id",
+        "latitude",
+        "longitude",
+        "bearing",
+        "speed",
+        "stop_id",
+        "current_stop_sequence",
+        "current_status",
+        "timestamp",
+    )
+
+    def __init__(
+        self,
+        vehicle_id: str,
+        latitude: float,
+        longitude: float,
+        timestamp: int = 0,
+        label: typing.Optional[str] = None,
+        trip_id: typing.Optional[str] = None,
+        route_id: typing.Optional[str] = None,
+        direction_id: typing.Optional[int] = None,
+        bearing: typing.Optional[float] = None,
+        speed: typing.Optional[float] = None,
+        stop_id: typing.Optional[str] = None,
+        current_stop_sequence: typing.Optional[int] = None,
+        current_status: VehicleStopStatus = VehicleStopStatus.IN_TRANSIT_TO,
+    ):
+        self.vehicle_id = vehicle_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.timestamp = timestamp
+        self.label = label
+        self.trip_id = trip_id
+        self.route_id = route_id
+        self.direction_id = direction_id
+        self.bearing = bearing
+        self.speed = speed
+        self.stop_id = stop_id
+        self.current_stop_sequence = current_stop_sequence
+        self.current_status = current_status
+
+    @classmethod
+    def from_entity(cls, entity: typing.Dict) -> typing.Optional["VehiclePosition"]:
+        """Build a position from a decoded FeedEntity, or None if it has no vehicle position"""
+        vehicle = entity.get("vehicle")
+        if not vehicle or "position" not in vehicle:
+            return None
+        trip = vehicle.get("trip", {})
+        position = vehicle["position"]
+        descriptor = vehicle.get("vehicle", {})
+        return cls(
+            descriptor.get("id") or entity["id"],
+            position["latitude"],
+            position["longitude"],
+            vehicle.get("timestamp", 0),
+            label=descriptor.get("label"),
+            trip_id=trip.get("trip_id"),
+            route_id=trip.get("route_id"),
+            direction_id=trip.get("direction_id"),
+            bearing=position.get("bearing"),
+            speed=position.get("speed"),
+            stop_id=vehicle.get("stop_id"),
+            current_stop_sequence=vehicle.get("current_stop_sequence"),
+            current_status=enum_member(
+                VehicleStopStatus,
+                vehicle.get("current_status"),
+                VehicleStopStatus.IN_TRANSIT_TO,
+            ),
+        )
+
+    def serialize(self) -> typing.Dict:
+        return {
+            "vehicle_id": self.vehicle_id,
+            "label": self.label,
+            "trip_id": self.trip_id,
+            "route_id": self.route_id,
+            "direction_id": self.direction_id,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "bearing": self.bearing,
+            "speed": self.speed,
+            "stop_id": self.stop_id,
+            "current_stop_sequence": self.current_stop_sequence,
+            "current_status": self.current_status.name,
+            "timestamp": self.timestamp,
+        }
+
+    def __repr__(self):
+        return (
+            f"<VehiclePosition(vehicle_id={self.vehicle_id}, trip_id={self.trip_id})>"
+        )
+
+
+class VehicleStore:
+    """
+    The latest position of each vehicle, indexed by the grid cell of
+    cell_size degrees it lies in, so finding the vehicles near a point only
+    looks at the cells around it. Safe to read while a poller updates it.
+    """
+
+    def __init__(self, cell_size: float = 0.01):
+        self.cell_size = cell_size
+        self.feed_timestamp = 0
+        self._vehicles = {}  # type: typing.Dict[str, VehiclePosition]
+        self._cells = {}  # type: typing.Dict[GridCell, typing.Set[str]]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._vehicles)
+
+    def get(self, vehicle_id: str) -> typing.Optional[VehiclePosition]:
+        return self._vehicles.get(vehicle_id)
+
+    def positions(self) -> typing.List[VehiclePosition]:
+        """Every vehicle's position, by vehicle_id"""
+        with self._lock:
+            positions = list(self._vehicles.values())
+        return sorted(positions, key=lambda position: position.vehicle_id)
+
+    def cell(self, latitude: float, longitude: float) -> GridCell:
+        return (
+            math.floor(latitude / self.cell_size),
+            math.floor(longitude / self.cell_size),
+        )
+
+    def update(self, position: VehiclePosition) -> bool:
+        """Store position unless an equally or more recent one of the vehicle is held"""
+        with self._lock:
+            current = self._vehicles.get(position.vehicle_id)
+            if current:
+                if position.timestamp and position.timestamp <= current.timestamp:
+                    return False
+                self._discard_from_cell(current)
+            self._vehicles[position.vehicle_id] = position
+            self._cells.setdefault(
+                self.cell(position.latitude, position.longitude), set()
+            ).add(position.vehicle_id)
+            return True
+
+    def remove(self, vehicle_id: str):
+        with self._lock:
+            position = self._vehicles.pop(vehicle_id, None)
+            if position:
+                self._discard_from_cell(position)
+
+    def retain(self, vehicle_ids: typing.Set[str]):
+        """Remove every vehicle not in vehicle_ids"""
+        for vehicle_id in set(self._vehicles) - vehicle_ids:
+            self.remove(vehicle_id)
+
+    def _discard_from_cell(self, position: VehiclePosition):
+        cell = self.cell(position.latitude, position.longitude)
+        cell_vehicles = self._cells[cell]
+        cell_vehicles.discard(position.vehicle_id)
+        if not cell_vehicles:
+            del self._cells[cell]
+
+    def near(
+        self, latitude: float, longitude: float, radius: float
+    ) -> typing.List[typing.Tuple[float, VehiclePosition]]:
+        """Return (distance in meters, position) of the vehicles within radius meters, nearest first"""
+        lat_margin = math.degrees(radius / EARTH_RADIUS)
+        lon_margin = lat_margin / max(math.cos(math.radians(latitude)), 1e-6)
+        min_cell = self.cell(latitude - lat_margin, longitude - lon_margin)
+        max_cell = self.cell(latitude + lat_margin, longitude + lon_margin)
+        with self._lock:
+            candidates = [
+                self._vehicles[vehicle_id]
+                for lat_cell in range(min_cell[0], max_cell[0] + 1)
+                for lon_cell in range(min_cell[1], max_cell[1] + 1)
+                for vehicle_id in self._cells.get((lat_cell, lon_cell), ())
+            ]
+        if not candidates:
+            return []
+        distances = haversine_distances(
+            np.float64(longitude),
+            np.float64(latitude),
+            np.array([position.longitude for position in candidates]),
+            np.array([position.latitude for position in candidates]),
+        )
+        return sorted(
+            (
+                (float(distance), position)
+                for distance, position in zip(distances, candidates)
+                if distance <= radius
+            ),
+            key=lambda pair: pair[0],
+        )
+
+    def apply_entity(self, entity: typing.Dict) -> typing.Optional[str]:
+        if entity.get("is_deleted"):
+            self.remove(
+                entity.get("vehicle", {}).get("vehicle", {}).get("id") or entity["id"]
+            )
+            return None
+        position = VehiclePosition.from_entity(entity)
+        if position is None:
+            return None
+        self.update(position)
+        return position.vehicle_id
+
+    def finish_feed(self, header: typing.Dict, vehicle_ids: typing.Set[str]):
+        self.feed_timestamp = header.get("timestamp", 0)
+        incrementality = header.get("incrementality", Incrementality.FULL_DATASET.value)
+        if incrementality == Incrementality.FULL_DATASET.value:
+            # Vehicles missing from a full dataset are out of service
+            self.retain(vehicle_ids)
+
+
+def init_app(app: Flask, realtime_config: typing.Dict):
+    """Poll vehicle positions in this web process for the API's vehicle reads"""
+    from flaskr.realtime.poller import poll_in_app
+
+    store = VehicleStore(realtime_config.get("grid_cell_size", 0.01))
+    app.extensions["vehicle_positions"] = store
+    poll_in_app(
+        app,
+        store,
+        "vehicle_positions",
+        realtime_config.get("vehicle_positions_url"),
+        realtime_config.get("poll_interval", 15),
+    )
+
+
+def main():
+    from flask import g
+
+    from flaskr import create_app, set_g
+    from flaskr.database import db
+    from flaskr.realtime.poller import FeedPoller, linked_dataset_url
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="default: the loaded feed's linked dataset")
+    parser.add_argument("--poll-interval", type=float, help="seconds")
+    parser.add_argument("--once", action="store_true", help="poll once and exit")
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        set_g()
+        settings = g.config.get("realtime", {})
+        url = args.url or linked_dataset_url(db, "vehicle_positions")
+        db.session.close()
+    if not url:
+        parser.error("No vehicle positions feed among the linked datasets; pass --url")
+
+    store = VehicleStore(settings.get("grid_cell_size", 0.01))
+    poller = FeedPoller(
+        url, store, args.poll_interval or settings.get("poll_interval", 15)
+    )
+    if args.once:
+        poller.poll()
+        print(f"{len(store)} vehicles at {store.feed_timestamp}")
+        return
+    thread, stop = poller.start()
+    try:
+        while thread.is_alive():
+            thread.join(poller.poll_interval)
+            print(f"{len(store)} vehicles at {store.feed_timestamp}")
+    except KeyboardInterrupt:
+        stop.set()
+
+
+if __name__ == "__main__":
+    main()
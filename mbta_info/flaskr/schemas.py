@@ -406,7 +406,8 @@ class StopTimeSchema(mm.Schema):
         in_data["drop_off_type"] = schema_utils.numbered_type_enum_key(
             in_data["drop_off_type"], default_0=True
         )
-        return {k: v for k, v in in_data.items() if v}
+        # Times are ints by now, and 00:00:00 (0) is a time like any other
+        return {k: v for k, v in in_data.items() if v or v == 0}
 
     @mm.post_load
     def make_stop_time(self, data: typing.Dict, **kwargs) -> mbta_models.StopTime:
@@ -461,3 +462,29 @@ class MultiRouteTripSchema(mm.Schema):
             added_route_id=data.pop("added_route_id"),
             trip_id=data.pop("trip_id"),
         )
+
+
+class FeedInfoSchema(mm.Schema):
+    feed_version = mm.fields.Str(required=True)
+    feed_publisher_name = mm.fields.Str(required=True)
+    feed_publisher_url = mm.fields.Url(required=True)
+    feed_lang = EnumField(mbta_models.LangCode, required=True)
+    feed_start_date = mm.fields.Date(format=DATE_INPUT_FORMAT)
+    feed_end_date = mm.fields.Date(format=DATE_INPUT_FORMAT)
+    feed_contact_email = mm.fields.Email()
+    feed_contact_url = mm.fields.Url()
+
+    @mm.pre_load
+    def convert_input(self, in_data: typing.Dict, **kwargs) -> typing.Dict:
+        in_data["feed_lang"] = in_data.get("feed_lang", "").lower()
+        return {k: v for k, v in in_data.items() if v}
+
+    @mm.post_load
+    def make_feed_info(self, data: typing.Dict, **kwargs) -> mbta_models.FeedInfo:
+        return mbta_models.FeedInfo(
+            data.pop("feed_version"),
+            data.pop("feed_publisher_name"),
+            data.pop("feed_publisher_url"),
+            data.pop("feed_lang"),
+            **data,
+        )
@@ -0,0 +1,305 @@
+"""
+Column-batch transformation of the largest data files, stop_times.txt and shapes.txt.
+
+Their schemas convert a row at a time, splitting every time string, parsing
+every number and querying for every foreign key. A BatchTransform takes a
+block of rows as columns instead and converts each column at once with NumPy:
+times and sequences by arithmetic on the code points of their characters,
+coordinates by NumPy's float parsing, and foreign keys by membership in the
+referenced table's keys, read once per load.
+
+Only values in the plain form a column recognizes are converted here, e.g.
+times of exactly HH:MM:SS and integers of ASCII digits alone. A row with any
+other value is left to its schema, as before, so every row converts to the
+same values, or fails with the same ValidationError, as it does on its own.
+"""
+import typing
+
+import numpy as np
+from flask_sqlalchemy import Model, SQLAlchemy
+
+from flaskr import model_utils, models as mbta_models
+
+BLOCK_ROWS = 10000
+MAX_DIGITS = 18  # Unsigned integers that fit in an int64
+ZERO, NINE, COLON = ord("0"), ord("9"), ord(":")
+
+Converted = typing.Tuple[np.ndarray, np.ndarray]  # (values, mask of rows converted)
+
+
+def code_points(values: np.ndarray) -> np.ndarray:
+    """View an array of strings as a (rows, width) array of code points, 0 past each string's end"""
+    return values.view(np.uint32).reshape(len(values), -1)
+
+
+def parse_times(values: np.ndarray) -> Converted:
+    """Convert HH:MM:SS strings to seconds since 00:00:00, like schema_utils.time_as_seconds"""
+    codes = code_points(values).astype(np.int64)
+    if codes.shape[1] < 8:
+        return np.zeros(len(values), np.int64), np.zeros(len(values), bool)
+    digits = codes[:, [0, 1, 3, 4, 6, 7]] - ZERO
+    converted = (
+        ((digits >= 0) & (digits <= 9)).all(axis=1)
+        & (codes[:, 2] == COLON)
+        & (codes[:, 5] == COLON)
+        & (codes[:, 8:] == 0).all(axis=1)
+    )
+    seconds = (
+        3600 * (10 * digits[:, 0] + digits[:, 1])
+        + 60 * (10 * digits[:, 2] + digits[:, 3])
+        + 10 * digits[:, 4]
+        + digits[:, 5]
+    )
+    return seconds, converted
+
+
+def parse_unsigned(values: np.ndarray) -> Converted:
+    """Convert strings of ASCII digits to integers"""
+    codes = code_points(values).astype(np.int64)
+    is_digit = (codes >= ZERO) & (codes <= NINE)
+    lengths = np.where(
+        (codes == 0).any(axis=1), (codes == 0).argmax(axis=1), codes.shape[1]
+    )
+    converted = (
+        (is_digit.sum(axis=1) == lengths) & (lengths > 0) & (lengths <= MAX_DIGITS)
+    )
+    # Place each digit by its distance from the end of its string
+    exponents = lengths[:, np.newaxis] - 1 - np.arange(codes.shape[1])
+    place_values = np.where(
+        is_digit & (exponents >= 0), 10 ** np.clip(exponents, 0, MAX_DIGITS - 1), 0
+    )
+    integers = ((codes - ZERO) * place_values).sum(axis=1)
+    return integers, converted
+
+
+def parse_floats(values: np.ndarray) -> Converted:
+    """Convert strings of finite numbers to floats, as float() does"""
+    try:
+        floats = np.where(values == "", "nan", values).astype(np.float64)
+    except ValueError:
+        # A value NumPy can't read: read the block's values one by one
+        floats = np.empty(len(values), np.float64)
+        for i, value in enumerate(values.tolist()):
+            try:
+                floats[i] = float(value)
+            except ValueError:
+                floats[i] = np.nan
+    return floats, np.isfinite(floats)
+
+
+class BatchField:
+    """A field of a data file converted a column at a time"""
+
+    def __init__(self, required: bool = False):
+        self.required = required
+
+    def convert(self, values: np.ndarray) -> Converted:
+        raise NotImplementedError
+
+    def transform(self, values: np.ndarray) -> typing.Tuple[typing.List, np.ndarray]:
+        """Return the column's values as Python objects, None where empty,
+        and the mask of the rows this field could convert"""
+        converted_values, converted = self.convert(values)
+        empty = values == ""
+        column = converted_values.tolist()
+        for i in np.flatnonzero(empty).tolist():
+            column[i] = None
+        # Empty values are missing, which the schema rejects for required fields
+        return column, np.where(empty, not self.required, converted)
+
+
+class StringField(BatchField):
+    def convert(self, values: np.ndarray) -> Converted:
+        return values.astype(object), np.ones(len(values), bool)
+
+
+class TimeField(BatchField):
+    def convert(self, values: np.ndarray) -> Converted:
+        return parse_times(values)
+
+
+class UnsignedField(BatchField):
+    def convert(self, values: np.ndarray) -> Converted:
+        return parse_unsigned(values)
+
+
+class FloatField(BatchField):
+    def convert(self, values: np.ndarray) -> Converted:
+        return parse_floats(values)
+
+
+class LookupField(BatchField):
+    """A field with few values, each converted through a mapping, including any value of empty strings"""
+
+    def __init__(self, mapping: typing.Dict[str, typing.Any], required: bool = False):
+        super().__init__(required)
+        self.mapping = mapping
+
+    def convert(self, values: np.ndarray) -> Converted:
+        unique, inverse = np.unique(values, return_inverse=True)
+        converted = np.array([value in self.mapping for value in unique.tolist()])
+        mapped = np.array(
+            [self.mapping.get(value) for value in unique.tolist()], dtype=object
+        )
+        return mapped[inverse], converted[inverse]
+
+    def transform(self, values: np.ndarray) -> typing.Tuple[typing.List, np.ndarray]:
+        if "" not in self.mapping:
+            return super().transform(values)
+        converted_values, converted = self.convert(values)
+        return converted_values.tolist(), converted
+
+
+class ForeignKeyField(BatchField):
+    """A fk.StringForeignKey field, checked against the referenced keys read by prepare()"""
+
+    def __init__(self, model: Model, required: bool = False):
+        super().__init__(required)
+        self.model = model
+        self.keys = set()  # type: typing.Set[str]
+
+    def prepare(self, db: SQLAlchemy):
+        pk_column = getattr(self.model, model_utils.pk_field_name(self.model))
+        self.keys = {key for (key,) in db.session.query(pk_column)}
+
+    def convert(self, values: np.ndarray) -> Converted:
+        keys = self.keys
+        converted = np.fromiter(
+            (value in keys for value in values.tolist()), bool, len(values)
+        )
+        return values.astype(object), converted
+
+
+def numbered_enum_mapping(enum: typing.Type) -> typing.Dict[str, typing.Any]:
+    """Raw values of a field converted by schema_utils.numbered_type_enum_key(default_0=True)"""
+    mapping = {"": enum.type_0}
+    mapping.update((member.name[len("type_") :], member) for member in enum)
+    return mapping
+
+
+class BatchTransform:
+    """
+    Convert blocks of a data file's rows to rows of its table's staging table.
+    Subclasses make the file's fields, name the columns the schema's pre_load
+    reads without a default, and turn converted fields into the table's columns.
+    """
+
+    # The schema's pre_load raises KeyError without these columns
+    required_columns = frozenset()  # type: typing.ClassVar[typing.FrozenSet[str]]
+
+    def __init__(self):
+        self.fields = self.make_fields()
+
+    def make_fields(self) -> typing.Dict[str, BatchField]:
+        raise NotImplementedError
+
+    def prepare(self, db: SQLAlchemy):
+        """Read the keys the foreign key fields are checked against"""
+        for field in self.fields.values():
+            if isinstance(field, ForeignKeyField):
+                field.prepare(db)
+
+    def transform(
+        self, header: typing.List[str], rows: typing.List[typing.List[str]]
+    ) -> typing.List[typing.Optional[typing.Dict]]:
+        """
+        Return the staging table row of each of rows (lists of values in
+        header order), or None for the rows to be loaded by their schema
+        """
+        if not rows:
+            return []
+        if not (self.required_columns <= set(header) <= set(self.fields)):
+            return [None] * len(rows)  # The schema reports the unexpected columns
+        # Rows of the wrong length are lined up with the header, then left to the schema
+        regular = np.fromiter(
+            (len(row) == len(header) for row in rows), bool, len(rows)
+        )
+        if not regular.all():
+            rows = [
+                row[: len(header)] + [""] * (len(header) - len(row)) for row in rows
+            ]
+        raw_columns = dict(zip(header, zip(*rows)))
+        converted = regular
+        columns = {}
+        for name, field in self.fields.items():
+            values = np.array(raw_columns.get(name, ("",) * len(rows)), dtype=str)
+            columns[name], field_converted = field.transform(values)
+            converted = converted & field_converted
+
+        staged = [None] * len(rows)  # type: typing.List[typing.Optional[typing.Dict]]
+        indexes = np.flatnonzero(converted).tolist()
+        if not indexes:
+            return staged
+        if len(indexes) < len(rows):
+            columns = {
+                name: [column[i] for i in indexes] for name, column in columns.items()
+            }
+        table_columns = self.table_columns(columns)
+        names = list(table_columns)
+        for i, values in zip(indexes, zip(*table_columns.values())):
+            staged[i] = dict(zip(names, values))
+        return staged
+
+    def table_columns(
+        self, columns: typing.Dict[str, typing.List]
+    ) -> typing.Dict[str, typing.List]:
+        """Return the table's columns, but id and feed_version, from the converted fields"""
+        return columns
+
+
+class StopTimeTransform(BatchTransform):
+    required_columns = frozenset(
+        ("arrival_time", "departure_time", "pickup_type", "drop_off_type")
+    )
+
+    def make_fields(self) -> typing.Dict[str, BatchField]:
+        pickup_drop_off_types = numbered_enum_mapping(mbta_models.PickupDropOffType)
+        return {
+            "trip_id": ForeignKeyField(mbta_models.Trip, required=True),
+            "arrival_time": TimeField(required=True),
+            "departure_time": TimeField(required=True),
+            "stop_id": ForeignKeyField(mbta_models.Stop, required=True),
+            "stop_sequence": UnsignedField(required=True),
+            "stop_headsign": StringField(),
+            "pickup_type": LookupField(pickup_drop_off_types),
+            "drop_off_type": LookupField(pickup_drop_off_types),
+            "shape_dist_traveled": FloatField(),
+            "timepoint": LookupField({"0": 0, "1": 1}),
+            "checkpoint_id": ForeignKeyField(mbta_models.Checkpoint),
+        }
+
+
+class ShapeTransform(BatchTransform):
+    def make_fields(self) -> typing.Dict[str, BatchField]:
+        return {
+            "shape_id": StringField(required=True),
+            "shape_pt_lat": FloatField(required=True),
+            "shape_pt_lon": FloatField(required=True),
+            "shape_pt_sequence": UnsignedField(required=True),
+            "shape_dist_traveled": FloatField(),
+        }
+
+    def table_columns(
+        self, columns: typing.Dict[str, typing.List]
+    ) -> typing.Dict[str, typing.List]:
+        return {
+            "shape_id": columns["shape_id"],
+            # As written by the Shape model
+            "shape_pt_lonlat": [
+                f"POINT({lon} {lat})"
+                for lon, lat in zip(columns["shape_pt_lon"], columns["shape_pt_lat"])
+            ],
+            "shape_pt_sequence": columns["shape_pt_sequence"],
+            "shape_dist_traveled": columns["shape_dist_traveled"],
+        }
+
+
+TRANSFORMS = {
+    mbta_models.StopTime: StopTimeTransform,
+    mbta_models.Shape: ShapeTransform,
+}  # type: typing.Dict[Model, typing.Type[BatchTransform]]
+
+
+def transform_for_model(model: Model) -> typing.Optional[BatchTransform]:
+    transform_class = TRANSFORMS.get(model)
+    return transform_class() if transform_class else None
@@ -0,0 +1,51 @@
+"""
+Regenerate flaskr/codes.py from the installed pytz and pycountry.
+
+Run from mbta_info/ after bumping either package in requirements.txt:
+    python -m flaskr.tools.generate_codes
+"""
+import pathlib
+import typing
+
+import pycountry
+import pytz
+
+CODES_PATH = pathlib.Path(__file__).absolute().parent.parent / "codes.py"
+
+HEADER = '''"""
+Time zone and language codes for the TimeZone and LangCode enums in
+flaskr.models, generated from the pytz and pycountry versions pinned in
+requirements.txt by `python -m flaskr.tools.generate_codes`. Do not edit.
+
+Reading them from pytz and pycountry at import time costs more than the rest
+of flaskr.models put together, and every worker and CLI invocation pays it.
+"""
+'''
+
+
+def time_zones() -> typing.List[str]:
+    return list(pytz.all_timezones)
+
+
+def language_codes() -> typing.List[str]:
+    return [
+        lang.alpha_2 for lang in pycountry.languages if getattr(lang, "alpha_2", None)
+    ]
+
+
+def render_tuple(name: str, values: typing.Iterable[str]) -> str:
+    lines = [f"{name} = ("]
+    lines.extend(f'    "{value}",' for value in values)
+    lines.append(")")
+    return "\n".join(lines)
+
+
+def render_codes() -> str:
+    time_zone_tuple = render_tuple("TIME_ZONES", time_zones())
+    language_code_tuple = render_tuple("LANGUAGE_CODES", language_codes())
+    return f"{HEADER}\n{time_zone_tuple}\n\n{language_code_tuple}\n"
+
+
+if __name__ == "__main__":
+    CODES_PATH.write_text(render_codes())
+    print(f"Wrote {CODES_PATH}")
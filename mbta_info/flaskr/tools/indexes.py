@@ -0,0 +1,214 @@
+"""
+Indexes on the hot access paths are built once their table is loaded.
+
+Maintaining a B-tree row by row during a bulk load costs far more than one
+sorted build afterwards, so the Loader drops a table's post-load indexes
+(model_utils.POST_LOAD_INDEX_INFO) before reading its data file and builds
+them again when the file is loaded.
+
+In bulk load mode (the bulk_load section of the config, or MBTA_BULK_LOAD=1)
+the Loader drops all of a table's non-unique indexes, the GiST indexes of its
+geometry columns among them, and its foreign keys. Once the table is loaded
+the indexes are rebuilt a few at a time on separate connections, and the
+foreign keys are added back by one ALTER TABLE, which checks every loaded row
+against them at once. Primary keys and unique indexes stay, as the Loader
+relies on them. The tables partitioned by feed version are always loaded this
+way, into bare staging tables (see flaskr.partitions).
+"""
+import concurrent.futures
+import os
+import time
+import typing
+
+from flask_sqlalchemy import SQLAlchemy
+from geoalchemy2 import Geometry
+from sqlalchemy import Index, Table, inspect, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Connectable, Engine
+from sqlalchemy.schema import CreateIndex
+
+from flaskr import model_utils
+
+BULK_LOAD_ENV = "MBTA_BULK_LOAD"
+
+
+def post_load_indexes(table: Table) -> typing.List[Index]:
+    return sorted(
+        (index for index in table.indexes if model_utils.is_post_load_index(index)),
+        key=lambda index: index.name,
+    )
+
+
+def drop_post_load_indexes(db: SQLAlchemy, table: Table):
+    engine = db.get_engine()
+    for index in post_load_indexes(table):
+        engine.execute(f"DROP INDEX IF EXISTS {index.name}")
+
+
+def build_post_load_indexes(db: SQLAlchemy, table: Table) -> typing.Dict[str, float]:
+    """Build the post-load indexes of table that don't exist, returning seconds taken per index"""
+    engine = db.get_engine()
+    existing = {index["name"] for index in inspect(engine).get_indexes(table.name)}
+    timings = {}
+    for index in post_load_indexes(table):
+        if index.name in existing:
+            continue
+        start = time.perf_counter()
+        index.create(bind=engine)
+        timings[index.name] = time.perf_counter() - start
+        print(f"Built index {index.name} in {timings[index.name]:.2f}s")
+    return timings
+
+
+def secondary_indexes(table: Table) -> typing.Dict[str, str]:
+    """The CREATE INDEX statements of table's non-unique indexes by name,
+    including the GiST indexes GeoAlchemy creates for geometry columns"""
+    statements = {
+        index.name: str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+        for index in table.indexes
+        if not index.unique
+    }
+    for column in table.columns:
+        if isinstance(column.type, Geometry) and column.type.spatial_index:
+            name = f"idx_{table.name}_{column.name}"  # As named by GeoAlchemy
+            statements[name] = (
+                f'CREATE INDEX "{name}" ON "{table.name}" '
+                f'USING GIST ("{column.name}")'
+            )
+    return dict(sorted(statements.items()))
+
+
+def foreign_keys(table: Table) -> typing.Dict[str, str]:
+    """The ADD CONSTRAINT clauses of table's foreign keys by name"""
+    clauses = {}
+    for constraint in table.foreign_key_constraints:
+        columns = [element.parent.name for element in constraint.elements]
+        referred_columns = [element.column.name for element in constraint.elements]
+        # Postgres's name for an unnamed foreign key
+        name = constraint.name or f"{table.name}_{'_'.join(columns)}_fkey"[:63]
+        clauses[name] = (
+            f"ADD CONSTRAINT {name} FOREIGN KEY ({', '.join(columns)}) "
+            f"REFERENCES {constraint.referred_table.name} ({', '.join(referred_columns)})"
+        )
+    return dict(sorted(clauses.items()))
+
+
+def existing_index_names(connection: Connectable, table: Table) -> typing.Set[str]:
+    rows = connection.execute(
+        text(
+            "SELECT indexname FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = :table_name"
+        ),
+        table_name=table.name,
+    )
+    return {name for (name,) in rows}
+
+
+def existing_foreign_key_names(
+    connection: Connectable, table: Table
+) -> typing.Set[str]:
+    rows = connection.execute(
+        text(
+            "SELECT conname FROM pg_constraint "
+            "WHERE contype = 'f' AND conrelid = to_regclass(:table_name)"
+        ),
+        table_name=table.name,
+    )
+    return {name for (name,) in rows}
+
+
+class RestoreTimings:
+    """Seconds taken to restore a table's indexes and foreign keys after its load"""
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.index_seconds = {}  # type: typing.Dict[str, float]  # Build time per index
+        self.indexes_elapsed = 0.0  # Wall time of the builds, run side by side
+        self.foreign_keys = []  # type: typing.List[str]
+        self.foreign_keys_elapsed = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        return self.indexes_elapsed + self.foreign_keys_elapsed
+
+    @property
+    def parallel_saving(self) -> float:
+        """Seconds saved by building the indexes side by side instead of one by one"""
+        return max(sum(self.index_seconds.values()) - self.indexes_elapsed, 0.0)
+
+
+def _build_index(engine: Engine, name: str, statement: str) -> typing.Tuple[str, float]:
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        connection.execute(statement)
+    return name, time.perf_counter() - start
+
+
+class BulkLoad:
+    def __init__(self, enabled: bool = False, index_workers: int = 2):
+        self.enabled = enabled
+        self.index_workers = max(index_workers, 1)
+
+    @classmethod
+    def from_config(cls, config: typing.Dict) -> "BulkLoad":
+        """Create the bulk load mode set up by the config's bulk_load section and the environment"""
+        settings = config.get("bulk_load", {})
+        enabled = settings.get("enabled", False)
+        if os.getenv(BULK_LOAD_ENV) is not None:
+            enabled = os.getenv(BULK_LOAD_ENV, "").strip().lower() in ("1", "true")
+        return cls(enabled, settings.get("index_workers", 2))
+
+    def drop(self, db: SQLAlchemy, table: Table):
+        """Drop table's foreign keys and non-unique indexes before it is loaded"""
+        with db.get_engine().begin() as connection:
+            for name in sorted(existing_foreign_key_names(connection, table)):
+                connection.execute(f"ALTER TABLE {table.name} DROP CONSTRAINT {name}")
+            for name in secondary_indexes(table):
+                connection.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+    def restore(self, db: SQLAlchemy, table: Table) -> RestoreTimings:
+        """
+        Build the indexes and add the foreign keys of table that don't exist,
+        whether dropped for its load or by an interrupted load before it
+        """
+        timings = RestoreTimings(table.name)
+        engine = db.get_engine()
+        with engine.connect() as connection:
+            existing_indexes = existing_index_names(connection, table)
+            existing_foreign_keys = existing_foreign_key_names(connection, table)
+        missing_indexes = [
+            (name, statement)
+            for name, statement in secondary_indexes(table).items()
+            if name not in existing_indexes
+        ]
+        if missing_indexes:
+            start = time.perf_counter()
+            workers = min(self.index_workers, len(missing_indexes))
+            with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+                timings.index_seconds = dict(
+                    executor.map(
+                        lambda item: _build_index(engine, *item), missing_indexes
+                    )
+                )
+            timings.indexes_elapsed = time.perf_counter() - start
+            for name, seconds in timings.index_seconds.items():
+                print(f"Built index {name} in {seconds:.2f}s")
+
+        clauses = {
+            name: clause
+            for name, clause in foreign_keys(table).items()
+            if name not in existing_foreign_keys
+        }
+        if clauses:
+            start = time.perf_counter()
+            with engine.begin() as connection:
+                connection.execute(
+                    f"ALTER TABLE {table.name} " + ", ".join(clauses.values())
+                )
+            timings.foreign_keys = list(clauses)
+            timings.foreign_keys_elapsed = time.perf_counter() - start
+            print(
+                f"Added and validated {len(clauses)} foreign keys of {table.name} "
+                f"in {timings.foreign_keys_elapsed:.2f}s"
+            )
+        return timings
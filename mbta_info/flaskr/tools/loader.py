@@ -1,54 +1,315 @@
 import csv
+import datetime
 import importlib
+import itertools
 import json
 from pathlib import Path
+import time
 import typing
 
 from flask import g
 from flask_sqlalchemy import SQLAlchemy, Model
 from marshmallow import Schema, ValidationError
+from sqlalchemy import Table
 from sqlalchemy.exc import DataError
+from sqlalchemy.orm import Query
 
-from flaskr import model_utils
+from flaskr import feeds, model_utils, models as mbta_models, partitions
+from flaskr.profiling import Profiler
+from flaskr.tools import column_batch, indexes
+from flaskr.tools.quarantine import Quarantine
 from flaskr.tools.utils import model_name_from_table_name
 
 
 class Loader:
     def __init__(self, db: SQLAlchemy, max_batch_size: int = 100000):
         self.db = db
-        db.create_all()
+        self.feed_id = g.feed_id
+        feeds.create_tables(db, self.feed_id)
         self.max_batch_size = max_batch_size
-        self.table_names = [table.name for table in self.db.metadata.sorted_tables]
+        # feed_info goes last: its row makes the feed current, so the rest must be loaded first
+        self.table_names = sorted(
+            (
+                table.name
+                for table in self.db.metadata.sorted_tables
+                if not model_utils.is_derived_table(table)
+            ),
+            key=lambda table_name: table_name == "feed_info",
+        )
+        self.feed_version = None  # type: typing.Optional[str]
+        # Rows for the staging table of the partitioned table being loaded
+        self.staging_table = None  # type: typing.Optional[Table]
+        self.staged_rows = []  # type: typing.List[typing.Dict]
+        # While load_data loads a feed, its progress is checkpointed (see LoadCheckpoint)
+        self.checkpoint_version = None  # type: typing.Optional[str]
+        self.table_name = None  # type: typing.Optional[str]
+        self.rows_read = 0  # Data rows of the table being loaded read so far
+        self.profiler = Profiler.from_config(g.config)
+        self.quarantine = Quarantine.from_config(g.config)
+        self.bulk_load = indexes.BulkLoad.from_config(g.config)
+        self.restore_timings = {}  # type: typing.Dict[str, indexes.RestoreTimings]
 
     def load_data(self):
+        """Load every table's data file, resuming an interrupted load of the same feed version"""
+        feed_version = self.get_feed_version() if self.profiler.enabled else None
+        model_utils.entity_cache.clear()  # Entities of the feed loaded before may change
+        loaded, resume_offset = set(), 0  # type: typing.Set[str], int
+        if "feed_info" in self.table_names:  # Without it, there's no version to resume
+            loaded, resume_offset = self.resume_checkpoint()
         for table_name in self.table_names:
-            print(f"Loading data for {table_name} table")
+            if table_name in loaded:
+                print(f"Skipping {table_name} table, loaded before the restart")
+                continue
+            with self.profiler.profile(table_name, feed_version):
+                self.load_table(table_name, resume_offset)
+            resume_offset = 0
+        if self.checkpoint_version:
+            self.checkpoint_query().delete()
+            self.db.session.commit()
+            self.checkpoint_version = None
+        stats = model_utils.entity_cache.stats()
+        print(
+            f"Entity cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['size']} of {stats['max_size']} entries used"
+        )
+
+    def checkpoint_query(self) -> Query:
+        LoadCheckpoint = mbta_models.LoadCheckpoint
+        return self.db.session.query(LoadCheckpoint).filter(
+            LoadCheckpoint.feed_version == self.checkpoint_version
+        )
+
+    def resume_checkpoint(self) -> typing.Tuple[typing.Set[str], int]:
+        """
+        Start checkpointing the load of the feed version in the data files,
+        discarding the checkpoints of other versions. Returns the tables an
+        interrupted load of the version finished and the data rows it committed
+        of the next table.
+        """
+        feed_version = self.get_feed_version()
+        loaded, resume_offset = set(), 0  # type: typing.Set[str], int
+        resumed = False
+        for checkpoint in self.db.session.query(mbta_models.LoadCheckpoint).all():
+            if (
+                checkpoint.feed_version == feed_version
+                and checkpoint.table_name in self.table_names
+            ):
+                position = self.table_names.index(checkpoint.table_name)
+                if checkpoint.table_complete:
+                    position += 1
+                else:
+                    resume_offset = checkpoint.row_offset
+                loaded = set(self.table_names[:position])
+                resumed = True
+                print(
+                    f"Resuming load of {feed_version} at row {checkpoint.row_offset} "
+                    f"of the {checkpoint.table_name} table"
+                )
+                continue
+            print(
+                f"Discarding checkpoint of the interrupted load of {checkpoint.feed_version}"
+            )
+            partitions.drop_staging_tables(self.db, checkpoint.feed_version)
+            self.db.session.delete(checkpoint)
+        if not resumed:
+            self.db.session.add(
+                mbta_models.LoadCheckpoint(feed_version, self.table_names[0])
+            )
+        self.db.session.commit()
+        self.checkpoint_version = feed_version
+        return loaded, resume_offset
+
+    def save_checkpoint(self, table_complete: bool = False):
+        """Record the rows read of the table being loaded, committed with the current batch"""
+        if self.checkpoint_version is None:
+            return
+        self.checkpoint_query().update(
+            {
+                "table_name": self.table_name,
+                "row_offset": self.rows_read,
+                "table_complete": table_complete,
+                "updated": datetime.datetime.utcnow(),
+            },
+            synchronize_session=False,
+        )
 
-            model = self.get_model_for_table(table_name)
-            model_schema = self.get_schema_for_table(table_name)
+    def load_table(self, table_name: str, resume_offset: int = 0) -> int:
+        """Load the data file of table_name, skipping the resume_offset data rows
+        committed before an interruption, and return the number of rows added"""
+        print(f"Loading data for {table_name} table")
+        start = time.perf_counter()
+        self.table_name = table_name
+        self.rows_read = resume_offset
 
-            model_pk_field = model_utils.pk_field_name(model)
+        model = self.get_model_for_table(table_name)
+        model_schema = self.get_schema_for_table(table_name)
+        table = model.__table__
+        partitioned = model_utils.is_partitioned_table(table)
+
+        model_pk_field = model_utils.pk_field_name(model)
+        if partitioned:
+            # Each feed version is loaded into a new partition
+            if resume_offset and partitions.staging_table_exists(
+                self.db, table, self.get_feed_version()
+            ):
+                self.staging_table = partitions.staging_table(table, self.feed_version)
+            else:
+                # A new load, or one interrupted once the staging table was attached
+                self.rows_read = resume_offset = 0
+                self.staging_table = partitions.create_staging_table(
+                    self.db, table, self.get_feed_version()
+                )
+            existing_pks = set()  # type: typing.Set[typing.Union[str, int]]
+        else:
+            if self.bulk_load.enabled:
+                self.bulk_load.drop(self.db, table)
+            else:
+                indexes.drop_post_load_indexes(self.db, table)
             existing_pks = {
                 tup[0]
                 for tup in self.db.session.query(getattr(model, model_pk_field)).all()
             }
 
-            data_file_path = self.get_data_file_path(table_name)
-            with open(data_file_path, "r") as f_in:
-                reader = csv.DictReader(f_in)
-                cur_batch_size = 0
-                for data_row in reader:
+        data_file_path = self.get_data_file_path(table_name)
+        transform = column_batch.transform_for_model(model) if partitioned else None
+        self.quarantine.start_table(
+            table_name,
+            self.get_feed_version() if self.quarantine.enabled else None,
+            resumed=bool(resume_offset),
+        )
+        try:
+            if transform:
+                rows_added = self.stage_blocks(data_file_path, model_schema, transform)
+            else:
+                rows_added = self.load_rows(
+                    data_file_path,
+                    model,
+                    model_schema,
+                    model_pk_field,
+                    existing_pks,
+                    partitioned,
+                )
+        finally:
+            self.quarantine.finish_table()
+        if partitioned:
+            partitions.attach_staging_table(self.db, table, self.feed_version)
+            self.staging_table = None
+        else:
+            # Builds the post-load indexes, or all of those dropped for a bulk load
+            timings = self.bulk_load.restore(self.db, table)
+            self.restore_timings[table_name] = timings
+            if self.bulk_load.enabled:
+                print(
+                    f"Bulk loaded {table_name} in {time.perf_counter() - start:.2f}s: "
+                    f"indexes rebuilt in {timings.indexes_elapsed:.2f}s "
+                    f"(parallel builds saved {timings.parallel_saving:.2f}s over building "
+                    f"them one by one), "
+                    f"foreign keys validated in {timings.foreign_keys_elapsed:.2f}s"
+                )
+        if self.checkpoint_version:
+            self.save_checkpoint(table_complete=True)
+            self.db.session.commit()
+        return rows_added
+
+    def load_rows(
+        self,
+        data_file_path: Path,
+        model: Model,
+        model_schema: Schema,
+        model_pk_field: str,
+        existing_pks: typing.Set[typing.Union[str, int]],
+        partitioned: bool,
+    ) -> int:
+        """Load the data file a row at a time, returning the number of rows added"""
+        rows_added = 0
+        with open(data_file_path, "r") as f_in:
+            reader = csv.DictReader(f_in)
+            skip_rows(reader, self.rows_read)
+            cur_batch_size = 0
+            for data_row in reader:
+                self.rows_read += 1
+                if partitioned:
+                    cur_batch_size += self.stage_object(
+                        model_schema, data_row, reader.line_num
+                    )
+                else:
                     cur_batch_size += self.update_or_create_object(
-                        model, model_schema, model_pk_field, existing_pks, data_row
+                        model,
+                        model_schema,
+                        model_pk_field,
+                        existing_pks,
+                        data_row,
+                        reader.line_num,
                     )
-                    if cur_batch_size == self.max_batch_size:
-                        self.commit_batch()
-                        print(f"Loaded {cur_batch_size} rows from {data_file_path}")
-                        cur_batch_size = 0
-                # Commit last batch
-                self.commit_batch(last_batch=True)
-                if cur_batch_size:
+                if cur_batch_size == self.max_batch_size:
+                    self.commit_batch()
                     print(f"Loaded {cur_batch_size} rows from {data_file_path}")
+                    rows_added += cur_batch_size
+                    cur_batch_size = 0
+            # Commit last batch
+            self.commit_batch(last_batch=True)
+            if cur_batch_size:
+                print(f"Loaded {cur_batch_size} rows from {data_file_path}")
+                rows_added += cur_batch_size
+        return rows_added
+
+    def stage_blocks(
+        self,
+        data_file_path: Path,
+        model_schema: Schema,
+        transform: column_batch.BatchTransform,
+    ) -> int:
+        """Stage the data file of a partitioned table in blocks converted a column at a time
+        (see flaskr.tools.column_batch), returning the number of rows added"""
+        transform.prepare(self.db)
+        block_rows = min(column_batch.BLOCK_ROWS, self.max_batch_size)
+        rows_added = 0
+        with open(data_file_path, "r") as f_in:
+            reader = csv.reader(f_in)
+            header = next(reader, [])
+            skip_rows((row for row in reader if row), self.rows_read)
+            cur_batch_size = 0
+            while True:
+                block_size = min(block_rows, self.max_batch_size - cur_batch_size)
+                block, line_numbers = [], []
+                for row in reader:
+                    if row:  # Blank lines are skipped, as by csv.DictReader
+                        block.append(row)
+                        line_numbers.append(reader.line_num)
+                        if len(block) == block_size:
+                            break
+                if not block:
+                    break
+                self.rows_read += len(block)
+                for row, line_number, staged_row in zip(
+                    block, line_numbers, transform.transform(header, block)
+                ):
+                    if staged_row is None:
+                        cur_batch_size += self.stage_object(
+                            model_schema, reader_row(header, row), line_number
+                        )
+                    else:
+                        staged_row["feed_version"] = self.feed_version
+                        self.staged_rows.append(staged_row)
+                        cur_batch_size += 1
+                if cur_batch_size == self.max_batch_size:
+                    self.commit_batch()
+                    print(f"Loaded {cur_batch_size} rows from {data_file_path}")
+                    rows_added += cur_batch_size
+                    cur_batch_size = 0
+            # Commit last batch
+            self.commit_batch(last_batch=True)
+            if cur_batch_size:
+                print(f"Loaded {cur_batch_size} rows from {data_file_path}")
+                rows_added += cur_batch_size
+        return rows_added
+
+    def get_feed_version(self) -> str:
+        """Read the version of the feed being loaded from its feed_info file"""
+        if self.feed_version is None:
+            with open(self.get_data_file_path("feed_info"), "r") as f_in:
+                self.feed_version = next(csv.DictReader(f_in))["feed_version"]
+        return self.feed_version
 
     @staticmethod
     def get_model_for_table(table_name: str) -> Model:
@@ -66,10 +327,9 @@ class Loader:
 
     @staticmethod
     def get_data_file_path(table_name: str) -> str:
-        data_files = g.config["mbta_data"]["files"]
-        data_path = Path(
-            Path(__name__).absolute().parent, g.config["mbta_data"]["path"]
-        )
+        data_config = feeds.feed_data_config(g.config, g.feed_id)
+        data_files = data_config["files"]
+        data_path = Path(Path(__name__).absolute().parent, data_config["path"])
 
         data_file_name = data_files[table_name]
         return Path(data_path, data_file_name)
@@ -81,9 +341,10 @@ class Loader:
         model_pk_field: str,
         existing_pks: typing.Set[typing.Union[str, int]],
         data_row: typing.Dict,
+        line_number: int = 0,
     ) -> int:
         """Update or create a database entry, returning 1 for if
-        the data_row was successfully processed, 0 if skipped"""
+        the data_row was successfully processed, 0 if skipped or quarantined"""
         try:
             model_instance = model_schema.load(data_row)
             if model_instance:  # DirectionSchema returns None when given a bad route_id value
@@ -103,11 +364,50 @@ class Loader:
                     return 1
             return 0
         except (ValidationError, KeyError) as e:
-            print(json.dumps(data_row, sort_keys=True, indent=4))
-            raise e
+            self.reject_row(data_row, line_number, e)
+            return 0
+
+    def stage_object(
+        self, model_schema: Schema, data_row: typing.Dict, line_number: int = 0
+    ) -> int:
+        """Queue a row for the staging table of the partitioned table being loaded,
+        returning 1 if the data_row was processed, 0 if skipped or quarantined"""
+        try:
+            model_instance = model_schema.load(data_row)
+        except (ValidationError, KeyError) as e:
+            self.reject_row(data_row, line_number, e)
+            return 0
+        if not model_instance:
+            return 0
+        model_instance.feed_version = self.feed_version
+        self.staged_rows.append(
+            {
+                column.name: getattr(model_instance, column.name)
+                for column in self.staging_table.columns
+                if column.name != "id"  # Numbered by the staging table's sequence
+            }
+        )
+        return 1
+
+    def reject_row(
+        self,
+        data_row: typing.Dict,
+        line_number: int,
+        error: typing.Union[ValidationError, KeyError],
+    ):
+        """Quarantine a row its schema rejected, or print it and re-raise the error"""
+        if self.quarantine.enabled:
+            self.quarantine.reject(line_number, data_row, error)
+            return
+        print(json.dumps(data_row, sort_keys=True, indent=4))
+        raise error
 
     def commit_batch(self, last_batch: bool = False):
         try:
+            if self.staged_rows:
+                self.db.session.execute(self.staging_table.insert(), self.staged_rows)
+                self.staged_rows = []
+            self.save_checkpoint()
             self.db.session.commit()
             if last_batch:
                 self.db.session.close()
@@ -116,3 +416,18 @@ class Loader:
             self.db.session.rollback()
             self.db.session.close()
             raise e
+
+
+def skip_rows(rows: typing.Iterator, count: int):
+    """Advance rows past its first count rows"""
+    next(itertools.islice(rows, count, count), None)
+
+
+def reader_row(header: typing.List[str], row: typing.List[str]) -> typing.Dict:
+    """The dict csv.DictReader makes of row"""
+    data_row = dict(zip(header, row))  # type: typing.Dict
+    if len(row) > len(header):
+        data_row[None] = row[len(header) :]
+    for key in header[len(row) :]:
+        data_row[key] = None
+    return data_row
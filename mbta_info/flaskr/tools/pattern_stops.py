@@ -0,0 +1,89 @@
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, select
+
+from flaskr import queries, models as mbta_models
+
+
+class PatternStopBuilder:
+    """Derive the pattern_stop table from stop times in one INSERT ... SELECT"""
+
+    def __init__(self, db: SQLAlchemy):
+        self.db = db
+
+    def build(self) -> int:
+        print("Building pattern stops")
+        table = mbta_models.PatternStop.__table__
+        self.db.session.execute(table.delete())
+        self.db.session.execute(
+            table.insert().from_select(
+                [
+                    "route_pattern_id",
+                    "route_id",
+                    "direction_id",
+                    "stop_sequence",
+                    "stop_id",
+                    "arrival_offset",
+                    "departure_offset",
+                    "trip_count",
+                ],
+                self.pattern_stops_select(),
+            )
+        )
+        self.db.session.commit()
+        pattern_stop_count = self.db.session.query(mbta_models.PatternStop).count()
+        print(f"Built {pattern_stop_count} pattern stops")
+        return pattern_stop_count
+
+    @staticmethod
+    def pattern_stops_select():
+        """
+        One row per (route pattern, stop_sequence) over every trip of the pattern.
+        Offsets are medians of each stop time less its trip's first departure, and
+        the stop is the most common one at that sequence, so a stray trip can't
+        split a pattern's sequence.
+        """
+        stop_time = mbta_models.StopTime.__table__
+        trip = mbta_models.Trip.__table__
+        route_pattern = mbta_models.RoutePattern.__table__
+
+        trip_start = func.min(stop_time.c.departure_time).over(
+            partition_by=stop_time.c.trip_id
+        )
+        timed = (
+            select(
+                [
+                    route_pattern.c.route_pattern_id,
+                    route_pattern.c.route_id,
+                    route_pattern.c.direction_id,
+                    stop_time.c.stop_sequence,
+                    stop_time.c.stop_id,
+                    (stop_time.c.arrival_time - trip_start).label("arrival_offset"),
+                    (stop_time.c.departure_time - trip_start).label("departure_offset"),
+                ]
+            )
+            .select_from(
+                stop_time.join(trip, stop_time.c.trip_id == trip.c.trip_id).join(
+                    route_pattern,
+                    trip.c.route_pattern_id == route_pattern.c.route_pattern_id,
+                )
+            )
+            .where(stop_time.c.feed_version == queries.current_feed_version())
+            .alias("timed")
+        )
+        return select(
+            [
+                timed.c.route_pattern_id,
+                timed.c.route_id,
+                timed.c.direction_id,
+                timed.c.stop_sequence,
+                func.mode().within_group(timed.c.stop_id),
+                func.percentile_disc(0.5).within_group(timed.c.arrival_offset),
+                func.percentile_disc(0.5).within_group(timed.c.departure_offset),
+                func.count(),
+            ]
+        ).group_by(
+            timed.c.route_pattern_id,
+            timed.c.route_id,
+            timed.c.direction_id,
+            timed.c.stop_sequence,
+        )
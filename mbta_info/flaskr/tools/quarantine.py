@@ -0,0 +1,124 @@
+"""
+Quarantine of the data file rows that fail validation while loading.
+
+By default the Loader stops at the first row its schema rejects. With the
+quarantine section of the config enabled (or MBTA_QUARANTINE=1), a rejected
+row is instead written with its line number and errors to a reject file and
+the load goes on. A table's load still aborts, with TooManyRejects, once
+more than max_errors of its rows have been rejected.
+
+Rejects are written as JSON lines, one file per table, under
+<path>/<feed version>/<table>.rejects.jsonl:
+    {"line": 1042, "row": {...the data row...}, "errors": {"field": ["message"]}}
+"""
+import json
+import os
+import pathlib
+import typing
+
+from marshmallow import ValidationError
+
+from flaskr.profiling import file_stem
+
+QUARANTINE_ENV = "MBTA_QUARANTINE"
+
+
+class TooManyRejects(RuntimeError):
+    def __init__(self, table_name: str, rejects: int, max_errors: int):
+        super().__init__(
+            f"Rejected {rejects} rows of {table_name}, more than the {max_errors} allowed"
+        )
+        self.table_name = table_name
+        self.rejects = rejects
+        self.max_errors = max_errors
+
+
+def error_messages(error: typing.Union[ValidationError, KeyError]) -> typing.Dict:
+    if isinstance(error, ValidationError):
+        return error.normalized_messages()
+    # Schemas' pre_load raise KeyError for columns missing from the data file
+    return {"_schema": [f"Missing column {error.args[0]}"]}
+
+
+class Quarantine:
+    def __init__(
+        self, path: pathlib.Path, enabled: bool = False, max_errors: int = 100
+    ):
+        self.path = pathlib.Path(path)
+        self.enabled = enabled
+        self.max_errors = max_errors
+        self.counts = {}  # type: typing.Dict[str, int]  # Rejected rows per table
+        self.table_name = None  # type: typing.Optional[str]
+        self.feed_version = None  # type: typing.Optional[str]
+        self._reject_file = None  # type: typing.Optional[typing.TextIO]
+        self._mode = "w"
+
+    @classmethod
+    def from_config(cls, config: typing.Dict) -> "Quarantine":
+        """Create the quarantine set up by the config's quarantine section and the environment"""
+        settings = config.get("quarantine", {})
+        enabled = settings.get("enabled", False)
+        if os.getenv(QUARANTINE_ENV) is not None:
+            enabled = os.getenv(QUARANTINE_ENV, "").strip().lower() in ("1", "true")
+        path = pathlib.Path(
+            pathlib.Path(__name__).absolute().parent, settings.get("path", "rejects")
+        )
+        return cls(path, enabled, settings.get("max_errors", 100))
+
+    def reject_path(self, table_name: str) -> pathlib.Path:
+        return (
+            self.path
+            / file_stem(self.feed_version or "")
+            / f"{table_name}.rejects.jsonl"
+        )
+
+    def start_table(
+        self, table_name: str, feed_version: typing.Optional[str], resumed: bool = False
+    ):
+        """Start rejecting rows of table_name, adding to its reject file if its load is resumed"""
+        self.finish_table()
+        self.table_name = table_name
+        self.feed_version = feed_version
+        self.counts[table_name] = 0
+        self._mode = "a" if resumed else "w"
+
+    def reject(
+        self,
+        line_number: int,
+        data_row: typing.Dict,
+        error: typing.Union[ValidationError, KeyError],
+    ):
+        """Write a rejected row to the current table's reject file,
+        raising TooManyRejects once the table has more than max_errors"""
+        if self._reject_file is None:
+            reject_path = self.reject_path(self.table_name)
+            reject_path.parent.mkdir(parents=True, exist_ok=True)
+            self._reject_file = open(reject_path, self._mode)
+        self._reject_file.write(
+            json.dumps(
+                {
+                    "line": line_number,
+                    # csv.DictReader files extra values under None, which JSON can't key
+                    "row": {str(key): value for key, value in data_row.items()},
+                    "errors": error_messages(error),
+                },
+                sort_keys=True,
+            )
+            + "\n"
+        )
+        self.counts[self.table_name] += 1
+        if self.counts[self.table_name] > self.max_errors:
+            self.finish_table()
+            raise TooManyRejects(
+                self.table_name, self.counts[self.table_name], self.max_errors
+            )
+
+    def finish_table(self):
+        if self._reject_file is None:
+            return
+        self._reject_file.close()
+        self._reject_file = None
+        print(
+            f"Quarantined {self.counts[self.table_name]} rows of {self.table_name} "
+            f"in {self.reject_path(self.table_name)}"
+        )
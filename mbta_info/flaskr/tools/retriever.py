@@ -1,3 +1,4 @@
+import argparse
 import zipfile
 import io
 import pathlib
@@ -14,13 +15,16 @@ class Retriever:
 
     config: typing.ClassVar[typing.Dict]
 
-    def __init__(self, verbose=True):
+    def __init__(self, verbose=True, feed_id: typing.Optional[str] = None):
         self.load_config()
+        from flaskr import feeds  # Importable once load_config has set up sys.path
 
         self.verbose = verbose
-        self.data_url: str = self.config["mbta_data"]["files_url"]
+        self.feed_id = feed_id or feeds.DEFAULT_FEED_ID
+        self.data_config = feeds.feed_data_config(self.config, self.feed_id)
+        self.data_url: str = self.data_config["files_url"]
         self.local_data_path = pathlib.Path(
-            pathlib.Path(__name__).absolute().parent, self.config["mbta_data"]["path"],
+            pathlib.Path(__name__).absolute().parent, self.data_config["path"],
         )
         self.errors = []
         self.missing_filenames: typing.Set[str] = set()
@@ -63,7 +67,7 @@ class Retriever:
         retrieved_filenames = set(zf.namelist())
         if self.verbose:
             print("RETRIEVED:", sorted(retrieved_filenames))
-        for filename in self.config["mbta_data"]["files"].values():
+        for filename in self.data_config["files"].values():
             if self.verbose:
                 print("CHECKING FILE:", filename)
             if filename not in retrieved_filenames:
@@ -79,5 +83,8 @@ class Retriever:
 
 
 if __name__ == "__main__":
-    r = Retriever()
+    parser = argparse.ArgumentParser(description=Retriever.__doc__)
+    parser.add_argument("--feed-id", help="default: the default feed")
+    args = parser.parse_args()
+    r = Retriever(feed_id=args.feed_id)
     r.retrieve_data()
@@ -0,0 +1,381 @@
+"""
+Export the loaded timetable to a versioned, memory-mapped columnar snapshot.
+
+A snapshot is a directory of .npy column arrays plus a table of the id strings
+they refer to. Opening one memory-maps every file instead of reading it, so
+workers start in milliseconds and share pages through the OS page cache.
+
+Layout of <root>/<feed version>/:
+    manifest.json           format, feed version and array names
+    strings.bin             sorted, de-duplicated UTF-8 ids, concatenated
+    string_offsets.npy      strings.bin byte offsets, one more than the number of strings
+    <array name>.npy        one file per column array
+
+Id columns hold positions in the string table, and row references (e.g. the
+stop of a stop time) hold row positions in the referenced table, with
+NO_VALUE (-1) for nulls. Stops, trips, services and patterns are ordered by
+id so rows can be found by binary search. Stop times are grouped by trip and
+ordered by stop_sequence within it: trip i's stop times are the slice
+trip_stop_time_offsets[i]:trip_stop_time_offsets[i + 1].
+"""
+import datetime
+import json
+import os
+import pathlib
+import re
+import shutil
+import typing
+
+import numpy as np
+from flask import g
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func
+
+from flaskr import models as mbta_models
+from flaskr.cache import FeedVersionTracker
+from flaskr.queries import WEEKDAYS
+
+SNAPSHOT_FORMAT = 1
+MANIFEST_FILE = "manifest.json"
+STRINGS_FILE = "strings.bin"
+STRING_OFFSETS = "string_offsets"
+CURRENT_FILE = "CURRENT"  # Holds the directory name of the latest snapshot
+NO_VALUE = -1
+FETCH_BATCH_SIZE = 100000
+
+
+class StringTable:
+    """Sorted, de-duplicated strings stored as one UTF-8 byte buffer plus offsets"""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, strings: typing.Iterable[typing.Optional[str]]) -> "StringTable":
+        encoded = sorted({s.encode("utf-8") for s in strings if s is not None})
+        lengths = np.array([len(s) for s in encoded], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self._bytes(i).decode("utf-8")
+
+    def _bytes(self, i: int) -> bytes:
+        return self.data[self.offsets[i] : self.offsets[i + 1]].tobytes()
+
+    def find(self, value: str) -> int:
+        """Return the position of value by binary search, or NO_VALUE if absent"""
+        target = value.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._bytes(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self) and self._bytes(lo) == target else NO_VALUE
+
+    def positions(self) -> typing.Dict[str, int]:
+        """Map every string to its position; meant for building snapshots, not reading them"""
+        return {self[i]: i for i in range(len(self))}
+
+
+def snapshot_dir_name(feed_version: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", feed_version).strip("_")
+
+
+def write_snapshot(
+    root: pathlib.Path,
+    feed_version: str,
+    strings: StringTable,
+    arrays: typing.Dict[str, np.ndarray],
+) -> pathlib.Path:
+    """Write a snapshot under root and mark it current. The directory is written
+    under a temporary name and renamed, so readers never see a partial snapshot."""
+    root.mkdir(parents=True, exist_ok=True)
+    dir_name = snapshot_dir_name(feed_version)
+    snapshot_path = pathlib.Path(root, dir_name)
+    tmp_path = pathlib.Path(root, f".{dir_name}.{os.getpid()}.tmp")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    tmp_path.mkdir()
+
+    strings.data.tofile(str(pathlib.Path(tmp_path, STRINGS_FILE)))
+    np.save(pathlib.Path(tmp_path, STRING_OFFSETS + ".npy"), strings.offsets)
+    for name, array in arrays.items():
+        np.save(pathlib.Path(tmp_path, name + ".npy"), np.ascontiguousarray(array))
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "feed_version": feed_version,
+        "created": datetime.datetime.utcnow().isoformat(),
+        "arrays": sorted(arrays),
+    }
+    with open(pathlib.Path(tmp_path, MANIFEST_FILE), "w") as f_out:
+        json.dump(manifest, f_out, indent=4)
+
+    if snapshot_path.exists():
+        shutil.rmtree(snapshot_path)
+    os.rename(tmp_path, snapshot_path)
+
+    tmp_current = pathlib.Path(root, f".{CURRENT_FILE}.{os.getpid()}.tmp")
+    tmp_current.write_text(dir_name)
+    os.replace(tmp_current, pathlib.Path(root, CURRENT_FILE))
+    return snapshot_path
+
+
+class TimetableSnapshot:
+    """A read-only, memory-mapped view of a timetable snapshot"""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        with open(pathlib.Path(self.path, MANIFEST_FILE)) as f_in:
+            self.manifest = json.load(f_in)
+        if self.manifest["format"] != SNAPSHOT_FORMAT:
+            raise ValueError(
+                f"Unsupported snapshot format {self.manifest['format']} in {self.path}"
+            )
+
+        self.arrays = {
+            name: np.load(pathlib.Path(self.path, name + ".npy"), mmap_mode="r")
+            for name in self.manifest["arrays"]
+        }
+        offsets = np.load(
+            pathlib.Path(self.path, STRING_OFFSETS + ".npy"), mmap_mode="r"
+        )
+        strings_path = pathlib.Path(self.path, STRINGS_FILE)
+        if strings_path.stat().st_size:
+            data = np.memmap(strings_path, dtype=np.uint8, mode="r")
+        else:  # Empty files can't be mapped
+            data = np.zeros(0, dtype=np.uint8)
+        self.strings = StringTable(data, offsets)
+
+    @classmethod
+    def open(
+        cls, root: pathlib.Path, feed_version: typing.Optional[str] = None
+    ) -> "TimetableSnapshot":
+        """Open the snapshot for feed_version, or the current snapshot if not given"""
+        if feed_version:
+            dir_name = snapshot_dir_name(feed_version)
+        else:
+            dir_name = pathlib.Path(root, CURRENT_FILE).read_text().strip()
+        return cls(pathlib.Path(root, dir_name))
+
+    @property
+    def feed_version(self) -> str:
+        return self.manifest["feed_version"]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def row(self, id_array_name: str, value: str) -> int:
+        """Return the row of value in a sorted id column, e.g. row("stop_id", "place-sstat")"""
+        string_idx = self.strings.find(value)
+        if string_idx == NO_VALUE:
+            return NO_VALUE
+        ids = self.arrays[id_array_name]
+        row = int(np.searchsorted(ids, string_idx))
+        return row if row < len(ids) and ids[row] == string_idx else NO_VALUE
+
+    def trip_stop_times(self, trip_id: str) -> typing.Dict[str, np.ndarray]:
+        """Return stop_time_* arrays sliced to the stop times of trip_id"""
+        trip_row = self.row("trip_id", trip_id)
+        if trip_row == NO_VALUE:
+            raise KeyError(trip_id)
+        offsets = self.arrays["trip_stop_time_offsets"]
+        start, stop = offsets[trip_row], offsets[trip_row + 1]
+        return {
+            name: array[start:stop]
+            for name, array in self.arrays.items()
+            if name.startswith("stop_time_")
+        }
+
+
+class SnapshotWriter:
+    """Build column arrays from the database and write them as a snapshot"""
+
+    def __init__(self, db: SQLAlchemy, root: typing.Optional[pathlib.Path] = None):
+        self.db = db
+        self.root = root or pathlib.Path(
+            pathlib.Path(__name__).absolute().parent, g.config["snapshot"]["path"]
+        )
+
+    def export(self, feed_version: typing.Optional[str] = None) -> pathlib.Path:
+        feed_version = feed_version or FeedVersionTracker.fetch_version()
+        if not feed_version:
+            raise RuntimeError("No feed version loaded to export")
+        print(f"Exporting timetable snapshot for {feed_version}")
+        strings, arrays = self.collect_arrays(feed_version)
+        snapshot_path = write_snapshot(self.root, feed_version, strings, arrays)
+        print(f"Wrote {len(arrays)} arrays to {snapshot_path}")
+        return snapshot_path
+
+    def collect_arrays(
+        self, feed_version: str
+    ) -> typing.Tuple[StringTable, typing.Dict[str, np.ndarray]]:
+        session = self.db.session
+        Stop = mbta_models.Stop
+        Trip = mbta_models.Trip
+        Calendar = mbta_models.Calendar
+        CalendarDate = mbta_models.CalendarDate
+        RoutePattern = mbta_models.RoutePattern
+
+        stops = session.query(
+            Stop.stop_id,
+            func.ST_X(Stop.stop_lonlat),
+            func.ST_Y(Stop.stop_lonlat),
+            Stop.parent_station,
+        ).all()
+        trips = session.query(
+            Trip.trip_id,
+            Trip.route_id,
+            Trip.service_id,
+            Trip.route_pattern_id,
+            Trip.direction_id,
+        ).all()
+        calendars = session.query(
+            Calendar.service_id,
+            *[getattr(Calendar, day) for day in WEEKDAYS],
+            Calendar.start_date,
+            Calendar.end_date,
+        ).all()
+        calendar_dates = session.query(
+            CalendarDate.service_id, CalendarDate.date, CalendarDate.exception_type
+        ).all()
+        patterns = session.query(
+            RoutePattern.route_pattern_id,
+            RoutePattern.route_id,
+            RoutePattern.direction_id,
+        ).all()
+
+        strings = StringTable.build(
+            [row[0] for row in stops]
+            + [value for row in trips for value in row[:4]]
+            + [row[0] for row in calendars]
+            + [row[0] for row in calendar_dates]
+            + [value for row in patterns for value in row[:2]]
+        )
+        positions = strings.positions()
+
+        def string_column(values: typing.Iterable[typing.Optional[str]]) -> np.ndarray:
+            return np.array(
+                [NO_VALUE if v is None else positions[v] for v in values],
+                dtype=np.int32,
+            )
+
+        arrays = {}  # type: typing.Dict[str, np.ndarray]
+        stops.sort(key=lambda row: positions[row[0]])
+        stop_rows = {row[0]: i for i, row in enumerate(stops)}
+        arrays["stop_id"] = string_column(row[0] for row in stops)
+        arrays["stop_lon"] = np.array(
+            [np.nan if row[1] is None else row[1] for row in stops], dtype=np.float64
+        )
+        arrays["stop_lat"] = np.array(
+            [np.nan if row[2] is None else row[2] for row in stops], dtype=np.float64
+        )
+        arrays["stop_parent"] = np.array(
+            [stop_rows.get(row[3], NO_VALUE) for row in stops], dtype=np.int32
+        )
+
+        trips.sort(key=lambda row: positions[row[0]])
+        trip_rows = {row[0]: i for i, row in enumerate(trips)}
+        arrays["trip_id"] = string_column(row[0] for row in trips)
+        arrays["trip_route"] = string_column(row[1] for row in trips)
+        arrays["trip_service"] = string_column(row[2] for row in trips)
+        arrays["trip_pattern"] = string_column(row[3] for row in trips)
+        arrays["trip_direction"] = np.array(
+            [NO_VALUE if row[4] is None else row[4] for row in trips], dtype=np.int8
+        )
+
+        arrays.update(self.collect_stop_times(trip_rows, stop_rows, feed_version))
+
+        calendars.sort(key=lambda row: positions[row[0]])
+        service_rows = {row[0]: i for i, row in enumerate(calendars)}
+        arrays["service_id"] = string_column(row[0] for row in calendars)
+        arrays["service_weekdays"] = np.array(  # Bit 0 is Monday
+            [
+                sum(1 << day for day, runs in enumerate(row[1:8]) if runs)
+                for row in calendars
+            ],
+            dtype=np.uint8,
+        )
+        arrays["service_start_date"] = date_column(row[8] for row in calendars)
+        arrays["service_end_date"] = date_column(row[9] for row in calendars)
+        arrays["service_exception_service"] = np.array(
+            [service_rows.get(row[0], NO_VALUE) for row in calendar_dates],
+            dtype=np.int32,
+        )
+        arrays["service_exception_date"] = date_column(row[1] for row in calendar_dates)
+        arrays["service_exception_type"] = np.array(  # 1: added, 2: removed
+            [int(row[2].name.split("_")[1]) for row in calendar_dates], dtype=np.int8
+        )
+
+        patterns.sort(key=lambda row: positions[row[0]])
+        arrays["pattern_id"] = string_column(row[0] for row in patterns)
+        arrays["pattern_route"] = string_column(row[1] for row in patterns)
+        arrays["pattern_direction"] = np.array(
+            [NO_VALUE if row[2] is None else row[2] for row in patterns], dtype=np.int8
+        )
+        return strings, arrays
+
+    def collect_stop_times(
+        self,
+        trip_rows: typing.Dict[str, int],
+        stop_rows: typing.Dict[str, int],
+        feed_version: str,
+    ) -> typing.Dict[str, np.ndarray]:
+        """Stream feed_version's stop times in batches into arrays grouped by trip
+        and ordered by stop_sequence"""
+        StopTime = mbta_models.StopTime
+        query = (
+            self.db.session.query(
+                StopTime.trip_id,
+                StopTime.stop_id,
+                StopTime.stop_sequence,
+                StopTime.arrival_time,
+                StopTime.departure_time,
+            )
+            .filter(StopTime.feed_version == feed_version)
+            .yield_per(FETCH_BATCH_SIZE)
+        )
+
+        chunks = []  # type: typing.List[np.ndarray]
+        batch = []  # type: typing.List[typing.Tuple[int, int, int, int, int]]
+        for trip_id, stop_id, sequence, arrival, departure in query:
+            batch.append(
+                (trip_rows[trip_id], stop_rows[stop_id], sequence, arrival, departure)
+            )
+            if len(batch) == FETCH_BATCH_SIZE:
+                chunks.append(np.array(batch, dtype=np.int32))
+                batch = []
+        if batch:
+            chunks.append(np.array(batch, dtype=np.int32))
+        stop_times = (
+            np.concatenate(chunks) if chunks else np.zeros((0, 5), dtype=np.int32)
+        )
+
+        order = np.lexsort((stop_times[:, 2], stop_times[:, 0]))
+        stop_times = stop_times[order]
+        counts = np.bincount(stop_times[:, 0], minlength=len(trip_rows))
+        return {
+            "trip_stop_time_offsets": np.concatenate(([0], np.cumsum(counts))).astype(
+                np.int64
+            ),
+            "stop_time_trip": stop_times[:, 0],
+            "stop_time_stop": stop_times[:, 1],
+            "stop_time_sequence": stop_times[:, 2],
+            "stop_time_arrival": stop_times[:, 3],
+            "stop_time_departure": stop_times[:, 4],
+        }
+
+
+def date_column(dates: typing.Iterable[datetime.date]) -> np.ndarray:
+    """Dates as YYYYMMDD integers"""
+    return np.array(
+        [date.year * 10000 + date.month * 100 + date.day for date in dates],
+        dtype=np.int32,
+    )
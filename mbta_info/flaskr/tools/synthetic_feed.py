@@ -0,0 +1,711 @@
+"""
+Generate a synthetic GTFS feed for load and benchmark testing.
+
+The feed has every file the Loader reads, in the MBTA's format, at a size set
+by FeedScale: FeedScale.mbta(10) is about ten times the MBTA's network and
+timetable. Output depends only on the scale, the seed and the start date, and
+every reference between files (trips to routes and services, stop times to
+trips, stops and checkpoints, platforms to stations, ...) resolves. Rows are
+streamed to disk route by route, so even 100x feeds are written in bounded
+memory.
+
+Run from mbta_info/ to write the files named by mbta_data.files in the config
+into mbta_data.path, ready for the Loader:
+    python -m flaskr.tools.synthetic_feed [--multiple 10] [--seed 0] [--output DIR]
+"""
+import argparse
+import csv
+import datetime
+import math
+import pathlib
+import random
+import typing
+
+HEADERS = {
+    "feed_info": (
+        "feed_publisher_name",
+        "feed_publisher_url",
+        "feed_lang",
+        "feed_start_date",
+        "feed_end_date",
+        "feed_version",
+        "feed_contact_email",
+        "feed_contact_url",
+    ),
+    "agency": (
+        "agency_id",
+        "agency_name",
+        "agency_url",
+        "agency_timezone",
+        "agency_lang",
+        "agency_phone",
+    ),
+    "calendar": (
+        "service_id",
+        "monday",
+        "tuesday",
+        "wednesday",
+        "thursday",
+        "friday",
+        "saturday",
+        "sunday",
+        "start_date",
+        "end_date",
+    ),
+    "calendar_attribute": (
+        "service_id",
+        "service_description",
+        "service_schedule_name",
+        "service_schedule_type",
+        "service_schedule_typicality",
+        "rating_start_date",
+        "rating_end_date",
+        "rating_description",
+    ),
+    "calendar_date": ("service_id", "date", "exception_type", "holiday_name"),
+    "checkpoint": ("checkpoint_id", "checkpoint_name"),
+    "direction": ("route_id", "direction_id", "direction", "direction_destination"),
+    "line": (
+        "line_id",
+        "line_short_name",
+        "line_long_name",
+        "line_desc",
+        "line_url",
+        "line_color",
+        "line_text_color",
+        "line_sort_order",
+    ),
+    "linked_dataset": (
+        "url",
+        "trip_updates",
+        "vehicle_positions",
+        "service_alerts",
+        "authentication_type",
+    ),
+    "route_pattern": (
+        "route_pattern_id",
+        "route_id",
+        "direction_id",
+        "route_pattern_name",
+        "route_pattern_time_desc",
+        "route_pattern_typicality",
+        "route_pattern_sort_order",
+        "representative_trip_id",
+    ),
+    "route": (
+        "route_id",
+        "agency_id",
+        "route_short_name",
+        "route_long_name",
+        "route_desc",
+        "route_type",
+        "route_url",
+        "route_color",
+        "route_text_color",
+        "route_sort_order",
+        "route_fare_class",
+        "line_id",
+        "listed_route",
+    ),
+    "shape": (
+        "shape_id",
+        "shape_pt_lat",
+        "shape_pt_lon",
+        "shape_pt_sequence",
+        "shape_dist_traveled",
+    ),
+    "stop_time": (
+        "trip_id",
+        "arrival_time",
+        "departure_time",
+        "stop_id",
+        "stop_sequence",
+        "stop_headsign",
+        "pickup_type",
+        "drop_off_type",
+        "timepoint",
+        "checkpoint_id",
+    ),
+    "stop": (
+        "stop_id",
+        "stop_code",
+        "stop_name",
+        "stop_desc",
+        "platform_code",
+        "platform_name",
+        "stop_lat",
+        "stop_lon",
+        "zone_id",
+        "stop_address",
+        "stop_url",
+        "level_id",
+        "location_type",
+        "parent_station",
+        "wheelchair_boarding",
+        "municipality",
+        "on_street",
+        "at_street",
+        "vehicle_type",
+    ),
+    "trip": (
+        "route_id",
+        "service_id",
+        "trip_id",
+        "trip_headsign",
+        "trip_short_name",
+        "direction_id",
+        "block_id",
+        "shape_id",
+        "wheelchair_accessible",
+        "trip_route_type",
+        "route_pattern_id",
+        "bikes_allowed",
+    ),
+    "multi_route_trip": ("added_route_id", "trip_id"),
+}
+
+DATE_FORMAT = "%Y%m%d"
+# Service days of each synthetic service, Monday first, and its share of each route's trips
+SERVICES = (
+    ("weekday", (1, 1, 1, 1, 1, 0, 0), 0.6),
+    ("saturday", (0, 0, 0, 0, 0, 1, 0), 0.2),
+    ("sunday", (0, 0, 0, 0, 0, 0, 1), 0.2),
+)
+# (route_type, route_desc, route_fare_class, speed in meters per second) by share of routes
+ROUTE_KINDS = (
+    (0.03, "1", "Rapid Transit", "Rapid Transit", 12.0),
+    (0.07, "2", "Commuter Rail", "Commuter Rail", 20.0),
+    (0.02, "4", "Ferry", "Ferry", 8.0),
+    (1.00, "3", "Local Bus", "Local Bus", 6.0),
+)
+BOUNDS = (42.20, 42.50, -71.30, -70.90)  # min/max latitude and longitude
+STATION_EVERY = 20  # one stop in this many is a station with platforms
+CHECKPOINT_EVERY = 10  # one stop in this many is a timepoint with a checkpoint
+MULTI_ROUTE_EVERY = 50  # one trip in this many also runs as the next route
+FIRST_DEPARTURE = 5 * 3600
+LAST_DEPARTURE = 24 * 3600 + 30 * 60
+DWELL_TIME = 30  # seconds
+DEFAULT_START_DATE = datetime.date(2020, 1, 6)  # A Monday
+SCALE_PARAMETERS = (
+    "routes",
+    "stops",
+    "stops_per_route",
+    "trips_per_route",
+    "points_per_shape",
+    "service_days",
+)
+
+
+class FeedScale:
+    """The size of a synthetic feed"""
+
+    def __init__(
+        self,
+        routes: int = 190,
+        stops: int = 8000,
+        stops_per_route: int = 30,
+        trips_per_route: int = 300,
+        points_per_shape: int = 600,
+        service_days: int = 90,
+    ):
+        if stops_per_route > stops or min(routes, stops_per_route) < 1:
+            raise ValueError(
+                f"Cannot build {routes} routes of {stops_per_route} stops from {stops} stops"
+            )
+        self.routes = routes
+        self.stops = stops
+        self.stops_per_route = stops_per_route
+        self.trips_per_route = trips_per_route
+        self.points_per_shape = max(points_per_shape, 2)
+        self.service_days = service_days
+
+    @classmethod
+    def mbta(cls, multiple: float = 1) -> "FeedScale":
+        """multiple times the MBTA's network: routes, stops and so trips grow, timetables per route don't"""
+        base = cls()
+        return cls(
+            routes=max(1, round(base.routes * multiple)),
+            stops=max(base.stops_per_route, round(base.stops * multiple)),
+            stops_per_route=base.stops_per_route,
+            trips_per_route=base.trips_per_route,
+            points_per_shape=base.points_per_shape,
+            service_days=base.service_days,
+        )
+
+    def __repr__(self):
+        return (
+            f"<FeedScale: {self.routes} routes, {self.stops} stops, "
+            f"{self.stops_per_route} stops and {self.trips_per_route} trips per route, "
+            f"{self.points_per_shape} points per shape, {self.service_days} days>"
+        )
+
+
+class SyntheticFeed:
+    def __init__(
+        self,
+        scale: FeedScale,
+        seed: int = 0,
+        start_date: datetime.date = DEFAULT_START_DATE,
+    ):
+        self.scale = scale
+        self.seed = seed
+        self.start_date = start_date
+        self.end_date = start_date + datetime.timedelta(days=scale.service_days - 1)
+        self.feed_version = (
+            f"Synthetic {scale.routes} routes {scale.stops} stops seed {seed}"
+        )
+
+        rng = random.Random(f"{seed}-stops")
+        min_lat, max_lat, min_lon, max_lon = BOUNDS
+        self.stop_coordinates = [
+            (rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon))
+            for _ in range(scale.stops)
+        ]  # type: typing.List[typing.Tuple[float, float]]
+        # Stops bucketed into a square grid of cells averaging half a route's worth of stops,
+        # so each route can serve a neighbourhood instead of stops across the whole region
+        self.grid_size = max(1, int(math.sqrt(2 * scale.stops / scale.stops_per_route)))
+        self.grid = {}  # type: typing.Dict[typing.Tuple[int, int], typing.List[int]]
+        for stop_index in range(scale.stops):
+            self.grid.setdefault(self._grid_cell(stop_index), []).append(stop_index)
+        self.route_stops = [
+            self._route_stop_indexes(route_index) for route_index in range(scale.routes)
+        ]  # type: typing.List[typing.List[int]]
+
+    def write(
+        self, output_dir: pathlib.Path, files: typing.Dict[str, str]
+    ) -> typing.Dict[str, int]:
+        """Write each table to its file name in output_dir, returning the rows written per table"""
+        unknown_tables = set(files) - set(HEADERS)
+        if unknown_tables:
+            raise ValueError(f"No synthetic data for tables: {sorted(unknown_tables)}")
+        output_dir.mkdir(parents=True, exist_ok=True)
+        row_counts = {}
+        for table_name, file_name in files.items():
+            with open(output_dir / file_name, "w", newline="") as f_out:
+                writer = csv.writer(f_out)
+                writer.writerow(HEADERS[table_name])
+                row_count = 0
+                for row in getattr(self, f"{table_name}_rows")():
+                    writer.writerow(row)
+                    row_count += 1
+            row_counts[table_name] = row_count
+            print(f"Wrote {row_count} rows to {output_dir / file_name}")
+        return row_counts
+
+    def feed_info_rows(self) -> typing.Iterator[typing.Tuple]:
+        yield (
+            "Synthetic Transit",
+            "https://example.com",
+            "EN",
+            self.start_date.strftime(DATE_FORMAT),
+            self.end_date.strftime(DATE_FORMAT),
+            self.feed_version,
+            "feed@example.com",
+            "https://example.com/feed",
+        )
+
+    def agency_rows(self) -> typing.Iterator[typing.Tuple]:
+        yield (
+            1,
+            "Synthetic Transit",
+            "https://example.com",
+            "America/New_York",
+            "EN",
+            "",
+        )
+
+    def calendar_rows(self) -> typing.Iterator[typing.Tuple]:
+        for service_id, weekdays, _ in SERVICES:
+            yield (
+                (service_id,)
+                + weekdays
+                + (
+                    self.start_date.strftime(DATE_FORMAT),
+                    self.end_date.strftime(DATE_FORMAT),
+                )
+            )
+
+    def calendar_attribute_rows(self) -> typing.Iterator[typing.Tuple]:
+        for service_id, _, _ in SERVICES:
+            yield (
+                service_id,
+                service_id.title(),
+                f"{service_id.title()} schedule",
+                service_id.title(),
+                1,
+                self.start_date.strftime(DATE_FORMAT),
+                self.end_date.strftime(DATE_FORMAT),
+                "Synthetic",
+            )
+
+    def calendar_date_rows(self) -> typing.Iterator[typing.Tuple]:
+        """A holiday every four weeks, run on the Sunday schedule"""
+        holiday = self.start_date + datetime.timedelta(
+            days=(-self.start_date.weekday()) % 7
+        )
+        holiday += datetime.timedelta(days=14)  # A Monday two weeks in
+        while holiday <= self.end_date:
+            date = holiday.strftime(DATE_FORMAT)
+            yield ("weekday", date, 2, "Synthetic Holiday")
+            yield ("sunday", date, 1, "Synthetic Holiday")
+            holiday += datetime.timedelta(days=28)
+
+    def checkpoint_rows(self) -> typing.Iterator[typing.Tuple]:
+        for stop_index in range(0, self.scale.stops, CHECKPOINT_EVERY):
+            yield (self._checkpoint_id(stop_index), f"Checkpoint {stop_index}")
+
+    def direction_rows(self) -> typing.Iterator[typing.Tuple]:
+        for route_index, stop_indexes in enumerate(self.route_stops):
+            route_id = self._route_id(route_index)
+            yield (route_id, 0, "Outbound", self._stop_name(stop_indexes[-1]))
+            yield (route_id, 1, "Inbound", self._stop_name(stop_indexes[0]))
+
+    def line_rows(self) -> typing.Iterator[typing.Tuple]:
+        for route_index in range(self.scale.routes):
+            yield (
+                self._line_id(route_index),
+                str(route_index),
+                f"Line {route_index}",
+                "",
+                "https://example.com/lines",
+                "FFC72C",
+                "000000",
+                route_index,
+            )
+
+    def linked_dataset_rows(self) -> typing.Iterator[typing.Tuple]:
+        yield ("https://example.com/realtime", 1, 1, 1, 0)
+
+    def route_pattern_rows(self) -> typing.Iterator[typing.Tuple]:
+        for route_index in range(self.scale.routes):
+            route_id = self._route_id(route_index)
+            trips = self._route_trips(route_index)
+            for direction_id in (0, 1):
+                representative = next(
+                    (trip[0] for trip in trips if trip[2] == direction_id), ""
+                )
+                yield (
+                    self._route_pattern_id(route_index, direction_id),
+                    route_id,
+                    direction_id,
+                    f"Route {route_index} {('Outbound', 'Inbound')[direction_id]}",
+                    "",
+                    1,
+                    route_index * 2 + direction_id,
+                    representative,
+                )
+
+    def route_rows(self) -> typing.Iterator[typing.Tuple]:
+        for route_index in range(self.scale.routes):
+            route_type, route_desc, fare_class, _ = self._route_kind(route_index)
+            yield (
+                self._route_id(route_index),
+                1,
+                str(route_index),
+                f"Route {route_index}",
+                route_desc,
+                route_type,
+                "https://example.com/routes",
+                "FFC72C",
+                "000000",
+                route_index,
+                fare_class,
+                self._line_id(route_index),
+                1,
+            )
+
+    def shape_rows(self) -> typing.Iterator[typing.Tuple]:
+        for route_index, stop_indexes in enumerate(self.route_stops):
+            for direction_id in (0, 1):
+                ordered = stop_indexes[:: 1 if direction_id == 0 else -1]
+                shape_id = self._shape_id(route_index, direction_id)
+                points = self._shape_points(ordered)
+                traveled = 0.0
+                for sequence, (lat, lon) in enumerate(points):
+                    if sequence:
+                        traveled += _distance(points[sequence - 1], (lat, lon))
+                    yield (
+                        shape_id,
+                        round(lat, 6),
+                        round(lon, 6),
+                        sequence,
+                        round(traveled, 1),
+                    )
+
+    def stop_rows(self) -> typing.Iterator[typing.Tuple]:
+        # Stations come first so the platforms' parent_station references resolve
+        for stop_index in range(0, self.scale.stops, STATION_EVERY):
+            yield self._stop_row(self._station_id(stop_index), stop_index, 1, "")
+        for stop_index in range(self.scale.stops):
+            parent = ""
+            if stop_index % STATION_EVERY == 0:
+                parent = self._station_id(stop_index)
+            yield self._stop_row(self._stop_id(stop_index), stop_index, 0, parent)
+
+    def trip_rows(self) -> typing.Iterator[typing.Tuple]:
+        for route_index, stop_indexes in enumerate(self.route_stops):
+            route_id = self._route_id(route_index)
+            for trip_id, service_id, direction_id, _ in self._route_trips(route_index):
+                last_stop = stop_indexes[-1 if direction_id == 0 else 0]
+                yield (
+                    route_id,
+                    service_id,
+                    trip_id,
+                    self._stop_name(last_stop),
+                    "",
+                    direction_id,
+                    f"{route_id}-{service_id}-block",
+                    self._shape_id(route_index, direction_id),
+                    1,
+                    "",
+                    self._route_pattern_id(route_index, direction_id),
+                    0,
+                )
+
+    def stop_time_rows(self) -> typing.Iterator[typing.Tuple]:
+        for route_index, stop_indexes in enumerate(self.route_stops):
+            offsets = self._running_times(route_index)
+            for trip_id, _, direction_id, start in self._route_trips(route_index):
+                ordered = stop_indexes[:: 1 if direction_id == 0 else -1]
+                headsign = self._stop_name(ordered[-1])
+                for sequence, (stop_index, offset) in enumerate(
+                    zip(ordered, offsets[direction_id]), start=1
+                ):
+                    arrival = start + offset
+                    checkpoint = stop_index % CHECKPOINT_EVERY == 0
+                    yield (
+                        trip_id,
+                        _format_time(arrival),
+                        _format_time(arrival + DWELL_TIME),
+                        self._stop_id(stop_index),
+                        sequence,
+                        headsign,
+                        0,
+                        0,
+                        int(checkpoint),
+                        self._checkpoint_id(stop_index) if checkpoint else "",
+                    )
+
+    def multi_route_trip_rows(self) -> typing.Iterator[typing.Tuple]:
+        if self.scale.routes < 2:
+            return
+        for route_index in range(self.scale.routes):
+            added_route_id = self._route_id((route_index + 1) % self.scale.routes)
+            for trip in self._route_trips(route_index)[::MULTI_ROUTE_EVERY]:
+                yield (added_route_id, trip[0])
+
+    def _route_stop_indexes(self, route_index: int) -> typing.List[int]:
+        """
+        A route's stops in outbound order: a sample of the stops nearest a line
+        on a random heading through a random stop, in order along the line
+        """
+        rng = random.Random(f"{self.seed}-route-{route_index}")
+        anchor = rng.randrange(self.scale.stops)
+        row, column = self._grid_cell(anchor)
+        candidates = []  # type: typing.List[int]
+        radius = 0
+        while (
+            len(candidates) < 2 * self.scale.stops_per_route and radius < self.grid_size
+        ):
+            radius += 1
+            candidates = [
+                stop_index
+                for cell_row in range(row - radius, row + radius + 1)
+                for cell_column in range(column - radius, column + radius + 1)
+                for stop_index in self.grid.get((cell_row, cell_column), ())
+            ]
+        heading = rng.uniform(0, math.pi)
+        along, across = math.cos(heading), math.sin(heading)
+        anchor_lat, anchor_lon = self.stop_coordinates[anchor]
+        corridor = sorted(
+            candidates,
+            key=lambda index: (
+                abs(
+                    (self.stop_coordinates[index][0] - anchor_lat) * across
+                    - (self.stop_coordinates[index][1] - anchor_lon) * along
+                ),
+                index,
+            ),
+        )[: 2 * self.scale.stops_per_route]
+        return sorted(
+            rng.sample(corridor, self.scale.stops_per_route),
+            key=lambda index: (
+                self.stop_coordinates[index][0] * along
+                + self.stop_coordinates[index][1] * across,
+                index,
+            ),
+        )
+
+    def _grid_cell(self, stop_index: int) -> typing.Tuple[int, int]:
+        min_lat, max_lat, min_lon, max_lon = BOUNDS
+        lat, lon = self.stop_coordinates[stop_index]
+        row = int((lat - min_lat) / (max_lat - min_lat) * self.grid_size)
+        column = int((lon - min_lon) / (max_lon - min_lon) * self.grid_size)
+        return min(row, self.grid_size - 1), min(column, self.grid_size - 1)
+
+    def _route_trips(
+        self, route_index: int
+    ) -> typing.List[typing.Tuple[str, str, int, int]]:
+        """(trip_id, service_id, direction_id, start time) of each of the route's trips"""
+        rng = random.Random(f"{self.seed}-trips-{route_index}")
+        route_id = self._route_id(route_index)
+        trips = []
+        for service_id, _, share in SERVICES:
+            count = max(1, round(self.scale.trips_per_route * share))
+            headway = (LAST_DEPARTURE - FIRST_DEPARTURE) / count
+            for trip_index in range(count):
+                start = FIRST_DEPARTURE + int(trip_index * headway)
+                start += rng.randrange(0, max(1, int(headway / 4)))
+                trips.append(
+                    (
+                        f"{route_id}-{service_id}-{trip_index}",
+                        service_id,
+                        trip_index % 2,
+                        start,
+                    )
+                )
+        return trips
+
+    def _running_times(self, route_index: int) -> typing.Tuple[typing.List[int], ...]:
+        """Seconds from the first stop's arrival to each stop's, for each direction"""
+        speed = self._route_kind(route_index)[3]
+        offsets = []
+        for direction_id in (0, 1):
+            ordered = self.route_stops[route_index][:: 1 if direction_id == 0 else -1]
+            direction_offsets = [0]
+            for previous, stop_index in zip(ordered, ordered[1:]):
+                distance = _distance(
+                    self.stop_coordinates[previous], self.stop_coordinates[stop_index]
+                )
+                direction_offsets.append(
+                    direction_offsets[-1] + DWELL_TIME + max(60, int(distance / speed))
+                )
+            offsets.append(direction_offsets)
+        return tuple(offsets)
+
+    def _shape_points(
+        self, stop_indexes: typing.Sequence[int]
+    ) -> typing.List[typing.Tuple[float, float]]:
+        """points_per_shape points evenly spaced along the legs between stop_indexes"""
+        coordinates = [self.stop_coordinates[index] for index in stop_indexes]
+        legs = len(coordinates) - 1
+        if not legs:
+            return coordinates * self.scale.points_per_shape
+        points = []
+        for point_index in range(self.scale.points_per_shape):
+            position = point_index * legs / (self.scale.points_per_shape - 1)
+            leg = min(int(position), legs - 1)
+            fraction = position - leg
+            (lat1, lon1), (lat2, lon2) = coordinates[leg], coordinates[leg + 1]
+            points.append(
+                (lat1 + (lat2 - lat1) * fraction, lon1 + (lon2 - lon1) * fraction)
+            )
+        return points
+
+    def _stop_row(
+        self, stop_id: str, stop_index: int, location_type: int, parent_station: str
+    ) -> typing.Tuple:
+        lat, lon = self.stop_coordinates[stop_index]
+        return (
+            stop_id,
+            stop_id if location_type == 0 else "",
+            self._stop_name(stop_index),
+            "",
+            "",
+            "",
+            round(lat, 6),
+            round(lon, 6),
+            f"zone-{stop_index % 10}",
+            "",
+            "https://example.com/stops",
+            "",
+            location_type,
+            parent_station,
+            1,
+            "Boston",
+            f"Street {stop_index}",
+            "",
+            "",
+        )
+
+    def _route_kind(self, route_index: int) -> typing.Tuple[str, str, str, float]:
+        position = (route_index + 0.5) / self.scale.routes
+        for share, *kind in ROUTE_KINDS:
+            if position <= share:
+                break
+            position -= share
+        return tuple(kind)  # type: ignore[return-value]
+
+    def _route_id(self, route_index: int) -> str:
+        return f"route{route_index}"
+
+    def _line_id(self, route_index: int) -> str:
+        return f"line-{route_index}"
+
+    def _route_pattern_id(self, route_index: int, direction_id: int) -> str:
+        return f"route{route_index}-{direction_id}"
+
+    def _shape_id(self, route_index: int, direction_id: int) -> str:
+        return f"shape{route_index}-{direction_id}"
+
+    def _stop_id(self, stop_index: int) -> str:
+        return f"stop{stop_index}"
+
+    def _station_id(self, stop_index: int) -> str:
+        return f"place-{stop_index}"
+
+    def _stop_name(self, stop_index: int) -> str:
+        return f"Stop {stop_index}"
+
+    def _checkpoint_id(self, stop_index: int) -> str:
+        return f"chk{stop_index}"
+
+
+def _distance(
+    origin: typing.Tuple[float, float], destination: typing.Tuple[float, float]
+) -> float:
+    """Approximate meters between two nearby (lat, lon) points"""
+    lat1, lon1 = origin
+    lat2, lon2 = destination
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return 6371008.8 * math.hypot(x, y)
+
+
+def _format_time(seconds: int) -> str:
+    """HH:MM:SS, with hours past 24 for service after midnight"""
+    return f"{seconds // 3600:02}:{seconds // 60 % 60:02}:{seconds % 60:02}"
+
+
+def main():
+    from config import Config
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--multiple", type=float, default=1, help="of the MBTA's size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=pathlib.Path, help="default: mbta_data.path")
+    parser.add_argument("--start-date", help="YYYYMMDD, default 20200106")
+    for name in SCALE_PARAMETERS:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int)
+    args = parser.parse_args()
+
+    scale = FeedScale.mbta(args.multiple)
+    scale = FeedScale(
+        **{
+            name: getattr(args, name) or getattr(scale, name)
+            for name in SCALE_PARAMETERS
+        }
+    )
+    start_date = (
+        datetime.datetime.strptime(args.start_date, DATE_FORMAT).date()
+        if args.start_date
+        else DEFAULT_START_DATE
+    )
+    config = Config().config["mbta_data"]
+    output_dir = args.output or pathlib.Path(config["path"])
+    print(f"Generating {scale}")
+    SyntheticFeed(scale, args.seed, start_date).write(output_dir, config["files"])
+
+
+if __name__ == "__main__":
+    main()
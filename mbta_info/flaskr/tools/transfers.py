@@ -0,0 +1,205 @@
+import math
+import typing
+
+import numpy as np
+from flask import g
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func
+
+from flaskr import models as mbta_models
+
+EARTH_RADIUS = 6371008.8  # Mean earth radius in meters
+
+
+def haversine_distances(
+    lon1: np.ndarray, lat1: np.ndarray, lon2: np.ndarray, lat2: np.ndarray
+) -> np.ndarray:
+    """Return great-circle distances in meters between points given in degrees.
+    Arguments are broadcast against each other, so a column of origins and a
+    row of destinations produce a full distance matrix."""
+    lon1, lat1, lon2, lat2 = (np.radians(arr) for arr in (lon1, lat1, lon2, lat2))
+    half_dlat = (lat2 - lat1) / 2
+    half_dlon = (lon2 - lon1) / 2
+    a = np.sin(half_dlat) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(half_dlon) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def find_neighbours(
+    lons: np.ndarray, lats: np.ndarray, max_distance: float, block_size: int = 256
+) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return (from_idx, to_idx, distances) for every ordered pair of distinct points
+    within max_distance meters of each other, sorted by from_idx then distance.
+
+    Points are sorted by latitude so each block of origins is only compared against
+    the latitude band that could possibly be in range.
+    """
+    n_points = len(lats)
+    order = np.argsort(lats, kind="stable")
+    sorted_lats = lats[order]
+    lat_margin = math.degrees(max_distance / EARTH_RADIUS)
+
+    from_parts, to_parts, distance_parts = [], [], []
+    for start in range(0, n_points, block_size):
+        stop = min(start + block_size, n_points)
+        block = order[start:stop]
+        band_start = np.searchsorted(sorted_lats, sorted_lats[start] - lat_margin)
+        band_stop = np.searchsorted(
+            sorted_lats, sorted_lats[stop - 1] + lat_margin, side="right"
+        )
+        candidates = order[band_start:band_stop]
+
+        distances = haversine_distances(
+            lons[block, None], lats[block, None], lons[candidates], lats[candidates]
+        )
+        in_range = (distances <= max_distance) & (block[:, None] != candidates)
+        rows, cols = np.nonzero(in_range)
+        from_parts.append(block[rows])
+        to_parts.append(candidates[cols])
+        distance_parts.append(distances[rows, cols])
+
+    if not from_parts:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.float64)
+
+    from_idx = np.concatenate(from_parts)
+    to_idx = np.concatenate(to_parts)
+    distances = np.concatenate(distance_parts)
+    edge_order = np.lexsort((distances, from_idx))
+    return from_idx[edge_order], to_idx[edge_order], distances[edge_order]
+
+
+class TransferGraph:
+    """
+    Walking transfers held as a compact (CSR) adjacency structure: the transfers
+    from stop_ids[i] are neighbours[offsets[i]:offsets[i + 1]], with matching
+    distances and walk_times, ordered nearest first.
+    """
+
+    def __init__(
+        self,
+        stop_ids: typing.Sequence[str],
+        from_idx: np.ndarray,
+        to_idx: np.ndarray,
+        distances: np.ndarray,
+        walk_times: np.ndarray,
+    ):
+        """from_idx must be sorted; all index arrays refer to positions in stop_ids"""
+        self.stop_ids = list(stop_ids)
+        self.stop_index = {stop_id: i for i, stop_id in enumerate(self.stop_ids)}
+        counts = np.bincount(from_idx, minlength=len(self.stop_ids))
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.neighbours = np.asarray(to_idx, dtype=np.int32)
+        self.distances = np.asarray(distances, dtype=np.float32)
+        self.walk_times = np.asarray(walk_times, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.neighbours)
+
+    def transfers_from(self, stop_id: str) -> typing.List[typing.Tuple[str, int]]:
+        """Return (to_stop_id, walk_time) pairs for stop_id, nearest first"""
+        try:
+            i = self.stop_index[stop_id]
+        except KeyError:
+            return []
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        return [
+            (self.stop_ids[neighbour], int(walk_time))
+            for neighbour, walk_time in zip(
+                self.neighbours[start:stop], self.walk_times[start:stop]
+            )
+        ]
+
+
+class TransferBuilder:
+    """Compute walking transfers between nearby stops and store them in the walking_transfer table"""
+
+    def __init__(
+        self,
+        db: SQLAlchemy,
+        max_distance: typing.Optional[float] = None,
+        walking_speed: typing.Optional[float] = None,
+    ):
+        self.db = db
+        config = g.config["transfers"]
+        self.max_distance = (
+            config["max_distance"] if max_distance is None else max_distance
+        )
+        self.walking_speed = (
+            config["walking_speed"] if walking_speed is None else walking_speed
+        )
+
+    def build(self) -> TransferGraph:
+        print(f"Building walking transfers within {self.max_distance}m")
+        stop_ids, lons, lats = self.get_stop_coordinates()
+        from_idx, to_idx, distances = find_neighbours(lons, lats, self.max_distance)
+        walk_times = self.walk_times(distances)
+        graph = TransferGraph(stop_ids, from_idx, to_idx, distances, walk_times)
+        self.save_graph(graph)
+        print(f"Built {len(graph)} walking transfers for {len(stop_ids)} stops")
+        return graph
+
+    def get_stop_coordinates(
+        self,
+    ) -> typing.Tuple[typing.List[str], np.ndarray, np.ndarray]:
+        """Fetch the coordinates of all stops that have them in a single query"""
+        Stop = mbta_models.Stop
+        rows = (
+            self.db.session.query(
+                Stop.stop_id, func.ST_X(Stop.stop_lonlat), func.ST_Y(Stop.stop_lonlat)
+            )
+            .filter(Stop.stop_lonlat.isnot(None))
+            .order_by(Stop.stop_id)
+            .all()
+        )
+        stop_ids = [row[0] for row in rows]
+        lons = np.array([row[1] for row in rows], dtype=np.float64)
+        lats = np.array([row[2] for row in rows], dtype=np.float64)
+        return stop_ids, lons, lats
+
+    def walk_times(self, distances: np.ndarray) -> np.ndarray:
+        """Walking time in whole seconds, rounded up"""
+        return np.ceil(distances / self.walking_speed).astype(np.int32)
+
+    def save_graph(self, graph: TransferGraph):
+        """Replace the contents of the walking_transfer table with graph"""
+        table = mbta_models.WalkingTransfer.__table__
+        self.db.session.execute(table.delete())
+        rows = []
+        for i, from_stop_id in enumerate(graph.stop_ids):
+            for j in range(graph.offsets[i], graph.offsets[i + 1]):
+                rows.append(
+                    {
+                        "from_stop_id": from_stop_id,
+                        "to_stop_id": graph.stop_ids[graph.neighbours[j]],
+                        "distance": float(graph.distances[j]),
+                        "walk_time": int(graph.walk_times[j]),
+                    }
+                )
+        if rows:
+            self.db.session.execute(table.insert(), rows)
+        self.db.session.commit()
+
+    def load_graph(self) -> TransferGraph:
+        """Rebuild the in-memory graph from the walking_transfer table"""
+        WalkingTransfer = mbta_models.WalkingTransfer
+        rows = self.db.session.query(
+            WalkingTransfer.from_stop_id,
+            WalkingTransfer.to_stop_id,
+            WalkingTransfer.distance,
+            WalkingTransfer.walk_time,
+        ).all()
+        stop_ids = sorted({row[0] for row in rows} | {row[1] for row in rows})
+        stop_index = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+        from_idx = np.array([stop_index[row[0]] for row in rows], dtype=np.int64)
+        to_idx = np.array([stop_index[row[1]] for row in rows], dtype=np.int64)
+        distances = np.array([row[2] for row in rows], dtype=np.float64)
+        walk_times = np.array([row[3] for row in rows], dtype=np.int32)
+        edge_order = np.lexsort((distances, from_idx))
+        return TransferGraph(
+            stop_ids,
+            from_idx[edge_order],
+            to_idx[edge_order],
+            distances[edge_order],
+            walk_times[edge_order],
+        )
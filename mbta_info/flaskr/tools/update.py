@@ -1,12 +1,54 @@
+import typing
+
+from flask import g
+
+from flaskr import models as mbta_models, partitions, queries
 from flaskr.database import db
+from flaskr.views import refresh_materialized_views
 from flaskr.tools.loader import Loader
+from flaskr.tools.pattern_stops import PatternStopBuilder
+from flaskr.tools.planner_stats import PlannerStatistics
 from flaskr.tools.retriever import Retriever
+from flaskr.tools.snapshot import SnapshotWriter
+from flaskr.tools.transfers import TransferBuilder
+
+
+def update_mbta_data() -> typing.Optional[str]:
+    """Pull the latest data of the app's feed and, if its version isn't the one loaded,
+    load it, make it current and retire the versions before it. Returns the version of
+    the feed loaded, if any"""
+    retriever = Retriever(feed_id=g.feed_id)
+    retriever.retrieve_data()
+    if retriever.errors:
+        return None
+    loader = Loader(db)  # Creates the feed's tables on its first load
+    feed_version = loader.get_feed_version()
+    if feed_version == loaded_feed_version() and not load_interrupted():
+        print(f"Feed {feed_version} is already loaded")
+        return None
+    loader.load_data()
+    partitions.retire_other_feeds(db, feed_version)
+    # Statistics of the loaded tables first, as the builders query them
+    statistics = PlannerStatistics(db)
+    statistics.update(loader.table_names, feed_version)
+    TransferBuilder(db).build()
+    PatternStopBuilder(db).build()
+    statistics.update(
+        [
+            mbta_models.WalkingTransfer.__tablename__,
+            mbta_models.PatternStop.__tablename__,
+        ]
+    )
+    refresh_materialized_views(db)
+    SnapshotWriter(db).export()
+    return feed_version
+
+
+def loaded_feed_version() -> typing.Optional[str]:
+    """The version of the app's feed loaded last, if any"""
+    return db.session.query(queries.current_feed_version()).scalar()
 
 
-def update_mbta_data():
-    """Pull the latest data from MBTA and update the database"""
-    if not all(table.exists(db.get_engine()) for table in db.metadata.tables.values()):
-        retriever = Retriever()
-        retriever.retrieve_data()
-        loader = Loader(db)
-        loader.load_data()
+def load_interrupted() -> bool:
+    """Whether a load of the app's feed stopped partway, leaving a checkpoint to resume from"""
+    return db.session.query(mbta_models.LoadCheckpoint).count() > 0
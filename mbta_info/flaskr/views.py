@@ -0,0 +1,69 @@
+"""
+Materialized views over the loaded feed.
+
+route_stop holds each distinct (route_id, stop_id) pair served by a trip of
+the current feed, with a unique index in each direction so that both "stops of
+a route" and "routes at a stop" are answered by an index-only scan instead of
+a join across stop_time. The views live in their own MetaData so create_all
+doesn't make tables of them; DDL events on the models' metadata create them
+after the tables and drop them before.
+"""
+import typing
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, Column, MetaData, String, Table, event
+
+from flaskr.database import db
+
+view_metadata = MetaData()
+
+route_stop = Table(
+    "route_stop",
+    view_metadata,
+    Column("route_id", String(64), primary_key=True),
+    Column("stop_id", String(64), primary_key=True),
+)
+
+MATERIALIZED_VIEWS = (route_stop,)  # type: typing.Tuple[Table, ...]
+
+# Created WITH DATA (empty on a fresh schema) so the first refresh may already be concurrent
+CREATE_ROUTE_STOP = """
+CREATE MATERIALIZED VIEW IF NOT EXISTS route_stop AS
+SELECT DISTINCT trip.route_id, stop_time.stop_id
+FROM stop_time JOIN trip ON stop_time.trip_id = trip.trip_id
+WHERE stop_time.feed_version = (
+    SELECT feed_version FROM feed_info ORDER BY created DESC NULLS LAST LIMIT 1
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_route_stop_route_id_stop_id
+ON route_stop (route_id, stop_id);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_route_stop_stop_id_route_id
+ON route_stop (stop_id, route_id);
+"""
+
+event.listen(
+    db.metadata,
+    "after_create",
+    DDL(CREATE_ROUTE_STOP).execute_if(dialect="postgresql"),
+)
+event.listen(
+    db.metadata,
+    "before_drop",
+    DDL("DROP MATERIALIZED VIEW IF EXISTS route_stop").execute_if(dialect="postgresql"),
+)
+
+
+def refresh_materialized_views(db: SQLAlchemy):
+    """
+    Refresh every materialized view without blocking readers, then vacuum it
+    so its visibility map is current and lookups can stay index-only.
+    """
+    engine = db.get_engine()
+    for view in MATERIALIZED_VIEWS:
+        print(f"Refreshing materialized view {view.name}")
+        with engine.begin() as connection:
+            connection.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view.name}")
+        # VACUUM can't run inside a transaction block
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(
+                f"VACUUM ANALYZE {view.name}"
+            )
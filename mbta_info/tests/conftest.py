@@ -3,7 +3,7 @@ import datetime
 import pytest
 
 from flaskr.database import db as project_db
-from flaskr import create_app, set_g, models as mbta_models
+from flaskr import create_app, set_g, model_utils, models as mbta_models
 from tests import models as test_models
 
 
@@ -28,6 +28,7 @@ def app(set_test_env):
     app = create_app()
     with app.app_context():
         set_g()
+        model_utils.entity_cache.clear()  # Entities of earlier tests' databases
         project_db.drop_all()  # Make sure nothing was left around from an aborted test
         project_db.create_all()
         yield app
@@ -127,6 +128,16 @@ def trip(
     return trip_obj
 
 
+@pytest.fixture
+def feed_info(db) -> mbta_models.FeedInfo:
+    feed_info_obj = mbta_models.FeedInfo(
+        "feed1", "MBTA", "http://www.mbta.com", mbta_models.LangCode.en
+    )
+    db.session.add(feed_info_obj)
+    db.session.commit()
+    return feed_info_obj
+
+
 @pytest.fixture
 def checkpoint(db):
     checkpoint_obj = mbta_models.Checkpoint("checkpoint1", "Checkpoint Name")
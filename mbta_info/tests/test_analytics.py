@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from flaskr import analytics, models as mbta_models
+
+
+def test_grouped_percentiles_match_numpy():
+    # GIVEN
+    rng = np.random.RandomState(0)
+    group_codes = rng.randint(0, 5, 200)
+    values = rng.randint(0, 1000, 200)
+    percentiles = (0, 10, 50, 90, 100)
+
+    # WHEN
+    result = analytics.grouped_percentiles(group_codes, values, 6, percentiles)
+
+    # THEN
+    for group in range(5):
+        assert result[group] == pytest.approx(
+            np.percentile(values[group_codes == group], percentiles)
+        )
+    assert np.isnan(result[5]).all()  # No values in the last group
+
+
+def test_frequency_stats():
+    # GIVEN: departures given out of order, two groups and one group without any
+    group_codes = np.array([0, 1, 0, 0, 1])
+    times = np.array([3600 + 1200, 7200, 3600, 3600 + 600, 7200 + 3600])
+
+    # WHEN
+    stats = analytics.frequency_stats(["a", "b", "c"], group_codes, times, (50,))
+
+    # THEN
+    assert stats.summary("a") == {
+        "trip_count": 3,
+        "first_departure": 3600,
+        "last_departure": 4800,
+        "headway_percentiles": {50: 600.0},
+        "trips_per_hour": [0, 3, 0, 0],
+    }
+    assert stats.summary("b")["headway_percentiles"] == {50: 3600.0}
+    assert stats.summary("b")["trips_per_hour"] == [0, 0, 1, 1]
+    assert stats.summary("c") == {
+        "trip_count": 0,
+        "first_departure": None,
+        "last_departure": None,
+        "headway_percentiles": {50: None},
+        "trips_per_hour": [0, 0, 0, 0],
+    }
+
+
+def test_route_frequencies_use_trip_starts():
+    """A route's headways are measured between the first departures of its trips"""
+    # GIVEN: two trips of one route direction and a single trip of another
+    departures = analytics.DepartureColumns(
+        ["trip1", "trip2", "trip3"],
+        np.array([0, 0, 1]),
+        [("route1", 0), ("route1", 1)],
+        ["stop1", "stop2"],
+        np.array([0, 0, 1, 1, 2]),
+        np.array([0, 1, 0, 1, 1]),
+        np.array([600, 900, 1500, 1800, 100]),
+    )
+
+    # WHEN
+    route_stats = departures.route_frequencies((50,))
+    stop_stats = departures.stop_frequencies((50,))
+
+    # THEN
+    assert route_stats.summary(("route1", 0))["headway_percentiles"] == {50: 900.0}
+    assert route_stats.summary(("route1", 1))["trip_count"] == 1
+    assert stop_stats.summary("stop2")["trip_count"] == 3
+    assert stop_stats.summary("stop2")["first_departure"] == 100
+
+
+def test_fetch(
+    db, feed_info, calendar: mbta_models.Calendar, trip: mbta_models.Trip, stop
+):
+    # GIVEN: stop times of the current feed and of an older one
+    calendar.saturday = calendar.sunday = True
+    db.session.add(
+        mbta_models.StopTime(
+            trip.trip_id, 3600, 3660, stop.stop_id, 1, feed_version="feed1"
+        )
+    )
+    db.session.add(
+        mbta_models.StopTime(trip.trip_id, 0, 0, stop.stop_id, 1, feed_version="feed0")
+    )
+    db.session.commit()
+
+    # WHEN
+    departures = analytics.DepartureColumns.fetch(calendar.start_date)
+
+    # THEN
+    assert departures.trip_ids == [trip.trip_id]
+    assert departures.route_keys == [(trip.route_id, None)]
+    assert departures.stop_ids == [stop.stop_id]
+    assert departures.departure_times.tolist() == [3660]
@@ -0,0 +1,334 @@
+from unittest import mock
+
+import pytest
+
+from flaskr import queries, views, models as mbta_models
+from flaskr.realtime.alerts import AlertStore
+from flaskr.realtime.trip_updates import TripUpdateStore
+from flaskr.realtime.vehicles import VehiclePosition, VehicleStore
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def stop_time(
+    db, feed_info: mbta_models.FeedInfo, trip: mbta_models.Trip, stop: mbta_models.Stop
+):
+    stop_time_obj = mbta_models.StopTime(
+        trip.trip_id, 7200, 7260, stop.stop_id, 1, feed_version=feed_info.feed_version
+    )
+    db.session.add(stop_time_obj)
+    db.session.commit()
+    return stop_time_obj
+
+
+def test_get_stop(client, stop: mbta_models.Stop):
+    # WHEN
+    response = client.get(f"/api/stops/{stop.stop_id}")
+
+    # THEN
+    assert response.status_code == 200
+    assert response.headers["ETag"]
+    assert response.get_json()["stop_id"] == stop.stop_id
+    assert response.get_json()["longitude"] is None
+
+
+def test_get_missing_stop(client, db):
+    assert client.get("/api/stops/missing").status_code == 404
+
+
+def test_get_routes(client, route: mbta_models.Route):
+    # WHEN
+    response = client.get("/api/routes", query_string={"route_type": "0"})
+
+    # THEN
+    assert response.status_code == 200
+    assert [r["route_id"] for r in response.get_json()] == [route.route_id]
+    assert response.get_json()[0]["route_type"] == route.route_type.value
+
+
+def test_get_trip(client, stop_time: mbta_models.StopTime):
+    # WHEN
+    response = client.get(f"/api/trips/{stop_time.trip_id}")
+
+    # THEN
+    assert response.status_code == 200
+    assert [st["stop_id"] for st in response.get_json()["stop_times"]] == [
+        stop_time.stop_id
+    ]
+
+
+def test_get_route_stops(
+    db, client, stop: mbta_models.Stop, route_pattern: mbta_models.RoutePattern
+):
+    # GIVEN
+    db.session.add(
+        mbta_models.PatternStop(
+            route_pattern.route_pattern_id,
+            route_pattern.route_id,
+            1,
+            stop.stop_id,
+            0,
+            0,
+            1,
+        )
+    )
+    db.session.commit()
+
+    # WHEN
+    response = client.get(f"/api/routes/{route_pattern.route_id}/stops")
+
+    # THEN
+    assert response.status_code == 200
+    assert [
+        pattern_stop["stop_id"]
+        for pattern_stop in response.get_json()[route_pattern.route_pattern_id]
+    ] == [stop.stop_id]
+    assert client.get("/api/routes/missing/stops").status_code == 404
+
+
+def test_get_stop_routes(db, client, stop_time: mbta_models.StopTime):
+    # GIVEN
+    views.refresh_materialized_views(db)
+
+    # WHEN
+    response = client.get(f"/api/stops/{stop_time.stop_id}/routes")
+
+    # THEN
+    assert response.status_code == 200
+    assert response.get_json() == ["route1"]
+    assert client.get("/api/stops/missing/routes").status_code == 404
+
+
+def test_get_departures(
+    client, db, stop_time: mbta_models.StopTime, calendar: mbta_models.Calendar
+):
+    # GIVEN: service running every day of the calendar's date range
+    calendar.saturday = calendar.sunday = True
+    db.session.commit()
+    service_date = calendar.start_date
+    url = f"/api/stops/{stop_time.stop_id}/departures"
+
+    # WHEN
+    departures = client.get(
+        url, query_string={"date": service_date.strftime("%Y%m%d")}
+    ).get_json()
+    later_departures = client.get(
+        url,
+        query_string={"date": service_date.strftime("%Y%m%d"), "after": "02:01:01"},
+    ).get_json()
+
+    # THEN
+    assert [d["trip_id"] for d in departures["data"]] == [stop_time.trip_id]
+    assert departures["data"][0]["route_id"] == "route1"
+    assert departures["next_cursor"] is None
+    assert later_departures == {"data": [], "next_cursor": None}
+
+
+@pytest.mark.parametrize(
+    "query_string",
+    [
+        {},
+        {"date": "2020-01-01"},
+        {"date": "20200101", "after": "NAN"},
+        {"date": "20200101", "limit": "0"},
+        {"date": "20200101", "cursor": "not a cursor"},
+    ],
+)
+def test_get_departures_bad_params(client, stop: mbta_models.Stop, query_string):
+    response = client.get(
+        f"/api/stops/{stop.stop_id}/departures", query_string=query_string
+    )
+
+    assert response.status_code == 400
+
+
+def test_if_none_match(client, stop: mbta_models.Stop):
+    """A request repeating a current ETag gets an empty 304 response"""
+    # GIVEN
+    etag = client.get(f"/api/stops/{stop.stop_id}").headers["ETag"]
+
+    # WHEN
+    response = client.get(f"/api/stops/{stop.stop_id}", headers={"If-None-Match": etag})
+
+    # THEN
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.data
+
+
+def test_repeat_reads_cached(client, stop: mbta_models.Stop, monkeypatch):
+    """Repeat reads are served from the response cache without querying"""
+    # GIVEN
+    monkeypatch.setattr(queries, "get_stop", mock.Mock(wraps=queries.get_stop))
+
+    # WHEN
+    first = client.get(f"/api/stops/{stop.stop_id}")
+    second = client.get(f"/api/stops/{stop.stop_id}")
+
+    # THEN
+    queries.get_stop.assert_called_once()
+    assert first.data == second.data
+    assert first.headers["ETag"] == second.headers["ETag"]
+
+
+def test_new_feed_version_changes_etag(app, client, stop: mbta_models.Stop, db):
+    # GIVEN
+    first = client.get(f"/api/stops/{stop.stop_id}")
+
+    # WHEN: a new feed is loaded
+    db.session.add(
+        mbta_models.FeedInfo(
+            "new_version", "MBTA", "http://www.mbta.com", mbta_models.LangCode.en
+        )
+    )
+    db.session.commit()
+    app.extensions["api_feed_version"].expire()
+    second = client.get(
+        f"/api/stops/{stop.stop_id}", headers={"If-None-Match": first.headers["ETag"]}
+    )
+
+    # THEN
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+
+
+def test_get_shape_pages(client, db, feed_info: mbta_models.FeedInfo):
+    """Following next_cursor walks through every point of a shape exactly once"""
+    # GIVEN
+    for sequence in range(5):
+        db.session.add(
+            mbta_models.Shape(
+                "shape1",
+                -71.0,
+                42.0 + sequence,
+                sequence,
+                feed_version=feed_info.feed_version,
+            )
+        )
+    db.session.commit()
+
+    # WHEN
+    sequences = []
+    query_string = {"limit": "2"}
+    while True:
+        page = client.get("/api/shapes/shape1", query_string=query_string).get_json()
+        sequences.extend(point["shape_pt_sequence"] for point in page["data"])
+        if not page["next_cursor"]:
+            break
+        query_string["cursor"] = page["next_cursor"]
+
+    # THEN
+    assert sequences == [0, 1, 2, 3, 4]
+
+
+def test_get_connection_pool(client, stop: mbta_models.Stop):
+    # GIVEN: the stop fixture has checked out a connection
+    # WHEN
+    response = client.get("/api/status/pool")
+
+    # THEN
+    assert response.status_code == 200
+    status = response.get_json()
+    assert status["pool"] == "MeteredQueuePool"
+    assert status["checkouts"] >= 1
+    assert status["timeouts"] == 0
+
+
+def test_get_departures_realtime(
+    app, client, db, stop_time: mbta_models.StopTime, calendar: mbta_models.Calendar
+):
+    # GIVEN: trip updates polled by this process, delaying the trip from its first stop
+    calendar.saturday = calendar.sunday = True
+    db.session.commit()
+    url = f"/api/stops/{stop_time.stop_id}/departures"
+    params = {"date": calendar.start_date.strftime("%Y%m%d")}
+    without_store = client.get(url, query_string=params)
+    store = TripUpdateStore()
+    app.extensions["trip_updates"] = store
+    static = client.get(url, query_string=params)  # Polled, but no updates held yet
+
+    # WHEN
+    store.apply_entity(
+        {
+            "id": "1",
+            "trip_update": {
+                "trip": {"trip_id": stop_time.trip_id},
+                "stop_time_update": [{"stop_sequence": 0, "departure": {"delay": 90}}],
+            },
+        }
+    )
+    store.finish_feed({"timestamp": 100}, {stop_time.trip_id})
+    realtime = client.get(url, query_string=params)
+
+    # THEN: static times are unchanged and the prediction comes from a new ETag
+    assert "realtime" not in without_store.get_json()["data"][0]
+    assert static.get_json()["data"][0]["realtime"] is None
+    assert static.headers["ETag"] != without_store.headers["ETag"]
+    departure = realtime.get_json()["data"][0]
+    assert departure["departure_time"] == 7260
+    assert departure["realtime"] == {
+        "status": "scheduled",
+        "departure_time": 7350,
+        "delay": 90,
+    }
+    assert realtime.headers["ETag"] != static.headers["ETag"]
+
+
+def test_get_alerts(app, client):
+    # GIVEN
+    assert client.get("/api/stops/stop1/alerts").status_code == 404
+    store = AlertStore()
+    app.extensions["service_alerts"] = store
+    assert client.get("/api/stops/stop1/alerts").get_json() == []  # Before any alert
+    store.apply_entity(
+        {"id": "alert1", "alert": {"informed_entity": [{"stop_id": "stop1"}]}}
+    )
+
+    # WHEN
+    stop_alerts = client.get("/api/stops/stop1/alerts").get_json()
+    route_alerts = client.get("/api/routes/route1/alerts").get_json()
+
+    # THEN
+    assert [alert["alert_id"] for alert in stop_alerts] == ["alert1"]
+    assert route_alerts == []
+
+
+def test_get_vehicles(app, client):
+    # GIVEN
+    assert client.get("/api/vehicles").status_code == 404
+    store = VehicleStore()
+    app.extensions["vehicle_positions"] = store
+    assert client.get("/api/vehicles").get_json() == []  # Before the first poll
+    assert (
+        client.get(
+            "/api/vehicles", query_string={"latitude": "42.36", "longitude": "-71.06"}
+        ).get_json()
+        == []
+    )
+    store.update(VehiclePosition("v2", 42.3601, -71.0589, 100, trip_id="trip2"))
+    store.update(VehiclePosition("v1", 42.3520, -71.0552, 100, trip_id="trip1"))
+
+    # WHEN
+    all_vehicles = client.get("/api/vehicles").get_json()
+    near = client.get(
+        "/api/vehicles", query_string={"latitude": "42.3600", "longitude": "-71.0590"}
+    ).get_json()
+    vehicle = client.get("/api/vehicles/v1").get_json()
+
+    # THEN
+    assert [vehicle["vehicle_id"] for vehicle in all_vehicles] == ["v1", "v2"]
+    assert [vehicle["vehicle_id"] for vehicle in near] == ["v2"]  # v1 is ~900 m away
+    assert near[0]["distance"] == pytest.approx(14, abs=2)
+    assert vehicle["trip_id"] == "trip1"
+    assert vehicle["current_status"] == "IN_TRANSIT_TO"
+    assert client.get("/api/vehicles/missing").status_code == 404
+    for bad_params in (
+        {"latitude": "42.36"},
+        {"latitude": "north", "longitude": "-71.06"},
+        {"latitude": "42.36", "longitude": "-71.06", "radius": "0"},
+    ):
+        assert client.get("/api/vehicles", query_string=bad_params).status_code == 400
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from sqlalchemy import inspect, select
+
+from config import Config
+from flaskr import api, async_api, models as mbta_models
+
+
+def test_compile_query():
+    # GIVEN
+    Trip = mbta_models.Trip
+    query = (
+        select([Trip.trip_id])
+        .where(Trip.route_id == "route1")
+        .where(Trip.service_id.in_(["service1", "service2"]))
+        .limit(5)
+    )
+
+    # WHEN
+    sql, params = async_api.compile_query(query)
+
+    # THEN
+    assert "trip.route_id = $1" in sql
+    assert "trip.service_id IN ($2, $3)" in sql
+    assert "LIMIT $4" in sql
+    assert params == ["route1", "service1", "service2", 5]
+
+
+def test_serialize_record_matches_api():
+    """Rows read by the async service serialize like the Flask API's instances"""
+    # GIVEN: a stop time and the row asyncpg returns for it, with enum names
+    stop_time = mbta_models.StopTime(
+        "trip1",
+        7200,
+        7260,
+        "stop1",
+        1,
+        pickup_type=mbta_models.PickupDropOffType.type_1,
+        feed_version="feed1",
+    )
+    record = {
+        prop.key: getattr(stop_time, prop.key)
+        for prop in inspect(mbta_models.StopTime).column_attrs
+    }
+    record["pickup_type"] = "type_1"
+
+    # WHEN
+    data = async_api.serialize_record(mbta_models.StopTime, record)
+
+    # THEN
+    assert data == api.serialize(stop_time)
+    assert data["pickup_type"] == "none_available"
+
+
+def test_pool_options_pgbouncer():
+    # GIVEN / WHEN
+    options = async_api.pool_options(
+        {"async_pool": {"min_size": 1, "max_size": 4}, "pgbouncer": True}
+    )
+
+    # THEN: prepared statements don't survive PgBouncer's transaction pooling
+    assert options["min_size"] == 1
+    assert options["max_size"] == 4
+    assert options["statement_cache_size"] == 0
+
+
+def test_pool_options_feed():
+    # GIVEN / WHEN
+    default_options = async_api.pool_options({})
+    feed_options = async_api.pool_options({}, feed_id="mwrta")
+
+    # THEN
+    assert "server_settings" not in default_options
+    assert feed_options["server_settings"] == {"search_path": "feed_mwrta,public"}
+    with pytest.raises(ValueError):
+        async_api.pool_options({"pgbouncer": True}, feed_id="mwrta")
+
+
+def test_departures_match_flask_api(
+    app, db, feed_info, calendar: mbta_models.Calendar, trip: mbta_models.Trip, stop
+):
+    # GIVEN: service running every day of the calendar's date range
+    calendar.saturday = calendar.sunday = True
+    for sequence, departure_time in enumerate((7200, 7800, 8400)):
+        db.session.add(
+            mbta_models.StopTime(
+                trip.trip_id,
+                departure_time,
+                departure_time,
+                stop.stop_id,
+                sequence,
+                feed_version=feed_info.feed_version,
+            )
+        )
+    db.session.commit()
+    path = f"/api/stops/{stop.stop_id}/departures"
+    params = {"date": calendar.start_date.strftime("%Y%m%d"), "limit": "2"}
+    flask_pages = [app.test_client().get(path, query_string=params).get_json()]
+    flask_pages.append(
+        app.test_client()
+        .get(path, query_string=dict(params, cursor=flask_pages[0]["next_cursor"]))
+        .get_json()
+    )
+
+    async def get_pages():
+        client = TestClient(TestServer(async_api.create_async_app(Config().config)))
+        await client.start_server()
+        try:
+            first = await (await client.get(path, params=params)).json()
+            second_params = dict(params, cursor=first["next_cursor"])
+            second = await (await client.get(path, params=second_params)).json()
+            missing = await client.get("/api/stops/missing/departures", params=params)
+            return [first, second], missing.status
+        finally:
+            await client.close()
+
+    # WHEN
+    async_pages, missing_status = asyncio.run(get_pages())
+
+    # THEN
+    assert async_pages == flask_pages
+    assert [len(page["data"]) for page in async_pages] == [2, 1]
+    assert missing_status == 404
@@ -0,0 +1,43 @@
+from benchmarks import ingest
+
+
+def test_regressions():
+    # GIVEN: stop_time got slower and hungrier, shape faster, route within the threshold
+    baseline = {
+        "tables": {
+            "stop_time": {
+                "rows": 1000,
+                "load_seconds": 10.0,
+                "rows_per_second": 100.0,
+                "peak_memory_bytes": 1000,
+                "foreign_key_us_per_call": {"trip_id": 10.0, "stop_id": 10.0},
+            },
+            "shape": {"load_seconds": 10.0, "rows_per_second": 100.0},
+            "route": {"load_seconds": 1.0, "schema_load_us_per_row": 50.0},
+        }
+    }
+    results = {
+        "tables": {
+            "stop_time": {
+                "rows": 2000,
+                "load_seconds": 12.0,
+                "rows_per_second": 80.0,
+                "peak_memory_bytes": 1500,
+                "foreign_key_us_per_call": {"trip_id": 11.0, "stop_id": 20.0},
+            },
+            "shape": {"load_seconds": 5.0, "rows_per_second": 200.0},
+            "route": {"load_seconds": 1.1, "schema_load_us_per_row": 55.0},
+            "agency": {"load_seconds": 1.0},
+        }
+    }
+
+    # WHEN
+    found = ingest.regressions(baseline, results, threshold=0.15)
+
+    # THEN: row counts and tables missing from the baseline aren't compared
+    assert found == [
+        "stop_time.load_seconds: 10.0 -> 12.0 (+20.0%)",
+        "stop_time.rows_per_second: 100.0 -> 80.0 (-20.0%)",
+        "stop_time.peak_memory_bytes: 1000 -> 1500 (+50.0%)",
+        "stop_time.foreign_key_us_per_call.stop_id: 10.0 -> 20.0 (+100.0%)",
+    ]
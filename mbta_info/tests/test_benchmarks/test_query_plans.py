@@ -0,0 +1,69 @@
+from benchmarks import query_plans
+from flaskr import models as mbta_models
+from flaskr.views import refresh_materialized_views
+
+
+def test_seq_scans():
+    # GIVEN: a nested loop reading stop_time by index and calendar sequentially
+    plan = {
+        "Plan": {
+            "Node Type": "Nested Loop",
+            "Plans": [
+                {"Node Type": "Index Scan", "Relation Name": "stop_time"},
+                {
+                    "Node Type": "Hash",
+                    "Plans": [{"Node Type": "Seq Scan", "Relation Name": "calendar"}],
+                },
+                {"Node Type": "Seq Scan", "Relation Name": "trip"},
+                {"Node Type": "Seq Scan", "Relation Name": "stop_time_default"},
+            ],
+        }
+    }
+
+    # WHEN
+    scanned = query_plans.seq_scans(plan, {"stop_time", "trip"})
+
+    # THEN
+    assert sorted(scanned) == ["stop_time_default", "trip"]
+
+
+def test_canonical_cases_use_indexes(
+    db, feed_info, calendar: mbta_models.Calendar, trip: mbta_models.Trip, stop
+):
+    """With sequential scans disabled, only a missing index can force one on a hot table"""
+    # GIVEN
+    calendar.saturday = calendar.sunday = True
+    trip.shape_id = "shape1"
+    db.session.add(mbta_models.Shape("shape1", -71.0, 42.0, 1, feed_version="feed1"))
+    for stop_sequence in range(1, 4):
+        db.session.add(
+            mbta_models.StopTime(
+                trip.trip_id,
+                stop_sequence * 60,
+                stop_sequence * 60,
+                stop.stop_id,
+                stop_sequence,
+                feed_version=feed_info.feed_version,
+            )
+        )
+    db.session.commit()
+    refresh_materialized_views(db)
+    db.session.execute("SET enable_seqscan = off")
+
+    # WHEN
+    results = [
+        query_plans.run_case(db.session, case)
+        for case in query_plans.canonical_cases(db.session, calendar.start_date)
+    ]
+
+    # THEN
+    assert {result.case.name for result in results} >= {
+        "departures",
+        "trip stop times",
+        "route trips",
+        "stop routes",
+        "shape points",
+    }
+    assert [
+        (result.case.name, result.seq_scans) for result in results if result.seq_scans
+    ] == []
@@ -0,0 +1,119 @@
+from unittest import mock
+
+import pytest
+
+from flaskr import cache
+
+
+def test_lru_cache_get_put():
+    # GIVEN
+    lru_cache = cache.LRUCache(2)
+    lru_cache.put("a", 1)
+
+    # THEN
+    assert lru_cache.get("a") == 1
+    assert lru_cache.get("b") is None
+    assert lru_cache.get("b", "default") == "default"
+    assert (lru_cache.hits, lru_cache.misses) == (1, 2)
+
+
+def test_lru_cache_evicts_least_recently_used():
+    # GIVEN
+    lru_cache = cache.LRUCache(2)
+    lru_cache.put("a", 1)
+    lru_cache.put("b", 2)
+
+    # WHEN: "a" is used again before "c" pushes the cache over its size
+    lru_cache.get("a")
+    lru_cache.put("c", 3)
+
+    # THEN
+    assert len(lru_cache) == 2
+    assert "a" in lru_cache
+    assert "b" not in lru_cache
+    assert "c" in lru_cache
+
+
+def test_lru_cache_clear():
+    # GIVEN
+    lru_cache = cache.LRUCache(2)
+    lru_cache.put("a", 1)
+
+    # WHEN
+    lru_cache.clear()
+
+    # THEN
+    assert len(lru_cache) == 0
+
+
+def test_lru_cache_bad_size():
+    with pytest.raises(ValueError):
+        cache.LRUCache(0)
+
+
+def test_feed_version_tracker_rechecks_after_interval(monkeypatch):
+    """The version is only re-read once check_interval seconds have passed"""
+    # GIVEN
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    tracker = cache.FeedVersionTracker(check_interval=30)
+    monkeypatch.setattr(
+        tracker, "fetch_version", mock.Mock(side_effect=["version1", "version2"])
+    )
+
+    # THEN
+    assert tracker.current() == "version1"
+    now[0] += 29
+    assert tracker.current() == "version1"
+    now[0] += 1
+    assert tracker.current() == "version2"
+    assert tracker.fetch_version.call_count == 2
+
+
+def test_feed_version_tracker_expire(monkeypatch):
+    # GIVEN
+    tracker = cache.FeedVersionTracker(check_interval=3600)
+    monkeypatch.setattr(
+        tracker, "fetch_version", mock.Mock(side_effect=["version1", "version2"])
+    )
+    tracker.current()
+
+    # WHEN
+    tracker.expire()
+
+    # THEN
+    assert tracker.current() == "version2"
+
+
+def test_feed_version_tracker_fetch_version(db):
+    """The most recently loaded feed is the current one"""
+    from flaskr import models as mbta_models
+
+    # GIVEN
+    assert cache.FeedVersionTracker.fetch_version() is None
+    for version in ("old", "new"):
+        db.session.add(
+            mbta_models.FeedInfo(
+                version, "MBTA", "http://www.mbta.com", mbta_models.LangCode.en
+            )
+        )
+        db.session.commit()
+
+    # THEN
+    assert cache.FeedVersionTracker.fetch_version() == "new"
+
+
+def test_lru_cache_resize():
+    # GIVEN
+    lru_cache = cache.LRUCache(3)
+    for key in "abc":
+        lru_cache.put(key, 1)
+
+    # WHEN
+    lru_cache.resize(1)
+
+    # THEN
+    assert "c" in lru_cache
+    assert len(lru_cache) == 1
+    with pytest.raises(ValueError):
+        lru_cache.resize(0)
@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, exc
+
+from flaskr import database
+
+DATABASE_CONFIG = {
+    "pool": {"pool_size": 5, "max_overflow": 10, "pool_recycle": 1800},
+    "celery_pool": {"pool_size": 1, "max_overflow": 2},
+}
+
+
+def test_engine_options():
+    # GIVEN / WHEN
+    web_options = database.engine_options(DATABASE_CONFIG)
+    worker_options = database.engine_options(DATABASE_CONFIG, celery_worker=True)
+
+    # THEN
+    assert web_options == {
+        "poolclass": database.MeteredQueuePool,
+        "pool_pre_ping": True,
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_recycle": 1800,
+    }
+    assert worker_options["pool_size"] == 1
+    assert worker_options["max_overflow"] == 2
+    assert worker_options["pool_recycle"] == 1800
+
+
+def test_engine_options_pgbouncer():
+    """PgBouncer does the pooling, so the engine connects on every checkout"""
+    # GIVEN
+    config = dict(DATABASE_CONFIG, pgbouncer=True)
+
+    # WHEN
+    options = database.engine_options(config)
+
+    # THEN
+    assert options == {"poolclass": database.MeteredNullPool}
+
+
+def test_pool_metrics():
+    # GIVEN: a pool of a single connection
+    engine = create_engine(
+        "sqlite://",
+        creator=lambda: sqlite3.connect(":memory:", check_same_thread=False),
+        poolclass=database.MeteredQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.01,
+    )
+
+    # WHEN: a second checkout waits for the first and times out
+    connection = engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    connection.close()
+    engine.connect().close()
+
+    # THEN
+    status = database.pool_status(engine)
+    assert status["pool"] == "MeteredQueuePool"
+    assert status["checkouts"] == 3
+    assert status["connects"] == 1
+    assert status["waits"] == 1
+    assert status["wait_seconds"] > 0
+    assert status["timeouts"] == 1
+    assert status["checked_out"] == 0
+    assert status["checked_in"] == 1
+
+    # WHEN: the engine replaces its pool
+    engine.dispose()
+
+    # THEN: the counts carry over
+    assert database.pool_status(engine)["checkouts"] == 3
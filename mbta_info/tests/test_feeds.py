@@ -0,0 +1,97 @@
+import pytest
+from sqlalchemy import inspect
+
+from flaskr import database, feeds, models as mbta_models
+
+CONFIG = {
+    "mbta_data": {
+        "path": "data",
+        "files_url": "https://cdn.mbta.com/MBTA_GTFS.zip",
+        "files": {"stop": "stops.txt"},
+        "feeds": {
+            "mwrta": {"files_url": "https://mwrta.example/gtfs.zip"},
+            "brta": {"path": "brta_data", "files": {"stop": "brta_stops.txt"}},
+        },
+    }
+}
+
+
+def test_schema_name():
+    assert feeds.schema_name(feeds.DEFAULT_FEED_ID) == "public"
+    assert feeds.schema_name("mwrta") == "feed_mwrta"
+    with pytest.raises(ValueError):
+        feeds.schema_name("mwrta; DROP SCHEMA public")
+
+
+def test_feed_ids():
+    assert feeds.feed_ids(CONFIG) == [feeds.DEFAULT_FEED_ID, "brta", "mwrta"]
+    assert feeds.feed_ids({"mbta_data": {"feeds": None}}) == [feeds.DEFAULT_FEED_ID]
+
+
+def test_feed_data_config():
+    # GIVEN / WHEN
+    default = feeds.feed_data_config(CONFIG, feeds.DEFAULT_FEED_ID)
+    mwrta = feeds.feed_data_config(CONFIG, "mwrta")
+    brta = feeds.feed_data_config(CONFIG, "brta")
+
+    # THEN
+    assert default == {
+        "path": "data",
+        "files_url": "https://cdn.mbta.com/MBTA_GTFS.zip",
+        "files": {"stop": "stops.txt"},
+    }
+    assert mwrta == {
+        "path": "data/mwrta",
+        "files_url": "https://mwrta.example/gtfs.zip",
+        "files": {"stop": "stops.txt"},
+    }
+    assert brta["path"] == "brta_data"
+    assert brta["files"] == {"stop": "brta_stops.txt"}
+    with pytest.raises(ValueError):
+        feeds.feed_data_config(CONFIG, "unknown")
+
+
+def test_engine_options_feed():
+    # GIVEN / WHEN
+    default_options = database.engine_options({}, feed_id=feeds.DEFAULT_FEED_ID)
+    feed_options = database.engine_options({}, feed_id="mwrta")
+
+    # THEN
+    assert "connect_args" not in default_options
+    assert feed_options["connect_args"] == {
+        "options": "-c search_path=feed_mwrta,public"
+    }
+    with pytest.raises(ValueError):
+        database.engine_options({"pgbouncer": True}, feed_id="mwrta")
+
+
+def test_feed_tables_are_separate(db):
+    """The same stop_id loads into two feeds without colliding"""
+    # GIVEN
+    feeds.create_tables(db, "other")
+    db.session.add(mbta_models.Stop("stop1", stop_name="Default feed stop"))
+    db.session.commit()
+
+    # WHEN
+    with feeds.feed_session(db, "other") as session:
+        session.add(mbta_models.Stop("stop1", stop_name="Other feed stop"))
+        session.flush()
+        names = feeds.across_feeds(
+            db,
+            [feeds.DEFAULT_FEED_ID],
+            lambda session: [
+                stop.stop_name for stop in session.query(mbta_models.Stop)
+            ],
+        )
+        other_names = [stop.stop_name for stop in session.query(mbta_models.Stop)]
+
+    # THEN
+    assert feeds.tables_exist(db, feeds.DEFAULT_FEED_ID)
+    assert feeds.tables_exist(db, "other")
+    assert names == {feeds.DEFAULT_FEED_ID: ["Default feed stop"]}
+    assert other_names == ["Other feed stop"]
+    assert "stop" in inspect(db.get_engine()).get_table_names("feed_other")
+    # Created by DDL naming no schema, which must not resolve to the public objects
+    for name in ("feed_other.route_stop", "feed_other.stop_time_default"):
+        assert db.session.execute("SELECT to_regclass(:name)", {"name": name}).scalar()
+    db.get_engine().execute("DROP SCHEMA feed_other CASCADE")
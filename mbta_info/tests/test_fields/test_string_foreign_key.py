@@ -1,6 +1,7 @@
 import marshmallow as mm
 import pytest
 
+from flaskr import model_utils
 from flaskr.fields import foreign_key as fk_fields
 from tests import models as test_models
 
@@ -67,3 +68,17 @@ def test_is_x_error_false(error_check_function_name: str):
     # THEN
     error_check_function = getattr(string_fk_field, error_check_function_name)
     assert error_check_function(other_validation_error) is False
+
+
+def test_deserialize_cached(test_model: test_models.TestModel):
+    # GIVEN
+    string_fk_field = fk_fields.StringForeignKey(test_models.TestModel)
+    hits = model_utils.entity_cache.hits
+    string_fk_field.deserialize(test_model.test_id)
+
+    # WHEN
+    value = string_fk_field.deserialize(test_model.test_id)
+
+    # THEN: the second lookup is answered by the entity cache
+    assert value == test_model.test_id
+    assert model_utils.entity_cache.hits == hits + 1
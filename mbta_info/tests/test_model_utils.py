@@ -0,0 +1,58 @@
+from sqlalchemy import inspect
+
+from flaskr import model_utils
+from tests import models as test_models
+
+
+def test_entity_cache_reads_through(db, test_model: test_models.TestModel):
+    # GIVEN
+    entity_cache = model_utils.EntityCache(2)
+
+    # WHEN
+    first = entity_cache.get_entity(test_models.TestModel, test_model.test_id)
+    second = entity_cache.get_entity(test_models.TestModel, test_model.test_id)
+    db.session.close()
+
+    # THEN
+    assert first is second
+    assert inspect(first).transient
+    assert (first.test_id, first.test_name, first.test_order) == (
+        "test1",
+        "Test Model",
+        23,
+    )
+    assert (entity_cache.hits, entity_cache.misses) == (1, 1)
+
+
+def test_entity_cache_missing_keys_not_cached(db, test_model: test_models.TestModel):
+    # GIVEN
+    entity_cache = model_utils.EntityCache(2)
+
+    # WHEN
+    missing = entity_cache.get_entity(test_models.TestModel, "test2")
+    db.session.add(
+        test_models.TestModel("test2", "Test Model 2", test_models.TestType.type_1)
+    )
+    db.session.commit()
+
+    # THEN
+    assert missing is None
+    assert entity_cache.get_entity(test_models.TestModel, "test2").test_id == "test2"
+    assert len(entity_cache) == 1
+
+
+def test_entity_cache_use_feed_version(db, test_model: test_models.TestModel):
+    # GIVEN
+    entity_cache = model_utils.EntityCache(2)
+    entity_cache.use_feed_version("version1")
+    entity_cache.get_entity(test_models.TestModel, test_model.test_id)
+
+    # WHEN
+    entity_cache.use_feed_version("version1")
+    same_version_size = len(entity_cache)
+    entity_cache.use_feed_version("version2")
+
+    # THEN
+    assert same_version_size == 1
+    assert len(entity_cache) == 0
+    assert entity_cache.stats() == {"size": 0, "max_size": 2, "hits": 0, "misses": 1}
@@ -0,0 +1,59 @@
+import datetime
+
+import pytest
+
+from flaskr import pagination, models as mbta_models
+
+
+@pytest.mark.parametrize(
+    "sort_columns, values",
+    [
+        (pagination.SORT_KEYS[mbta_models.Trip], ["trip1"]),
+        (pagination.SORT_KEYS[mbta_models.StopTime], ["trip/1", 12]),
+        (
+            pagination.SORT_KEYS[mbta_models.CalendarDate],
+            ["service1", datetime.date(2020, 4, 27)],
+        ),
+    ],
+)
+def test_cursor_round_trip(sort_columns, values):
+    cursor = pagination.encode_cursor(values)
+
+    assert isinstance(cursor, str)
+    assert pagination.decode_cursor(cursor, sort_columns) == values
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not base64!",
+        pagination.encode_cursor(["too", "many", "values"]),
+        "eyJub3QiOiAiYSBsaXN0In0=",  # {"not": "a list"}
+        pagination.encode_cursor(["service1", "not a date"]),
+    ],
+)
+def test_decode_cursor_invalid(cursor):
+    with pytest.raises(pagination.InvalidCursor):
+        pagination.decode_cursor(cursor, pagination.SORT_KEYS[mbta_models.CalendarDate])
+
+
+def test_model_page(db, trip: mbta_models.Trip, stop: mbta_models.Stop):
+    """Pages are ordered by the model's sort key and the last page has no cursor"""
+    # GIVEN
+    for sequence in (3, 1, 2):
+        db.session.add(
+            mbta_models.StopTime(
+                trip.trip_id, 0, 0, stop.stop_id, sequence, feed_version="feed1"
+            )
+        )
+    db.session.commit()
+    query = db.session.query(mbta_models.StopTime)
+
+    # WHEN
+    first = pagination.model_page(mbta_models.StopTime, query, None, 2)
+    second = pagination.model_page(mbta_models.StopTime, query, first.next_cursor, 2)
+
+    # THEN
+    assert [st.stop_sequence for st in first.items] == [1, 2]
+    assert [st.stop_sequence for st in second.items] == [3]
+    assert second.next_cursor is None
@@ -0,0 +1,94 @@
+from sqlalchemy import inspect
+
+from flaskr import partitions, schemas, models as mbta_models
+from flaskr.tools.loader import Loader
+
+
+def table_names(db):
+    return set(inspect(db.get_engine()).get_table_names())
+
+
+def test_partition_name():
+    table = mbta_models.StopTime.__table__
+    name = partitions.partition_name(table, "Spring 2020, version D")
+
+    assert name.startswith("stop_time_")
+    assert name == partitions.partition_name(table, "Spring 2020, version D")
+    assert name != partitions.partition_name(table, "Spring 2020, version E")
+    assert partitions.staging_name(table, "Spring 2020, version D") == name + "_staging"
+
+
+def test_partitioned_tables():
+    assert {table.name for table in partitions.partitioned_tables()} == {
+        "shape",
+        "stop_time",
+    }
+
+
+def test_attach_and_retire(db, feed_info, trip, stop):
+    """A loaded staging table becomes the feed's partition until the feed is retired"""
+    # GIVEN
+    table = mbta_models.StopTime.__table__
+    feed_version = feed_info.feed_version
+    staging_table = partitions.create_staging_table(db, table, feed_version)
+    db.session.execute(
+        staging_table.insert(),
+        [
+            {
+                "feed_version": feed_version,
+                "trip_id": trip.trip_id,
+                "arrival_time": 0,
+                "departure_time": 0,
+                "stop_id": stop.stop_id,
+                "stop_sequence": 1,
+            }
+        ],
+    )
+    db.session.commit()
+    assert db.session.query(mbta_models.StopTime).count() == 0  # Not attached yet
+
+    # WHEN
+    partitions.attach_staging_table(db, table, feed_version)
+
+    # THEN
+    partition = partitions.partition_name(table, feed_version)
+    assert partition in table_names(db)
+    assert staging_table.name not in table_names(db)
+    assert db.session.query(mbta_models.StopTime).count() == 1
+
+    # WHEN
+    db.session.close()
+    partitions.retire_other_feeds(db, "another_feed")
+
+    # THEN
+    assert partition not in table_names(db)
+    assert db.session.query(mbta_models.StopTime).count() == 0
+    assert db.session.query(mbta_models.FeedInfo).count() == 0
+
+
+def test_loader_stages_partitioned_rows(db, feed_info, trip, stop):
+    # GIVEN
+    loader = Loader(db)
+    loader.feed_version = feed_info.feed_version
+    loader.staging_table = partitions.create_staging_table(
+        db, mbta_models.StopTime.__table__, loader.feed_version
+    )
+    data_row = {
+        "trip_id": trip.trip_id,
+        "arrival_time": "01:00:00",
+        "departure_time": "01:01:00",
+        "stop_id": stop.stop_id,
+        "stop_sequence": "1",
+    }
+
+    # WHEN
+    staged = loader.stage_object(schemas.StopTimeSchema(), data_row)
+    loader.commit_batch()
+
+    # THEN
+    assert staged == 1
+    assert loader.staged_rows == []
+    rows = db.session.execute(
+        f"SELECT feed_version, departure_time FROM {loader.staging_table.name}"
+    ).fetchall()
+    assert [tuple(row) for row in rows] == [(feed_info.feed_version, 3660)]
@@ -0,0 +1,123 @@
+import pstats
+import tracemalloc
+
+import pytest
+
+from flaskr import profiling
+
+
+def allocate_and_hold(holder: list):
+    holder.append(bytearray(2 ** 20))
+
+
+@pytest.mark.parametrize(
+    "env_modes, expected_cpu, expected_memory",
+    [
+        (None, True, False),
+        ("memory", False, True),
+        ("cpu, memory", True, True),
+        ("all", True, True),
+        ("none", False, False),
+    ],
+)
+def test_from_config(env_modes, expected_cpu, expected_memory, monkeypatch, tmp_path):
+    # GIVEN: a config profiling cpu only
+    config = {"profiling": {"cpu": True, "path": "profiles", "top_allocations": 5}}
+    if env_modes is None:
+        monkeypatch.delenv(profiling.PROFILE_ENV, raising=False)
+    else:
+        monkeypatch.setenv(profiling.PROFILE_ENV, env_modes)
+    monkeypatch.setenv(profiling.PROFILE_DIR_ENV, str(tmp_path))
+
+    # WHEN
+    profiler = profiling.Profiler.from_config(config)
+
+    # THEN
+    assert (profiler.cpu, profiler.memory) == (expected_cpu, expected_memory)
+    assert profiler.path == tmp_path
+    assert profiler.top_allocations == 5
+
+
+def test_from_config_unknown_mode(monkeypatch):
+    # GIVEN
+    monkeypatch.setenv(profiling.PROFILE_ENV, "cpu,disk")
+
+    # THEN
+    with pytest.raises(ValueError, match="disk"):
+        profiling.Profiler.from_config({})
+
+
+def test_profile_disabled(tmp_path, capsys):
+    # GIVEN
+    profiler = profiling.Profiler(tmp_path)
+
+    # WHEN
+    with profiler.profile("stop_time", "feed1"):
+        pass
+
+    # THEN
+    assert not list(tmp_path.iterdir())
+    assert not capsys.readouterr().out
+
+
+def test_profile_writes_files_by_feed_version(tmp_path):
+    # GIVEN
+    profiler = profiling.Profiler(tmp_path, cpu=True, memory=True)
+    held = []
+
+    # WHEN: the feed version is only known once the section has run
+    with profiler.profile("run_update_mbta_data") as section:
+        allocate_and_hold(held)
+        section.feed_version = "Winter 2020, 01/10/20"
+
+    # THEN
+    directory = tmp_path / "Winter_2020_01_10_20"
+    stats = pstats.Stats(str(directory / "run_update_mbta_data.prof"))
+    assert any(function[2] == "allocate_and_hold" for function in stats.stats)
+    report = (directory / "run_update_mbta_data.memory.txt").read_text()
+    assert "Peak traced memory: 1.0 MiB" in report
+    assert "test_profiling.py:" in report.splitlines()[4]
+    assert not tracemalloc.is_tracing()
+
+
+def test_profile_nested_sections(tmp_path):
+    # GIVEN
+    profiler = profiling.Profiler(tmp_path, cpu=True, memory=True)
+    held = []
+
+    # WHEN: a table is loaded within a task
+    with profiler.profile("task"):
+        with profiler.profile("stop_time", "feed1"):
+            allocate_and_hold(held)
+        assert tracemalloc.is_tracing()
+
+    # THEN: the table's time is only in its own stats, while its memory counts for both
+    table_stats = pstats.Stats(str(tmp_path / "feed1" / "stop_time.prof"))
+    task_stats = pstats.Stats(str(tmp_path / "unversioned" / "task.prof"))
+    assert any(function[2] == "allocate_and_hold" for function in table_stats.stats)
+    assert not any(function[2] == "allocate_and_hold" for function in task_stats.stats)
+    task_report = (tmp_path / "unversioned" / "task.memory.txt").read_text()
+    assert "Peak traced memory: 1.0 MiB" in task_report
+    assert not tracemalloc.is_tracing()
+
+
+def test_profile_nested_sections_without_reset_peak(tmp_path, monkeypatch):
+    # GIVEN: Python before 3.9
+    monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)
+    profiler = profiling.Profiler(tmp_path, memory=True)
+    held = []
+
+    # WHEN
+    with profiler.profile("task"):
+        allocate_and_hold(held)
+        held.clear()
+        with profiler.profile("stop_time", "feed1"):
+            pass
+
+    # THEN: the table's peak is the task's so far, and reported as such
+    table_report = (tmp_path / "feed1" / "stop_time.memory.txt").read_text()
+    task_report = (tmp_path / "unversioned" / "task.memory.txt").read_text()
+    assert (
+        "Peak traced memory: 1.0 MiB (since an enclosing section began" in table_report
+    )
+    assert "Peak traced memory: 1.0 MiB\n" in task_report
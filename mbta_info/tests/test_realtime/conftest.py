@@ -0,0 +1,94 @@
+import email.utils
+import http.server
+import pathlib
+import threading
+import typing
+
+import pytest
+
+from flaskr.realtime import gtfs_rt
+
+FEED_PATH = "/realtime/feed.pb"
+
+
+class RecordedFeedHandler(http.server.BaseHTTPRequestHandler):
+    """Serve the server's recorded feed files one per request, the last one repeatedly,
+    answering If-Modified-Since like the MBTA's CDN"""
+
+    def do_GET(self):
+        server = self.server  # type: RecordedFeedServer
+        server.requests.append(self.path)
+        if self.path != FEED_PATH:
+            self.send_error(404)
+            return
+        feed_path, modified = server.next_feed()
+        last_modified = email.utils.formatdate(modified, usegmt=True)
+        if self.headers.get("If-Modified-Since") == last_modified:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = feed_path.read_bytes()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-protobuf")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RecordedFeedServer(http.server.ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), RecordedFeedHandler)
+        self.feeds = []  # type: typing.List[typing.Tuple[pathlib.Path, int]]
+        self.requests = []  # type: typing.List[str]
+        self._served = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}{FEED_PATH}"
+
+    def add_feed(self, path: pathlib.Path, modified: int):
+        self.feeds.append((path, modified))
+
+    def next_feed(self) -> typing.Tuple[pathlib.Path, int]:
+        feed = self.feeds[min(self._served, len(self.feeds) - 1)]
+        self._served += 1
+        return feed
+
+
+@pytest.fixture
+def feed_server():
+    """A local stand-in for a GTFS-realtime feed host, serving files added with add_feed"""
+    server = RecordedFeedServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def record_feed(tmp_path):
+    """Write a FeedMessage of header and entities to a file, as recorded from a feed"""
+
+    def record(name: str, timestamp: int, entities: typing.List[typing.Dict]):
+        path = pathlib.Path(tmp_path, name)
+        path.write_bytes(
+            gtfs_rt.encode_message(
+                {
+                    "header": {
+                        "gtfs_realtime_version": "2.0",
+                        "incrementality": 0,
+                        "timestamp": timestamp,
+                    },
+                    "entity": entities,
+                },
+                "FeedMessage",
+            )
+        )
+        return path
+
+    return record
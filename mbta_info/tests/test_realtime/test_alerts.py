@@ -0,0 +1,182 @@
+from flaskr.realtime.alerts import OPEN_ENDED, Alert, AlertStore
+from flaskr.realtime.gtfs_rt import Cause, Effect, SeverityLevel
+from flaskr.realtime.poller import FeedPoller
+
+
+def alert_entity(alert_id: str, informed_entity, active_period=(), **alert) -> dict:
+    return {
+        "id": alert_id,
+        "alert": dict(
+            alert,
+            informed_entity=list(informed_entity),
+            active_period=list(active_period),
+        ),
+    }
+
+
+def test_from_entity():
+    # GIVEN
+    entity = alert_entity(
+        "alert1",
+        [
+            {"agency_id": "1", "route_id": "Red", "route_type": 1},
+            {"agency_id": "1", "route_id": "Red", "stop_id": "place-sstat"},
+            {"agency_id": "1", "trip": {"trip_id": "trip1"}},
+            {"agency_id": "1", "route_type": 3},
+        ],
+        [{"start": 100, "end": 200}, {"start": 300}],
+        effect=3,
+        header_text={
+            "translation": [
+                {"text": "Retrasos", "language": "es"},
+                {"text": "Delays", "language": "en"},
+            ]
+        },
+    )
+
+    # WHEN
+    alert = Alert.from_entity(entity)
+
+    # THEN
+    assert alert.route_ids == {"Red"}
+    assert alert.stop_ids == {"place-sstat"}
+    assert alert.trip_ids == {"trip1"}
+    assert alert.route_types == {3}
+    assert not alert.agency_wide
+    assert alert.active_periods == ((100, 200), (300, OPEN_ENDED))
+    assert alert.effect == Effect.SIGNIFICANT_DELAYS
+    assert alert.header_text == "Delays"
+    assert [alert.is_active(now) for now in (50, 150, 250, 10 ** 10)] == [
+        False,
+        True,
+        False,
+        True,
+    ]
+    assert alert.serialize()["active_periods"] == [
+        {"start": 100, "end": 200},
+        {"start": 300, "end": None},
+    ]
+
+
+def test_from_entity_unknown_enum_values():
+    """Values without a member, e.g. from a newer spec, read as unknown"""
+    # GIVEN
+    entity = alert_entity(
+        "alert1", [{"stop_id": "stop1"}], cause=99, effect=1000, severity_level=7
+    )
+
+    # WHEN
+    alert = Alert.from_entity(entity)
+
+    # THEN
+    assert alert.cause == Cause.UNKNOWN_CAUSE
+    assert alert.effect == Effect.UNKNOWN_EFFECT
+    assert alert.severity_level == SeverityLevel.UNKNOWN_SEVERITY
+    assert Alert.from_entity(alert_entity("alert2", [])).cause == Cause.UNKNOWN_CAUSE
+
+
+def test_store_lookups():
+    # GIVEN: a stop alert, a route alert, an agency-wide alert and a future alert
+    store = AlertStore(clock=lambda: 150)
+    for entity in (
+        alert_entity("stop", [{"stop_id": "stop1"}]),
+        alert_entity("route", [{"route_id": "route1"}]),
+        alert_entity("agency", [{"agency_id": "1"}], [{"start": 100, "end": 200}]),
+        alert_entity("later", [{"stop_id": "stop1"}], [{"start": 160, "end": 200}]),
+    ):
+        store.apply_entity(entity)
+
+    # THEN
+    assert [alert.alert_id for alert in store.for_stop("stop1")] == ["agency", "stop"]
+    assert [alert.alert_id for alert in store.for_stop("stop1", now=170)] == [
+        "agency",
+        "later",
+        "stop",
+    ]
+    assert [alert.alert_id for alert in store.for_route("route1")] == [
+        "agency",
+        "route",
+    ]
+    assert [alert.alert_id for alert in store.for_trip("trip1")] == ["agency"]
+
+
+def test_store_evicts_expired():
+    # GIVEN: alerts ending at 200 and 300, the first re-sent by several polls
+    now = [100]
+    store = AlertStore(clock=lambda: now[0])
+    for _ in range(3):
+        store.apply_entity(
+            alert_entity("first", [{"stop_id": "stop1"}], [{"start": 0, "end": 200}])
+        )
+    store.apply_entity(
+        alert_entity("second", [{"stop_id": "stop1"}], [{"start": 0, "end": 300}])
+    )
+
+    # WHEN
+    now[0] = 250
+    active = store.for_stop("stop1")
+
+    # THEN
+    assert [alert.alert_id for alert in active] == ["second"]
+    assert store.get("first") is None
+    assert len(store) == 1
+    assert store.evict_expired(300) == 1
+    assert not store.for_stop("stop1")
+
+
+def test_store_replaced_alert_keeps_new_period():
+    # GIVEN: an alert extended from 200 to 400 and moved to another stop
+    store = AlertStore(clock=lambda: 100)
+    store.apply_entity(
+        alert_entity("alert1", [{"stop_id": "stop1"}], [{"start": 0, "end": 200}])
+    )
+    store.apply_entity(
+        alert_entity("alert1", [{"stop_id": "stop2"}], [{"start": 0, "end": 400}])
+    )
+
+    # THEN: the old expiry doesn't evict it, and the old stop no longer has it
+    assert store.evict_expired(250) == 0
+    assert not store.for_stop("stop1", now=250)
+    assert [alert.alert_id for alert in store.for_stop("stop2", now=250)] == ["alert1"]
+
+
+def test_store_finish_feed_withdraws_missing():
+    # GIVEN
+    store = AlertStore(clock=lambda: 100)
+    store.apply_entity(alert_entity("alert1", [{"stop_id": "stop1"}]))
+    store.apply_entity(alert_entity("alert2", [{"stop_id": "stop1"}]))
+
+    # WHEN
+    store.finish_feed({"incrementality": 0, "timestamp": 100}, {"alert2"})
+
+    # THEN
+    assert [alert.alert_id for alert in store.for_stop("stop1")] == ["alert2"]
+
+
+def test_poller_against_recorded_feed(feed_server, record_feed):
+    # GIVEN
+    feed_server.add_feed(
+        record_feed(
+            "alerts.pb",
+            100,
+            [
+                alert_entity(
+                    "alert1",
+                    [{"route_id": "Red", "route_type": 1}],
+                    [{"start": 1, "end": 2 ** 40}],
+                    cause=10,
+                    header_text={"translation": [{"text": "Shuttle buses"}]},
+                )
+            ],
+        ),
+        100,
+    )
+    store = AlertStore()
+
+    # WHEN
+    FeedPoller(feed_server.url, store, poll_interval=0, chunk_size=3).poll()
+
+    # THEN
+    alerts = store.for_route("Red")
+    assert [alert.header_text for alert in alerts] == ["Shuttle buses"]
+    assert alerts[0].serialize()["cause"] == "CONSTRUCTION"
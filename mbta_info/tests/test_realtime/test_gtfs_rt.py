@@ -0,0 +1,116 @@
+import pytest
+
+from flaskr.realtime import gtfs_rt
+
+
+def vehicle_entity(entity_id: str, **vehicle) -> dict:
+    return {"id": entity_id, "vehicle": vehicle}
+
+
+def test_encode_decode_round_trip():
+    # GIVEN
+    entity = vehicle_entity(
+        "y1234",
+        trip={"trip_id": "trip1", "route_id": "1", "direction_id": 1},
+        position={"latitude": 42.5, "longitude": -71.25, "odometer": 1234.5},
+        current_status=1,
+        timestamp=1580000000,
+        vehicle={"id": "y1234", "label": "1234"},
+    )
+
+    # WHEN
+    decoded = gtfs_rt.decode_message(
+        gtfs_rt.encode_message(entity, "FeedEntity"), "FeedEntity"
+    )
+
+    # THEN
+    assert decoded == entity
+
+
+def test_decode_skips_unknown_fields():
+    # GIVEN: a position followed by fields of every wire type this module doesn't know
+    data = gtfs_rt.encode_message({"latitude": 42.5, "longitude": -71.0}, "Position")
+    data += gtfs_rt.encode_varint(20 << 3 | gtfs_rt.VARINT) + gtfs_rt.encode_varint(-5)
+    data += gtfs_rt.encode_varint(21 << 3 | gtfs_rt.LENGTH_DELIMITED) + b"\x02ab"
+    data += gtfs_rt.encode_varint(22 << 3 | gtfs_rt.FIXED64) + bytes(8)
+
+    # WHEN
+    decoded = gtfs_rt.decode_message(data, "Position")
+
+    # THEN
+    assert decoded == {"latitude": 42.5, "longitude": -71.0}
+
+
+def test_decode_truncated_message():
+    # GIVEN
+    data = gtfs_rt.encode_message({"trip_id": "trip1"}, "TripDescriptor")
+
+    # THEN
+    with pytest.raises(gtfs_rt.DecodeError, match="Truncated TripDescriptor"):
+        gtfs_rt.decode_message(data[:-1], "TripDescriptor")
+
+
+def test_decode_wrong_wire_type():
+    # GIVEN: trip_id sent as a varint
+    data = gtfs_rt.encode_varint(1 << 3 | gtfs_rt.VARINT) + gtfs_rt.encode_varint(1)
+
+    # THEN
+    with pytest.raises(gtfs_rt.DecodeError, match="TripDescriptor.trip_id"):
+        gtfs_rt.decode_message(data, "TripDescriptor")
+
+
+def test_feed_decoder_byte_by_byte():
+    # GIVEN
+    entities = [
+        vehicle_entity(f"v{i}", position={"latitude": 42.0, "longitude": -71.0})
+        for i in range(3)
+    ]
+    feed = gtfs_rt.encode_message(
+        {
+            "header": {"gtfs_realtime_version": "2.0", "timestamp": 10},
+            "entity": entities,
+        },
+        "FeedMessage",
+    )
+    decoder = gtfs_rt.FeedDecoder()
+
+    # WHEN: the feed arrives one byte at a time
+    decoded = []
+    completed_at = []
+    for pos in range(len(feed)):
+        new_entities = decoder.feed(feed[pos : pos + 1])
+        decoded.extend(new_entities)
+        completed_at.extend([pos] * len(new_entities))
+    decoder.close()
+
+    # THEN: each entity is returned as soon as its last byte arrives
+    assert decoded == entities
+    assert completed_at[-1] == len(feed) - 1
+    assert completed_at[0] < completed_at[1] < completed_at[2]
+    assert decoder.header == {"gtfs_realtime_version": "2.0", "timestamp": 10}
+    assert decoder.entity_count == 3
+
+
+def test_feed_decoder_truncated_feed():
+    # GIVEN
+    feed = gtfs_rt.encode_message(
+        {"header": {"timestamp": 10}, "entity": [{"id": "v1"}]}, "FeedMessage"
+    )
+    decoder = gtfs_rt.FeedDecoder()
+    decoder.feed(feed[:-1])
+
+    # THEN
+    with pytest.raises(gtfs_rt.DecodeError, match="ended inside a field"):
+        decoder.close()
+
+
+def test_enum_member():
+    assert (
+        gtfs_rt.enum_member(gtfs_rt.Effect, 3, gtfs_rt.Effect.UNKNOWN_EFFECT)
+        == gtfs_rt.Effect.SIGNIFICANT_DELAYS
+    )
+    for value in (None, 1000):
+        assert (
+            gtfs_rt.enum_member(gtfs_rt.Effect, value, gtfs_rt.Effect.UNKNOWN_EFFECT)
+            == gtfs_rt.Effect.UNKNOWN_EFFECT
+        )
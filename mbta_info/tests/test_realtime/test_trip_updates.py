@@ -0,0 +1,230 @@
+import datetime
+from unittest import mock
+
+import pytz
+
+from flaskr.realtime import trip_updates
+from flaskr.realtime.poller import FeedPoller
+from flaskr.realtime.trip_updates import TripOverlay, TripUpdateStore
+
+SERVICE_DATE = datetime.date(2020, 1, 6)
+DAY_START = trip_updates.service_day_start(
+    SERVICE_DATE, pytz.timezone("America/New_York")
+)
+
+
+def trip_update_entity(trip_id: str, stop_time_updates, **trip) -> dict:
+    return {
+        "id": trip_id,
+        "trip_update": {
+            "trip": dict(trip, trip_id=trip_id),
+            "stop_time_update": stop_time_updates,
+            "timestamp": 100,
+        },
+    }
+
+
+def departure(trip_id: str, stop_sequence: int, departure_time: int) -> dict:
+    return {
+        "trip_id": trip_id,
+        "stop_sequence": stop_sequence,
+        "arrival_time": departure_time - 30,
+        "departure_time": departure_time,
+    }
+
+
+def test_service_day_start_daylight_saving():
+    """GTFS times count from noon minus 12 hours, an hour before midnight when clocks go forward"""
+    eastern = pytz.timezone("America/New_York")
+    midnight = eastern.localize(datetime.datetime(2020, 3, 8))
+
+    assert trip_updates.service_day_start(datetime.date(2020, 3, 8), eastern) == (
+        midnight.timestamp() - 3600
+    )
+    assert DAY_START == eastern.localize(datetime.datetime(2020, 1, 6)).timestamp()
+
+
+def test_from_entity_orders_updates():
+    # GIVEN: updates out of order, one without a stop_sequence
+    entity = trip_update_entity(
+        "trip1",
+        [
+            {"stop_sequence": 5, "departure": {"delay": 60}},
+            {"stop_id": "stop9", "departure": {"delay": 600}},
+            {"stop_sequence": 2, "arrival": {"delay": 30}},
+        ],
+    )
+
+    # WHEN
+    overlay = TripOverlay.from_entity(entity)
+
+    # THEN
+    assert list(overlay.stop_sequences) == [2, 5]
+    assert overlay.delay(0, DAY_START) == 30
+    assert overlay.delay(1, DAY_START) == 60
+    assert TripOverlay.from_entity({"id": "vehicle1", "vehicle": {}}) is None
+
+
+def test_delay_propagates_to_later_stops():
+    # GIVEN
+    store = TripUpdateStore()
+    store.apply_entity(
+        trip_update_entity(
+            "trip1",
+            [
+                {"stop_sequence": 3, "departure": {"delay": 120}},
+                {"stop_sequence": 6, "departure": {"delay": 300}},
+            ],
+        )
+    )
+    departures = [
+        departure("trip1", 2, 1000),
+        departure("trip1", 3, 1100),
+        departure("trip1", 5, 1300),
+        departure("trip1", 8, 1600),
+        departure("trip2", 3, 1100),
+    ]
+    lookup = mock.Mock()
+
+    # WHEN
+    trip_updates.overlay_departures(store, departures, SERVICE_DATE, lookup)
+
+    # THEN: earlier stops keep the schedule, later ones carry the last delay
+    assert [d["realtime"] and d["realtime"]["delay"] for d in departures] == [
+        None,
+        120,
+        120,
+        300,
+        None,
+    ]
+    assert departures[2]["realtime"]["departure_time"] == 1420
+    lookup.assert_not_called()
+
+
+def test_absolute_times_resolved_against_schedule():
+    # GIVEN: an update 90s late at stop 3 given as a time, and its scheduled time
+    store = TripUpdateStore()
+    store.apply_entity(
+        trip_update_entity(
+            "trip1", [{"stop_sequence": 3, "departure": {"time": DAY_START + 1190}}]
+        )
+    )
+    lookup = mock.Mock(return_value={("trip1", 3): (1070, 1100)})
+
+    # WHEN
+    at_update = [departure("trip1", 3, 1100)]
+    later = [departure("trip1", 7, 1500)]
+    trip_updates.overlay_departures(store, at_update, SERVICE_DATE, lookup)
+    trip_updates.overlay_departures(store, later, SERVICE_DATE, lookup)
+    trip_updates.overlay_departures(store, later, SERVICE_DATE, lookup)
+
+    # THEN: the schedule is read once, for the later stop, and the delay kept
+    assert at_update[0]["realtime"]["departure_time"] == 1190
+    assert later[0]["realtime"] == {
+        "status": "scheduled",
+        "departure_time": 1590,
+        "delay": 90,
+    }
+    lookup.assert_called_once_with({("trip1", 3)})
+
+
+def test_skipped_no_data_and_canceled():
+    # GIVEN
+    store = TripUpdateStore()
+    store.apply_entity(
+        trip_update_entity(
+            "trip1",
+            [
+                {"stop_sequence": 1, "departure": {"delay": 60}},
+                {"stop_sequence": 2, "schedule_relationship": 1},
+                {"stop_sequence": 4, "schedule_relationship": 2},
+            ],
+        )
+    )
+    store.apply_entity(trip_update_entity("trip2", [], schedule_relationship=3))
+    departures = [
+        departure("trip1", 2, 1000),
+        departure("trip1", 3, 1100),
+        departure("trip1", 4, 1200),
+        departure("trip2", 1, 1000),
+    ]
+
+    # WHEN
+    trip_updates.overlay_departures(store, departures, SERVICE_DATE, mock.Mock())
+
+    # THEN: a skipped stop passes on the delay before it, NO_DATA ends it
+    assert [d["realtime"] and d["realtime"]["status"] for d in departures] == [
+        "skipped",
+        "scheduled",
+        None,
+        "canceled",
+    ]
+    assert departures[1]["realtime"]["delay"] == 60
+
+
+def test_other_service_date_ignored():
+    # GIVEN: an update of the trip's run on the next day
+    store = TripUpdateStore()
+    store.apply_entity(
+        trip_update_entity(
+            "trip1",
+            [{"stop_sequence": 1, "departure": {"delay": 60}}],
+            start_date="20200107",
+        )
+    )
+    departures = [departure("trip1", 1, 1000)]
+
+    # WHEN
+    trip_updates.overlay_departures(store, departures, SERVICE_DATE, mock.Mock())
+
+    # THEN
+    assert departures[0]["realtime"] is None
+
+
+def test_store_keeps_latest_and_retains_full_dataset():
+    # GIVEN
+    store = TripUpdateStore()
+    store.update(TripOverlay("trip1", timestamp=100))
+    store.update(TripOverlay("trip2", timestamp=100))
+
+    # WHEN
+    stale = store.update(TripOverlay("trip1", timestamp=90))
+    store.finish_feed({"incrementality": 0, "timestamp": 120}, {"trip1"})
+
+    # THEN
+    assert not stale
+    assert store.get("trip1").timestamp == 100
+    assert store.get("trip2") is None
+    assert store.feed_timestamp == 120
+
+
+def test_poller_against_recorded_feed(feed_server, record_feed):
+    # GIVEN
+    feed_server.add_feed(
+        record_feed(
+            "trip_updates.pb",
+            100,
+            [
+                trip_update_entity(
+                    "trip1",
+                    [
+                        {"stop_sequence": 1, "departure": {"delay": -30}},
+                        {"stop_sequence": 4, "arrival": {"time": DAY_START + 2000}},
+                    ],
+                    start_date="20200106",
+                )
+            ],
+        ),
+        100,
+    )
+    store = TripUpdateStore()
+
+    # WHEN
+    FeedPoller(feed_server.url, store, poll_interval=0, chunk_size=5).poll()
+
+    # THEN: negative delays survive the wire format
+    overlay = store.get("trip1")
+    assert list(overlay.stop_sequences) == [1, 4]
+    assert overlay.delay(0, DAY_START) == -30
+    assert overlay.delay(1, DAY_START, (1900, 1930)) == 100
+    assert overlay.start_date == "20200106"
@@ -0,0 +1,210 @@
+import pytest
+import requests
+
+from flaskr import models as mbta_models
+from flaskr.realtime.gtfs_rt import VehicleStopStatus
+from flaskr.realtime.poller import FeedPoller, linked_dataset_url
+from flaskr.realtime.vehicles import VehiclePosition, VehicleStore
+
+
+def vehicle_entity(vehicle_id: str, latitude: float, longitude: float, timestamp: int):
+    return {
+        "id": vehicle_id,
+        "vehicle": {
+            "trip": {"trip_id": f"trip_{vehicle_id}", "route_id": "1"},
+            "position": {"latitude": latitude, "longitude": longitude},
+            "current_status": 1,
+            "stop_id": "stop1",
+            "timestamp": timestamp,
+            "vehicle": {"id": vehicle_id, "label": vehicle_id.upper()},
+        },
+    }
+
+
+def test_from_entity():
+    # WHEN
+    position = VehiclePosition.from_entity(vehicle_entity("v1", 42.5, -71.0, 100))
+
+    # THEN
+    assert position.vehicle_id == "v1"
+    assert (position.latitude, position.longitude) == (42.5, -71.0)
+    assert position.trip_id == "trip_v1"
+    assert position.label == "V1"
+    assert position.current_status == VehicleStopStatus.STOPPED_AT
+    assert VehiclePosition.from_entity({"id": "alert1"}) is None
+
+
+def test_from_entity_unknown_status():
+    # GIVEN: a status added to the spec since, and none at all
+    unknown_status = vehicle_entity("v1", 42.5, -71.0, 100)
+    unknown_status["vehicle"]["current_status"] = 9
+    no_status = vehicle_entity("v2", 42.5, -71.0, 100)
+    del no_status["vehicle"]["current_status"]
+
+    # WHEN / THEN
+    for entity in (unknown_status, no_status):
+        position = VehiclePosition.from_entity(entity)
+        assert position.current_status == VehicleStopStatus.IN_TRANSIT_TO
+
+
+def test_store_update_keeps_latest():
+    # GIVEN
+    store = VehicleStore(cell_size=0.01)
+    store.update(VehiclePosition("v1", 42.35, -71.05, timestamp=100))
+
+    # WHEN: an older position arrives after a newer one, then the vehicle moves cells
+    stale = store.update(VehiclePosition("v1", 42.0, -71.0, timestamp=90))
+    moved = store.update(VehiclePosition("v1", 42.36, -71.06, timestamp=110))
+
+    # THEN
+    assert not stale
+    assert moved
+    assert len(store) == 1
+    assert store.get("v1").timestamp == 110
+    assert store.near(42.35, -71.05, 300) == []
+    assert [position.vehicle_id for _, position in store.near(42.36, -71.06, 10)] == [
+        "v1"
+    ]
+
+
+def test_store_near():
+    # GIVEN: vehicles about 0, 100, 500 and 2000 meters north of a point, across grid cells
+    store = VehicleStore(cell_size=0.001)
+    for vehicle_id, meters in (
+        ("v0", 0),
+        ("v100", 100),
+        ("v500", 500),
+        ("v2000", 2000),
+    ):
+        store.update(VehiclePosition(vehicle_id, 42.35 + meters / 111195, -71.05))
+
+    # WHEN
+    nearby = store.near(42.35, -71.05, 600)
+
+    # THEN
+    assert [position.vehicle_id for _, position in nearby] == ["v0", "v100", "v500"]
+    assert [round(distance) for distance, _ in nearby] == [0, 100, 500]
+
+
+def test_store_finish_full_dataset_drops_missing_vehicles():
+    # GIVEN
+    store = VehicleStore()
+    for vehicle_id in ("v1", "v2"):
+        store.apply_entity(vehicle_entity(vehicle_id, 42.35, -71.05, 100))
+
+    # WHEN: the next full feed only lists v2
+    store.finish_feed({"incrementality": 0, "timestamp": 200}, {"v2"})
+
+    # THEN
+    assert store.get("v1") is None
+    assert store.get("v2")
+    assert store.near(42.35, -71.05, 10)[0][1].vehicle_id == "v2"
+    assert store.feed_timestamp == 200
+
+
+def test_poller_against_recorded_feeds(feed_server, record_feed):
+    # GIVEN: two recorded polls, the second without v1
+    feed_server.add_feed(
+        record_feed(
+            "first.pb",
+            100,
+            [
+                vehicle_entity("v1", 42.35, -71.05, 95),
+                vehicle_entity("v2", 42.36, -71.06, 96),
+                {"id": "alert1"},
+            ],
+        ),
+        100,
+    )
+    feed_server.add_feed(
+        record_feed("second.pb", 110, [vehicle_entity("v2", 42.37, -71.07, 106)]), 110
+    )
+    store = VehicleStore()
+    poller = FeedPoller(feed_server.url, store, poll_interval=0, chunk_size=7)
+
+    # WHEN / THEN
+    assert poller.poll()
+    assert len(store) == 2
+    assert store.feed_timestamp == 100
+    assert poller.poll()
+    assert store.get("v1") is None
+    assert store.get("v2").latitude == pytest.approx(42.37)
+    # The second file is served again, unchanged since the Last-Modified it was sent with
+    assert not poller.poll()
+    assert store.feed_timestamp == 110
+    assert len(feed_server.requests) == 3
+
+
+def test_poller_run_survives_errors(feed_server, record_feed, capsys):
+    # GIVEN: a feed cut off mid-entity
+    path = record_feed("truncated.pb", 100, [vehicle_entity("v1", 42.35, -71.05, 95)])
+    path.write_bytes(path.read_bytes()[:-3])
+    feed_server.add_feed(path, 100)
+    poller = FeedPoller(feed_server.url, VehicleStore(), poll_interval=0.01)
+
+    # WHEN
+    thread, stop = poller.start()
+    while poller.errors < 2:
+        thread.join(0.01)
+    stop.set()
+    thread.join()
+
+    # THEN
+    assert poller.polls >= 2
+    assert "Feed ended inside a field" in capsys.readouterr().out
+
+
+def test_poller_run_survives_store_errors(feed_server, record_feed, capsys):
+    # GIVEN: a store that fails on every entity
+    class FailingStore(VehicleStore):
+        def apply_entity(self, entity):
+            raise ValueError("Bad entity")
+
+    path = record_feed("feed.pb", 100, [vehicle_entity("v1", 42.35, -71.05, 95)])
+    feed_server.add_feed(path, 100)
+    poller = FeedPoller(feed_server.url, FailingStore(), poll_interval=0.01)
+
+    # WHEN
+    thread, stop = poller.start()
+    while poller.errors < 2:
+        thread.join(0.01)
+    stop.set()
+    thread.join()
+
+    # THEN
+    assert poller.polls >= 2
+    assert "ValueError('Bad entity')" in capsys.readouterr().out
+
+
+def test_poller_http_error(feed_server):
+    # GIVEN
+    poller = FeedPoller(feed_server.url + ".missing", VehicleStore(), poll_interval=0)
+
+    # THEN
+    with pytest.raises(requests.HTTPError):
+        poller.poll()
+
+
+def test_linked_dataset_url(db):
+    # GIVEN
+    for url, trip_updates, vehicle_positions in (
+        ("https://cdn.example.com/TripUpdates.pb", 1, 0),
+        ("https://cdn.example.com/VehiclePositions.pb", 0, 1),
+    ):
+        db.session.add(
+            mbta_models.LinkedDataset(
+                url,
+                trip_updates,
+                vehicle_positions,
+                0,
+                mbta_models.AuthenticationType.type_0,
+            )
+        )
+    db.session.commit()
+
+    # THEN
+    assert (
+        linked_dataset_url(db, "vehicle_positions")
+        == "https://cdn.example.com/VehiclePositions.pb"
+    )
+    assert linked_dataset_url(db, "service_alerts") is None
@@ -0,0 +1,56 @@
+import datetime
+
+import marshmallow as mm
+import pytest
+import typing
+
+from flaskr import schemas, models as mbta_models
+
+
+@pytest.fixture
+def feed_info_data() -> typing.Dict:
+    return {
+        "feed_publisher_name": "MBTA",
+        "feed_publisher_url": "http://www.mbta.com",
+        "feed_lang": "EN",
+        "feed_start_date": "20200410",
+        "feed_end_date": "20200621",
+        "feed_version": "Spring 2020, 2020-04-10T18:44:39+00:00, version D",
+        "feed_contact_email": "developer@mbta.com",
+    }
+
+
+def test_load_good_data(feed_info_data: typing.Dict):
+    # GIVEN
+    feed_info_obj = schemas.FeedInfoSchema().load(feed_info_data)
+
+    # THEN
+    assert isinstance(feed_info_obj, mbta_models.FeedInfo)
+    assert isinstance(feed_info_obj.created, datetime.datetime)
+    for key, value in feed_info_data.items():
+        if key == "feed_lang":
+            value = getattr(mbta_models.LangCode, value.lower())
+        elif key.endswith("date"):
+            value = datetime.datetime.strptime(value, schemas.DATE_INPUT_FORMAT).date()
+        assert getattr(feed_info_obj, key) == value
+
+
+@pytest.mark.parametrize(
+    "feed_info_data_update",
+    (
+        {"feed_publisher_name": ""},
+        {"feed_publisher_url": "bad_url"},
+        {"feed_lang": "bad_lang"},
+        {"feed_start_date": "2020-04-10"},
+        {"feed_version": ""},
+        {"feed_contact_email": "bad_email"},
+        {"bad_key": "anything"},
+    ),
+)
+def test_load_bad_data(feed_info_data_update: typing.Dict, feed_info_data: typing.Dict):
+    # GIVEN
+    feed_info_data.update(feed_info_data_update)
+
+    # THEN
+    with pytest.raises(mm.ValidationError):
+        schemas.FeedInfoSchema().load(feed_info_data)
@@ -0,0 +1,189 @@
+import marshmallow as mm
+import numpy as np
+import pytest
+
+from flaskr import schema_utils, schemas, models as mbta_models
+from flaskr.tools import column_batch
+
+SHAPE_HEADER = [
+    "shape_id",
+    "shape_pt_lat",
+    "shape_pt_lon",
+    "shape_pt_sequence",
+    "shape_dist_traveled",
+]
+STOP_TIME_HEADER = [
+    "trip_id",
+    "arrival_time",
+    "departure_time",
+    "stop_id",
+    "stop_sequence",
+    "stop_headsign",
+    "pickup_type",
+    "drop_off_type",
+    "timepoint",
+    "checkpoint_id",
+]
+
+
+def test_parse_times():
+    # GIVEN: times in the plain form and others left to the schema
+    values = ["00:00:00", "08:15:30", "25:59:59", "99:99:99", "8:15:30", "08:15:3a", ""]
+
+    # WHEN
+    seconds, converted = column_batch.parse_times(np.array(values))
+
+    # THEN
+    assert converted.tolist() == [True, True, True, True, False, False, False]
+    assert seconds[converted].tolist() == [
+        schema_utils.time_as_seconds(value)
+        for value, plain in zip(values, converted)
+        if plain
+    ]
+
+
+def test_parse_unsigned():
+    # GIVEN
+    values = ["0", "7", "007", "123456789012", "-1", "1.5", " 2", "", "1" * 19]
+
+    # WHEN
+    integers, converted = column_batch.parse_unsigned(np.array(values))
+
+    # THEN
+    assert converted.tolist() == [True] * 4 + [False] * 5
+    assert integers[converted].tolist() == [0, 7, 7, 123456789012]
+
+
+def test_parse_floats():
+    # GIVEN: one value NumPy can't read makes the block fall back to float()
+    values = ["42.35", "-71.06", "1e3", "NAN", "inf", "", "not a number"]
+
+    # WHEN
+    floats, converted = column_batch.parse_floats(np.array(values))
+
+    # THEN
+    assert converted.tolist() == [True, True, True, False, False, False, False]
+    assert floats[:3].tolist() == [42.35, -71.06, 1000.0]
+
+
+def test_shape_transform_matches_schema():
+    # GIVEN: good rows and rows the schema rejects
+    rows = [
+        ["shape1", "42.3601", "-71.0589", "1", ""],
+        ["shape1", "42.36", "-71.05", "2", "120.5"],
+        ["shape1", "NAN", "-71.05", "3", ""],
+        ["shape1", "42.36", "-71.05", "1.1", ""],
+        ["", "42.36", "-71.05", "4", ""],
+        ["shape1", "42.36", "-71.05"],
+    ]
+
+    # WHEN
+    staged = column_batch.ShapeTransform().transform(SHAPE_HEADER, rows)
+
+    # THEN
+    assert staged[2:] == [None] * 4
+    for row, staged_row in zip(rows[:2], staged):
+        shape = schemas.ShapeSchema().load(dict(zip(SHAPE_HEADER, row)))
+        assert staged_row == {
+            column.name: getattr(shape, column.name)
+            for column in mbta_models.Shape.__table__.columns
+            if column.name not in ("id", "feed_version")
+        }
+    for row in rows[2:5]:
+        with pytest.raises(mm.ValidationError):
+            schemas.ShapeSchema().load(dict(zip(SHAPE_HEADER, row)))
+
+
+def test_shape_transform_unexpected_columns():
+    """Rows of a file with columns the schema doesn't know are left to the schema"""
+    # GIVEN / WHEN
+    staged = column_batch.ShapeTransform().transform(
+        SHAPE_HEADER + ["shape_color"], [["shape1", "42.36", "-71.05", "1", "", "red"]]
+    )
+
+    # THEN
+    assert staged == [None]
+
+
+def test_stop_time_transform():
+    # GIVEN: keys as read by prepare()
+    transform = column_batch.StopTimeTransform()
+    transform.fields["trip_id"].keys = {"trip1"}
+    transform.fields["stop_id"].keys = {"stop1", "stop2"}
+    transform.fields["checkpoint_id"].keys = {"checkpoint1"}
+    rows = [
+        ["trip1", "08:00:00", "08:00:30", "stop1", "1", "", "", "1", "1", ""],
+        [
+            "trip1",
+            "08:05:00",
+            "08:05:00",
+            "stop2",
+            "2",
+            "Wonderland",
+            "3",
+            "",
+            "",
+            "checkpoint1",
+        ],
+        ["trip2", "08:05:00", "08:05:00", "stop2", "2", "", "", "", "", ""],
+        ["trip1", "08:05:00", "08:05:00", "stop2", "2", "", "F", "", "", ""],
+        ["trip1", "08:05:00", "08:05:00", "stop2", "2", "", "", "", "2", ""],
+    ]
+
+    # WHEN
+    staged = transform.transform(STOP_TIME_HEADER, rows)
+
+    # THEN
+    assert staged[0] == {
+        "trip_id": "trip1",
+        "arrival_time": 8 * 3600,
+        "departure_time": 8 * 3600 + 30,
+        "stop_id": "stop1",
+        "stop_sequence": 1,
+        "stop_headsign": None,
+        "pickup_type": mbta_models.PickupDropOffType.type_0,
+        "drop_off_type": mbta_models.PickupDropOffType.type_1,
+        "shape_dist_traveled": None,
+        "timepoint": 1,
+        "checkpoint_id": None,
+    }
+    assert staged[1]["stop_headsign"] == "Wonderland"
+    assert staged[1]["pickup_type"] == mbta_models.PickupDropOffType.type_3
+    assert staged[1]["timepoint"] is None
+    assert staged[1]["checkpoint_id"] == "checkpoint1"
+    # An unknown trip, a non-numbered pickup type and a timepoint of 2 go to the schema
+    assert staged[2:] == [None] * 3
+
+
+def test_stop_time_transform_matches_schema_at_midnight(db, trip, stop):
+    """00:00:00 converts to 0 in both paths, not to a missing time in the schema's"""
+    # GIVEN
+    transform = column_batch.StopTimeTransform()
+    transform.prepare(db)
+    row = [trip.trip_id, "00:00:00", "00:00:00", stop.stop_id, "1", "", "", "", "", ""]
+
+    # WHEN
+    staged = transform.transform(STOP_TIME_HEADER, [row])
+    stop_time = schemas.StopTimeSchema().load(dict(zip(STOP_TIME_HEADER, row)))
+
+    # THEN
+    assert staged[0]["arrival_time"] == stop_time.arrival_time == 0
+    assert staged[0]["departure_time"] == stop_time.departure_time == 0
+    assert staged[0] == {
+        column.name: getattr(stop_time, column.name)
+        for column in mbta_models.StopTime.__table__.columns
+        if column.name not in ("id", "feed_version")
+    }
+
+
+def test_stop_time_transform_missing_pre_load_column():
+    """The schema raises KeyError without drop_off_type, so the rows are left to it"""
+    # GIVEN
+    transform = column_batch.StopTimeTransform()
+    header = [name for name in STOP_TIME_HEADER if name != "drop_off_type"]
+
+    # WHEN
+    staged = transform.transform(header, [["trip1"] + [""] * (len(header) - 1)])
+
+    # THEN
+    assert staged == [None]
@@ -0,0 +1,13 @@
+from flaskr import codes
+from flaskr.tools import generate_codes
+
+
+def test_codes_match_pinned_packages():
+    """flaskr/codes.py must be regenerated whenever pytz or pycountry is bumped"""
+    # GIVEN / WHEN
+    rendered = generate_codes.render_codes()
+
+    # THEN
+    assert generate_codes.CODES_PATH.read_text() == rendered
+    assert list(codes.TIME_ZONES) == generate_codes.time_zones()
+    assert list(codes.LANGUAGE_CODES) == generate_codes.language_codes()
@@ -0,0 +1,112 @@
+from sqlalchemy import inspect
+
+from flaskr import models as mbta_models
+from flaskr.tools import indexes
+
+
+def index_names(db, table_name: str):
+    return {index["name"] for index in inspect(db.get_engine()).get_indexes(table_name)}
+
+
+def test_post_load_indexes():
+    assert [
+        index.name
+        for index in indexes.post_load_indexes(mbta_models.StopTime.__table__)
+    ] == ["ix_stop_time_stop_id_departure_time", "ix_stop_time_trip_id_stop_sequence"]
+    assert indexes.post_load_indexes(mbta_models.Agency.__table__) == []
+
+
+def test_drop_and_build_post_load_indexes(db):
+    # GIVEN
+    table = mbta_models.StopTime.__table__
+    expected = {
+        "ix_stop_time_stop_id_departure_time",
+        "ix_stop_time_trip_id_stop_sequence",
+    }
+    assert expected <= index_names(db, table.name)
+
+    # WHEN
+    indexes.drop_post_load_indexes(db, table)
+    dropped_names = index_names(db, table.name)
+    timings = indexes.build_post_load_indexes(db, table)
+
+    # THEN
+    assert not expected & dropped_names
+    assert set(timings) == expected
+    assert expected <= index_names(db, table.name)
+    assert indexes.build_post_load_indexes(db, table) == {}  # Already built
+
+
+def foreign_key_names(db, table_name: str):
+    return {
+        foreign_key["name"]
+        for foreign_key in inspect(db.get_engine()).get_foreign_keys(table_name)
+    }
+
+
+def test_secondary_indexes():
+    # WHEN
+    statements = indexes.secondary_indexes(mbta_models.Stop.__table__)
+
+    # THEN
+    assert statements == {
+        "idx_stop_stop_lonlat": 'CREATE INDEX "idx_stop_stop_lonlat" ON "stop" USING GIST ("stop_lonlat")',
+        "ix_stop_stop_lonlat": "CREATE INDEX ix_stop_stop_lonlat ON stop (stop_lonlat)",
+    }
+    # Unique indexes stay while loading
+    assert (
+        "ix_pattern_stop_route_pattern_id_stop_sequence"
+        not in indexes.secondary_indexes(mbta_models.PatternStop.__table__)
+    )
+
+
+def test_foreign_keys():
+    assert indexes.foreign_keys(mbta_models.Route.__table__) == {
+        "route_agency_id_fkey": "ADD CONSTRAINT route_agency_id_fkey "
+        "FOREIGN KEY (agency_id) REFERENCES agency (agency_id)",
+        "route_line_id_fkey": "ADD CONSTRAINT route_line_id_fkey "
+        "FOREIGN KEY (line_id) REFERENCES line (line_id)",
+    }
+
+
+def test_bulk_load_from_config(monkeypatch):
+    # GIVEN
+    config = {"bulk_load": {"enabled": True, "index_workers": 4}}
+
+    # WHEN
+    from_config = indexes.BulkLoad.from_config(config)
+    monkeypatch.setenv(indexes.BULK_LOAD_ENV, "0")
+    from_env = indexes.BulkLoad.from_config(config)
+
+    # THEN
+    assert from_config.enabled
+    assert from_config.index_workers == 4
+    assert not from_env.enabled
+
+
+def test_bulk_load_drop_and_restore(db):
+    # GIVEN
+    table = mbta_models.Trip.__table__
+    expected_indexes = {"ix_trip_route_id_trip_id", "ix_trip_service_id"}
+    expected_foreign_keys = {
+        "trip_route_id_fkey",
+        "trip_route_pattern_id_fkey",
+        "trip_service_id_fkey",
+    }
+    assert foreign_key_names(db, table.name) == expected_foreign_keys
+    bulk_load = indexes.BulkLoad(enabled=True, index_workers=2)
+
+    # WHEN
+    bulk_load.drop(db, table)
+    dropped_indexes = index_names(db, table.name)
+    dropped_foreign_keys = foreign_key_names(db, table.name)
+    timings = bulk_load.restore(db, table)
+
+    # THEN
+    assert not expected_indexes & dropped_indexes
+    assert not dropped_foreign_keys
+    assert set(timings.index_seconds) == expected_indexes
+    assert set(timings.foreign_keys) == expected_foreign_keys
+    assert expected_indexes <= index_names(db, table.name)
+    assert foreign_key_names(db, table.name) == expected_foreign_keys
+    assert bulk_load.restore(db, table).elapsed == 0  # Nothing left to restore
@@ -1,3 +1,5 @@
+import csv
+import io
 import json
 import pathlib
 from unittest import mock
@@ -7,7 +9,10 @@ import marshmallow as mm
 
 from sqlalchemy.exc import DataError
 
-from flaskr.tools.loader import Loader
+from flaskr import schemas, models as mbta_models
+from flaskr.tools import column_batch
+from flaskr.tools.loader import Loader, skip_rows
+from flaskr.tools.quarantine import Quarantine
 from tests import models as test_models
 from tests import schemas as test_schemas
 
@@ -25,6 +30,7 @@ def test_init(batch_size_to_set, batch_size_expected, db, monkeypatch):
         "calendar_attribute",
         "calendar_date",
         "checkpoint",
+        "feed_info",
         "geo_stub",
         "line",
         "shape",
@@ -281,3 +287,133 @@ def test_load_data_full_run(db, monkeypatch, capsys):
     for model_name in model_names:
         assert f"Loading data for {model_name} table" in captured
         assert f"transit_info/mbta_info/data/{model_name}s.txt" in captured
+
+
+def test_stage_blocks_bad_row(db, tmp_path, capsys):
+    """A row the column batch can't convert goes through the schema, which raises as before"""
+    # GIVEN
+    data_file_path = tmp_path / "shapes.txt"
+    data_file_path.write_text(
+        "shape_id,shape_pt_lat,shape_pt_lon,shape_pt_sequence,shape_dist_traveled\n"
+        "shape1,42.36,-71.05,1,\n"
+        "\n"
+        "shape1,NAN,-71.05,2,\n"
+    )
+    loader = Loader(db)
+    loader.feed_version = "feed1"
+    loader.staging_table = mbta_models.Shape.__table__
+    transform = column_batch.ShapeTransform()
+
+    # WHEN
+    with pytest.raises(mm.ValidationError):
+        loader.stage_blocks(data_file_path, schemas.ShapeSchema(), transform)
+
+    # THEN
+    assert [row["shape_pt_sequence"] for row in loader.staged_rows] == [1]
+    assert loader.staged_rows[0]["feed_version"] == "feed1"
+    assert '"shape_pt_lat": "NAN"' in capsys.readouterr().out
+
+
+def test_load_rows_quarantine(db, tmp_path):
+    """With quarantine enabled, bad rows are written to the reject file and the load goes on"""
+    # GIVEN
+    geo_stub = test_models.GeoStub(1, 10.1, 20.2)
+    db.session.add(geo_stub)
+    db.session.commit()
+    data_file_path = tmp_path / "test_models.txt"
+    data_file_path.write_text(
+        "test_id,test_name,test_type\n"
+        "test1,Good 1,0\n"
+        "test2,Bad,NAN\n"
+        "test3,Good 3,1\n"
+    )
+    loader = Loader(db)
+    loader.quarantine = Quarantine(tmp_path / "rejects", enabled=True)
+    loader.quarantine.start_table("test_model", "feed1")
+    model = test_models.TestModel
+
+    # WHEN
+    rows_added = loader.load_rows(
+        data_file_path, model, test_schemas.TestModelSchema(), "test_id", set(), False
+    )
+    loader.quarantine.finish_table()
+
+    # THEN
+    assert rows_added == 2
+    assert loader.quarantine.counts == {"test_model": 1}
+    reject = json.loads(
+        (tmp_path / "rejects" / "feed1" / "test_model.rejects.jsonl").read_text()
+    )
+    assert reject["line"] == 3
+    assert reject["row"]["test_id"] == "test2"
+
+
+def test_skip_rows():
+    # GIVEN
+    reader = csv.DictReader(io.StringIO("test_id\ntest1\n\ntest2\ntest3\n"))
+
+    # WHEN
+    skip_rows(reader, 2)
+
+    # THEN
+    assert [row["test_id"] for row in reader] == ["test3"]
+
+
+def test_resume_checkpoint(db, monkeypatch):
+    """The checkpoint of the feed version being loaded is resumed and the others discarded"""
+    # GIVEN
+    db.session.add(mbta_models.LoadCheckpoint("feed1", "shape", row_offset=40))
+    db.session.add(mbta_models.LoadCheckpoint("feed0", "stop", row_offset=10))
+    db.session.commit()
+    loader = Loader(db)
+    monkeypatch.setattr(loader, "get_feed_version", lambda: "feed1")
+
+    # WHEN
+    loaded, resume_offset = loader.resume_checkpoint()
+
+    # THEN
+    assert loaded == set(loader.table_names[: loader.table_names.index("shape")])
+    assert resume_offset == 40
+    assert loader.checkpoint_version == "feed1"
+    assert [
+        checkpoint.feed_version
+        for checkpoint in db.session.query(mbta_models.LoadCheckpoint)
+    ] == ["feed1"]
+
+
+def test_load_rows_resume(db, tmp_path):
+    """A resumed load skips the rows committed before, and checkpoints every batch"""
+    # GIVEN
+    data_file_path = tmp_path / "test_models.txt"
+    data_file_path.write_text(
+        "test_id,test_name,test_type\n"
+        "test1,Test 1,0\n"
+        "test2,Test 2,0\n"
+        "test3,Test 3,1\n"
+        "test4,Test 4,2\n"
+    )
+    db.session.add(mbta_models.LoadCheckpoint("feed1", "test_model", row_offset=1))
+    db.session.commit()
+    loader = Loader(db, max_batch_size=2)
+    loader.checkpoint_version = "feed1"
+    loader.table_name = "test_model"
+    loader.rows_read = 1
+
+    # WHEN
+    rows_added = loader.load_rows(
+        data_file_path,
+        test_models.TestModel,
+        test_schemas.TestModelSchema(),
+        "test_id",
+        set(),
+        False,
+    )
+
+    # THEN
+    assert rows_added == 3
+    assert sorted(
+        test_id for (test_id,) in db.session.query(test_models.TestModel.test_id)
+    ) == ["test2", "test3", "test4"]
+    checkpoint = db.session.query(mbta_models.LoadCheckpoint).one()
+    assert (checkpoint.table_name, checkpoint.row_offset) == ("test_model", 4)
+    assert not checkpoint.table_complete
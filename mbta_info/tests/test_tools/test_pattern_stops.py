@@ -0,0 +1,115 @@
+from flaskr import models as mbta_models
+from flaskr.tools.pattern_stops import PatternStopBuilder
+
+
+def add_trip_stop_times(db, trip_id, route_id, service_id, route_pattern_id, times):
+    db.session.add(
+        mbta_models.Trip(
+            trip_id, route_id, service_id, route_pattern_id=route_pattern_id
+        )
+    )
+    for stop_sequence, (stop_id, arrival_time, departure_time) in enumerate(times):
+        db.session.add(
+            mbta_models.StopTime(
+                trip_id,
+                arrival_time,
+                departure_time,
+                stop_id,
+                stop_sequence + 1,
+                feed_version="feed1",
+            )
+        )
+
+
+def test_build(db, feed_info, route_pattern, calendar):
+    """Each pattern stop takes the median offset from the first departure of the pattern's trips"""
+    # GIVEN: three trips of one pattern starting at different times of day
+    for stop_id in ("stop1", "stop2", "stop3"):
+        db.session.add(mbta_models.Stop(stop_id))
+    route_id = route_pattern.route_id
+    service_id = calendar.service_id
+    pattern_id = route_pattern.route_pattern_id
+    add_trip_stop_times(
+        db,
+        "trip1",
+        route_id,
+        service_id,
+        pattern_id,
+        [("stop1", 3600, 3600), ("stop2", 3700, 3730), ("stop3", 3900, 3900)],
+    )
+    add_trip_stop_times(
+        db,
+        "trip2",
+        route_id,
+        service_id,
+        pattern_id,
+        [("stop1", 7200, 7200), ("stop2", 7320, 7320), ("stop3", 7500, 7500)],
+    )
+    add_trip_stop_times(
+        db,
+        "trip3",
+        route_id,
+        service_id,
+        pattern_id,
+        [("stop1", 9000, 9000), ("stop2", 9090, 9100), ("stop3", 9320, 9320)],
+    )
+    db.session.commit()
+
+    # WHEN
+    pattern_stop_count = PatternStopBuilder(db).build()
+
+    # THEN
+    assert pattern_stop_count == 3
+    pattern_stops = (
+        db.session.query(mbta_models.PatternStop)
+        .order_by(mbta_models.PatternStop.stop_sequence)
+        .all()
+    )
+    assert [
+        (
+            pattern_stop.stop_sequence,
+            pattern_stop.stop_id,
+            pattern_stop.arrival_offset,
+            pattern_stop.departure_offset,
+            pattern_stop.trip_count,
+        )
+        for pattern_stop in pattern_stops
+    ] == [(1, "stop1", 0, 0, 3), (2, "stop2", 100, 120, 3), (3, "stop3", 300, 300, 3)]
+    assert all(pattern_stop.route_id == route_id for pattern_stop in pattern_stops)
+
+
+def test_build_replaces_previous(db, feed_info, route_pattern, calendar, stop):
+    """Rebuilding drops pattern stops of patterns that no longer have trips"""
+    # GIVEN
+    add_trip_stop_times(
+        db,
+        "trip1",
+        route_pattern.route_id,
+        calendar.service_id,
+        route_pattern.route_pattern_id,
+        [(stop.stop_id, 0, 0)],
+    )
+    db.session.commit()
+    PatternStopBuilder(db).build()
+    db.session.query(mbta_models.StopTime).delete()
+    db.session.commit()
+
+    # WHEN
+    pattern_stop_count = PatternStopBuilder(db).build()
+
+    # THEN
+    assert pattern_stop_count == 0
+
+
+def test_build_ignores_trips_without_pattern(db, feed_info, trip, stop):
+    # GIVEN
+    db.session.add(
+        mbta_models.StopTime(trip.trip_id, 0, 0, stop.stop_id, 1, feed_version="feed1")
+    )
+    db.session.commit()
+
+    # WHEN
+    pattern_stop_count = PatternStopBuilder(db).build()
+
+    # THEN
+    assert pattern_stop_count == 0
@@ -0,0 +1,61 @@
+from flaskr import models as mbta_models, partitions
+from flaskr.tools import planner_stats
+
+
+def statistics_names(db):
+    return {
+        name for (name,) in db.session.execute("SELECT stxname FROM pg_statistic_ext")
+    }
+
+
+def statistics_target(db, table_name: str, column: str) -> int:
+    return db.session.execute(
+        "SELECT attstattarget FROM pg_attribute "
+        "WHERE attrelid = to_regclass(:table_name) AND attname = :column",
+        {"table_name": table_name, "column": column},
+    ).scalar()
+
+
+def test_statistics_name():
+    assert (
+        planner_stats.statistics_name("stop_time", ("trip_id", "stop_sequence"))
+        == "st_stop_time_trip_id_stop_sequence"
+    )
+    assert len(planner_stats.statistics_name("t" * 80, ("a", "b"))) == 63
+
+
+def test_update(db):
+    # GIVEN
+    statistics = planner_stats.PlannerStatistics(db)
+    statistics.targets = {"trip.route_id": 500}
+
+    # WHEN
+    timings = statistics.update(["trip", "agency"])
+
+    # THEN
+    assert set(timings["trip"]) == {"targets", "extended_statistics", "analyze"}
+    assert set(timings["agency"]) == {"analyze"}
+    assert "st_trip_route_id_direction_id" in statistics_names(db)
+    assert statistics_target(db, "trip", "route_id") == 500
+
+
+def test_update_new_partition(db, feed_info: mbta_models.FeedInfo):
+    """A feed's new partition gets the table's extended statistics and is vacuumed"""
+    # GIVEN
+    table = mbta_models.StopTime.__table__
+    feed_version = feed_info.feed_version
+    partitions.create_staging_table(db, table, feed_version)
+    partitions.attach_staging_table(db, table, feed_version)
+    db.session.close()
+    statistics = planner_stats.PlannerStatistics(db)
+
+    # WHEN
+    timings = statistics.update(["stop_time"], feed_version)
+
+    # THEN
+    assert "vacuum" in timings["stop_time"]
+    partition = partitions.partition_name(table, feed_version)
+    assert {
+        "st_stop_time_trip_id_stop_sequence",
+        planner_stats.statistics_name(partition, ("trip_id", "stop_sequence")),
+    } <= statistics_names(db)
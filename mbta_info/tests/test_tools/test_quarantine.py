@@ -0,0 +1,71 @@
+import json
+
+import marshmallow as mm
+import pytest
+
+from flaskr.tools import quarantine
+
+
+def test_from_config(monkeypatch):
+    # GIVEN
+    config = {"quarantine": {"enabled": False, "max_errors": 5, "path": "rejects"}}
+
+    # WHEN
+    from_config = quarantine.Quarantine.from_config(config)
+    monkeypatch.setenv(quarantine.QUARANTINE_ENV, "1")
+    from_env = quarantine.Quarantine.from_config(config)
+
+    # THEN
+    assert not from_config.enabled
+    assert from_config.max_errors == 5
+    assert from_config.path.name == "rejects"
+    assert from_env.enabled
+
+
+def test_reject_writes_rows(tmp_path, capsys):
+    # GIVEN
+    rejects = quarantine.Quarantine(tmp_path, enabled=True, max_errors=2)
+    rejects.start_table("shape", "Winter 2020")
+
+    # WHEN
+    rejects.reject(
+        3,
+        {"shape_id": "shape1", None: ["extra"]},
+        mm.ValidationError({"shape_pt_lat": ["Not a valid number."]}),
+    )
+    rejects.reject(7, {"shape_id": "shape2"}, KeyError("shape_pt_lon"))
+    rejects.finish_table()
+
+    # THEN
+    reject_path = tmp_path / "Winter_2020" / "shape.rejects.jsonl"
+    lines = [json.loads(line) for line in reject_path.read_text().splitlines()]
+    assert lines == [
+        {
+            "line": 3,
+            "row": {"shape_id": "shape1", "None": ["extra"]},
+            "errors": {"shape_pt_lat": ["Not a valid number."]},
+        },
+        {
+            "line": 7,
+            "row": {"shape_id": "shape2"},
+            "errors": {"_schema": ["Missing column shape_pt_lon"]},
+        },
+    ]
+    assert rejects.counts == {"shape": 2}
+    assert "Quarantined 2 rows of shape" in capsys.readouterr().out
+
+
+def test_reject_over_threshold(tmp_path):
+    # GIVEN
+    rejects = quarantine.Quarantine(tmp_path, enabled=True, max_errors=1)
+    rejects.start_table("stop_time", "feed1")
+    rejects.reject(2, {}, mm.ValidationError("bad"))
+
+    # WHEN / THEN
+    with pytest.raises(quarantine.TooManyRejects) as exc_info:
+        rejects.reject(3, {}, mm.ValidationError("bad"))
+    assert exc_info.value.rejects == 2
+    assert (
+        len((tmp_path / "feed1" / "stop_time.rejects.jsonl").read_text().splitlines())
+        == 2
+    )
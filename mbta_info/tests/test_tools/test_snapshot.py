@@ -0,0 +1,125 @@
+import json
+import pathlib
+
+import numpy as np
+import pytest
+
+from flaskr.tools import snapshot
+
+
+@pytest.fixture
+def strings() -> snapshot.StringTable:
+    return snapshot.StringTable.build(
+        ["stop2", "trip1", "stop1", None, "stop2", "Ünïcode"]
+    )
+
+
+@pytest.fixture
+def snapshot_root(
+    tmp_path: pathlib.Path, strings: snapshot.StringTable
+) -> pathlib.Path:
+    positions = strings.positions()
+    arrays = {
+        "stop_id": np.array([positions["stop1"], positions["stop2"]], dtype=np.int32),
+        "stop_lat": np.array([42.1, np.nan]),
+        "trip_id": np.array([positions["trip1"]], dtype=np.int32),
+        "trip_stop_time_offsets": np.array([0, 2], dtype=np.int64),
+        "stop_time_stop": np.array([1, 0], dtype=np.int32),
+        "stop_time_departure": np.array([3600, 3720], dtype=np.int32),
+    }
+    snapshot.write_snapshot(tmp_path, "Spring 2020, version D", strings, arrays)
+    return tmp_path
+
+
+def test_string_table(strings: snapshot.StringTable):
+    """Strings are de-duplicated, sorted and found by binary search"""
+    assert len(strings) == 4
+    assert [strings[i] for i in range(len(strings))] == [
+        "stop1",
+        "stop2",
+        "trip1",
+        "Ünïcode",
+    ]
+    assert strings.find("trip1") == 2
+    assert strings.find("Ünïcode") == 3
+    assert strings.find("missing") == snapshot.NO_VALUE
+    assert strings.find("") == snapshot.NO_VALUE
+
+
+def test_empty_string_table():
+    strings = snapshot.StringTable.build([])
+
+    assert len(strings) == 0
+    assert strings.find("anything") == snapshot.NO_VALUE
+
+
+def test_write_snapshot(snapshot_root: pathlib.Path):
+    # GIVEN
+    dir_name = snapshot.snapshot_dir_name("Spring 2020, version D")
+
+    # THEN
+    assert dir_name == "Spring_2020_version_D"
+    assert (snapshot_root / snapshot.CURRENT_FILE).read_text() == dir_name
+    manifest = json.loads(
+        (snapshot_root / dir_name / snapshot.MANIFEST_FILE).read_text()
+    )
+    assert manifest["format"] == snapshot.SNAPSHOT_FORMAT
+    assert manifest["feed_version"] == "Spring 2020, version D"
+    assert not list(snapshot_root.glob(".*.tmp"))
+
+
+def test_open_current(snapshot_root: pathlib.Path):
+    # WHEN
+    timetable = snapshot.TimetableSnapshot.open(snapshot_root)
+
+    # THEN
+    assert timetable.feed_version == "Spring 2020, version D"
+    assert isinstance(timetable["stop_id"], np.memmap)
+    assert timetable.row("stop_id", "stop2") == 1
+    assert timetable.row("stop_id", "trip1") == snapshot.NO_VALUE
+    assert timetable.row("stop_id", "missing") == snapshot.NO_VALUE
+    assert np.isnan(timetable["stop_lat"][1])
+
+
+def test_trip_stop_times(snapshot_root: pathlib.Path):
+    # GIVEN
+    timetable = snapshot.TimetableSnapshot.open(
+        snapshot_root, feed_version="Spring 2020, version D"
+    )
+
+    # WHEN
+    stop_times = timetable.trip_stop_times("trip1")
+
+    # THEN
+    assert stop_times["stop_time_departure"].tolist() == [3600, 3720]
+    assert [
+        timetable.strings[timetable["stop_id"][row]]
+        for row in stop_times["stop_time_stop"]
+    ] == ["stop2", "stop1"]
+    with pytest.raises(KeyError):
+        timetable.trip_stop_times("missing")
+
+
+def test_rewrite_replaces_snapshot(
+    snapshot_root: pathlib.Path, strings: snapshot.StringTable
+):
+    # WHEN
+    snapshot.write_snapshot(
+        snapshot_root, "Spring 2020, version D", strings, {"stop_id": np.array([0])}
+    )
+
+    # THEN
+    timetable = snapshot.TimetableSnapshot.open(snapshot_root)
+    assert timetable.manifest["arrays"] == ["stop_id"]
+
+
+def test_open_unsupported_format(snapshot_root: pathlib.Path):
+    # GIVEN
+    manifest_path = snapshot_root / "Spring_2020_version_D" / snapshot.MANIFEST_FILE
+    manifest = json.loads(manifest_path.read_text())
+    manifest["format"] = snapshot.SNAPSHOT_FORMAT + 1
+    manifest_path.write_text(json.dumps(manifest))
+
+    # THEN
+    with pytest.raises(ValueError):
+        snapshot.TimetableSnapshot.open(snapshot_root)
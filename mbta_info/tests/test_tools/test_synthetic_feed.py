@@ -0,0 +1,142 @@
+import csv
+import pathlib
+import typing
+
+import pytest
+
+from flaskr import schema_utils, schemas
+from flaskr.tools import synthetic_feed
+
+FILES = {table_name: f"{table_name}s.txt" for table_name in synthetic_feed.HEADERS}
+SMALL_SCALE = synthetic_feed.FeedScale(
+    routes=4,
+    stops=40,
+    stops_per_route=6,
+    trips_per_route=10,
+    points_per_shape=12,
+    service_days=35,
+)
+
+
+def read_rows(output_dir: pathlib.Path, table_name: str) -> typing.List[typing.Dict]:
+    with open(output_dir / FILES[table_name]) as f_in:
+        return list(csv.DictReader(f_in))
+
+
+@pytest.fixture
+def feed_dir(tmp_path) -> pathlib.Path:
+    synthetic_feed.SyntheticFeed(SMALL_SCALE, seed=1).write(tmp_path, FILES)
+    return tmp_path
+
+
+def test_deterministic(tmp_path, feed_dir):
+    # GIVEN
+    same_seed_dir = tmp_path / "same"
+    other_seed_dir = tmp_path / "other"
+
+    # WHEN
+    synthetic_feed.SyntheticFeed(SMALL_SCALE, seed=1).write(same_seed_dir, FILES)
+    synthetic_feed.SyntheticFeed(SMALL_SCALE, seed=2).write(other_seed_dir, FILES)
+
+    # THEN
+    for file_name in FILES.values():
+        contents = (feed_dir / file_name).read_bytes()
+        assert (same_seed_dir / file_name).read_bytes() == contents
+    assert (other_seed_dir / FILES["stop_time"]).read_bytes() != (
+        feed_dir / FILES["stop_time"]
+    ).read_bytes()
+
+
+def test_scale(feed_dir):
+    # GIVEN / WHEN
+    routes = read_rows(feed_dir, "route")
+    trips = read_rows(feed_dir, "trip")
+    stop_times = read_rows(feed_dir, "stop_time")
+    shapes = read_rows(feed_dir, "shape")
+
+    # THEN
+    assert len(routes) == 4
+    assert len(trips) == 4 * 10
+    assert len(stop_times) == 4 * 10 * 6
+    assert len(shapes) == 4 * 2 * 12
+
+
+def test_referential_integrity(feed_dir):
+    # GIVEN
+    stops = read_rows(feed_dir, "stop")
+    stop_ids = {stop["stop_id"] for stop in stops}
+    route_ids = {route["route_id"] for route in read_rows(feed_dir, "route")}
+    service_ids = {row["service_id"] for row in read_rows(feed_dir, "calendar")}
+    trips = read_rows(feed_dir, "trip")
+    trip_ids = {trip["trip_id"] for trip in trips}
+    shape_ids = {shape["shape_id"] for shape in read_rows(feed_dir, "shape")}
+    pattern_ids = {
+        pattern["route_pattern_id"] for pattern in read_rows(feed_dir, "route_pattern")
+    }
+    checkpoint_ids = {row["checkpoint_id"] for row in read_rows(feed_dir, "checkpoint")}
+
+    # THEN
+    seen_stop_ids = set()
+    for stop in stops:  # Stations are listed before their platforms
+        assert not stop["parent_station"] or stop["parent_station"] in seen_stop_ids
+        seen_stop_ids.add(stop["stop_id"])
+    for trip in trips:
+        assert trip["route_id"] in route_ids
+        assert trip["service_id"] in service_ids
+        assert trip["shape_id"] in shape_ids
+        assert trip["route_pattern_id"] in pattern_ids
+    for stop_time in read_rows(feed_dir, "stop_time"):
+        assert stop_time["trip_id"] in trip_ids
+        assert stop_time["stop_id"] in stop_ids
+        assert (
+            not stop_time["checkpoint_id"]
+            or stop_time["checkpoint_id"] in checkpoint_ids
+        )
+    for row in read_rows(feed_dir, "calendar_date") + read_rows(
+        feed_dir, "calendar_attribute"
+    ):
+        assert row["service_id"] in service_ids
+    for row in read_rows(feed_dir, "direction") + read_rows(feed_dir, "route_pattern"):
+        assert row["route_id"] in route_ids
+    for row in read_rows(feed_dir, "multi_route_trip"):
+        assert row["added_route_id"] in route_ids
+        assert row["trip_id"] in trip_ids
+
+
+@pytest.mark.parametrize(
+    "table_name,schema",
+    [
+        ("agency", schemas.AgencySchema),
+        ("calendar", schemas.CalendarSchema),
+        ("checkpoint", schemas.CheckpointSchema),
+        ("feed_info", schemas.FeedInfoSchema),
+        ("line", schemas.LineSchema),
+        ("linked_dataset", schemas.LinkedDatasetSchema),
+        ("shape", schemas.ShapeSchema),
+    ],
+)
+def test_rows_load(feed_dir, table_name, schema):
+    """Rows of the tables without foreign keys load with their schemas"""
+    for row in read_rows(feed_dir, table_name):
+        assert schema().load(row)
+
+
+def test_stop_times_increase(feed_dir):
+    # GIVEN
+    stop_times = read_rows(feed_dir, "stop_time")
+
+    # WHEN
+    times_by_trip = {}  # type: typing.Dict[str, typing.List[int]]
+    for stop_time in stop_times:
+        times_by_trip.setdefault(stop_time["trip_id"], []).append(
+            schema_utils.time_as_seconds(stop_time["arrival_time"])
+        )
+
+    # THEN
+    for times in times_by_trip.values():
+        assert times == sorted(times)
+
+
+def test_unknown_table(tmp_path):
+    with pytest.raises(ValueError):
+        synthetic_feed.SyntheticFeed(SMALL_SCALE).write(tmp_path, {"geo_stub": "x.txt"})
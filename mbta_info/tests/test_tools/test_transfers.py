@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from flaskr import models as mbta_models
+from flaskr.tools.transfers import (
+    TransferBuilder,
+    TransferGraph,
+    find_neighbours,
+    haversine_distances,
+)
+
+
+@pytest.mark.parametrize(
+    "lon1, lat1, lon2, lat2, expected_meters",
+    [
+        (-71.0, 42.0, -71.0, 42.0, 0.0),
+        (0.0, 0.0, 0.0, 1.0, 111195.08),  # One degree of latitude
+        (-71.0552, 42.3663, -71.0589, 42.3613, 633.66),  # North Station -> Haymarket
+    ],
+)
+def test_haversine_distances(lon1, lat1, lon2, lat2, expected_meters):
+    assert haversine_distances(
+        np.array(lon1), np.array(lat1), np.array(lon2), np.array(lat2)
+    ) == pytest.approx(expected_meters, abs=0.5)
+
+
+def test_haversine_distances_broadcast():
+    """A column of origins against a row of destinations gives a distance matrix"""
+    lons = np.array([0.0, 0.0, 0.0])
+    lats = np.array([0.0, 0.001, 0.002])
+
+    distances = haversine_distances(lons[:, None], lats[:, None], lons, lats)
+
+    assert distances.shape == (3, 3)
+    assert np.allclose(np.diag(distances), 0.0)
+    assert np.allclose(distances, distances.T)
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 256])
+def test_find_neighbours(block_size):
+    """Only distinct pairs within range are returned, nearest first for each origin"""
+    # GIVEN: points roughly 111m apart along a meridian, plus one far away
+    lons = np.array([0.0, 0.0, 0.0, 0.0, 10.0])
+    lats = np.array([0.003, 0.0, 0.001, 0.002, 0.0])
+
+    # WHEN
+    from_idx, to_idx, distances = find_neighbours(
+        lons, lats, max_distance=250, block_size=block_size
+    )
+
+    # THEN
+    edges = sorted(zip(from_idx.tolist(), to_idx.tolist()))
+    assert edges == [
+        (0, 2),
+        (0, 3),
+        (1, 2),
+        (1, 3),
+        (2, 0),
+        (2, 1),
+        (2, 3),
+        (3, 0),
+        (3, 1),
+        (3, 2),
+    ]
+    assert all(distances <= 250)
+    for origin in set(from_idx.tolist()):
+        origin_distances = distances[from_idx == origin]
+        assert np.all(np.diff(origin_distances) >= 0)
+
+
+def test_find_neighbours_no_points():
+    from_idx, to_idx, distances = find_neighbours(np.array([]), np.array([]), 400)
+
+    assert len(from_idx) == len(to_idx) == len(distances) == 0
+
+
+def test_transfer_graph_transfers_from():
+    # GIVEN
+    stop_ids = ["a", "b", "c"]
+    from_idx = np.array([0, 0, 2])
+    to_idx = np.array([2, 1, 0])
+    distances = np.array([10.0, 20.0, 10.0])
+    walk_times = np.array([8, 16, 8])
+
+    # WHEN
+    graph = TransferGraph(stop_ids, from_idx, to_idx, distances, walk_times)
+
+    # THEN
+    assert len(graph) == 3
+    assert graph.offsets.tolist() == [0, 2, 2, 3]
+    assert graph.transfers_from("a") == [("c", 8), ("b", 16)]
+    assert graph.transfers_from("b") == []
+    assert graph.transfers_from("c") == [("a", 8)]
+    assert graph.transfers_from("unknown") == []
+
+
+def test_build(db):
+    """Transfers are stored for nearby stops only and can be reloaded as a graph"""
+    # GIVEN
+    for stop_id, lon, lat in [
+        ("north_station", -71.0552, 42.3663),
+        ("haymarket", -71.0589, 42.3613),
+        ("braintree", -71.0011, 42.2078),
+    ]:
+        db.session.add(mbta_models.Stop(stop_id, stop_lonlat=f"POINT({lon} {lat})"))
+    db.session.add(mbta_models.Stop("no_coordinates"))
+    db.session.commit()
+
+    # WHEN
+    builder = TransferBuilder(db, max_distance=1000, walking_speed=1.0)
+    graph = builder.build()
+
+    # THEN
+    assert db.session.query(mbta_models.WalkingTransfer).count() == 2
+    assert graph.transfers_from("north_station") == [("haymarket", 634)]
+    assert graph.transfers_from("braintree") == []
+    reloaded = builder.load_graph()
+    assert reloaded.transfers_from("haymarket") == [("north_station", 634)]
+
+
+def test_init_explicit_zero_distance(app):
+    # GIVEN / WHEN
+    builder = TransferBuilder(None, max_distance=0)
+
+    # THEN: 0 is taken as given, not as missing
+    assert builder.max_distance == 0
+    assert TransferBuilder(None).max_distance == 400
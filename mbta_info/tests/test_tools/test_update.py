@@ -0,0 +1,86 @@
+from flask import g
+from sqlalchemy import inspect
+
+from flaskr import partitions, models as mbta_models
+from flaskr.tools import synthetic_feed, update
+
+SMALL_SCALE = synthetic_feed.FeedScale(
+    routes=2,
+    stops=12,
+    stops_per_route=4,
+    trips_per_route=3,
+    points_per_shape=5,
+    service_days=7,
+)
+
+
+class SyntheticRetriever:
+    """Retrieves the synthetic feed of the seed it's set to"""
+
+    seed = 1
+
+    def __init__(self, feed_id=None):
+        self.errors = []
+
+    def retrieve_data(self):
+        data_path = g.config["mbta_data"]["path"]
+        files = g.config["mbta_data"]["files"]
+        synthetic_feed.SyntheticFeed(SMALL_SCALE, seed=self.seed).write(
+            data_path, files
+        )
+
+
+def table_names(db):
+    return set(inspect(db.get_engine()).get_table_names())
+
+
+def test_update_loads_new_feed_version(db, tmp_path, monkeypatch):
+    """Each new feed version gets loaded and the partitions of the one before it dropped"""
+    # GIVEN
+    mbta_tables = {
+        key: table
+        for key, table in db.metadata.tables.items()
+        if table.name not in g.config["mbta_data"]["files"]  # The test models' tables
+    }
+    monkeypatch.setattr(db.metadata, "tables", mbta_tables)
+    data_config = dict(g.config["mbta_data"])
+    data_config["path"] = tmp_path / "data"
+    data_config["files"] = {
+        table_name: f"{table_name}s.txt" for table_name in synthetic_feed.HEADERS
+    }
+    monkeypatch.setitem(g.config, "mbta_data", data_config)
+    monkeypatch.setitem(g.config, "import_dir", "flaskr")
+    monkeypatch.setitem(g.config, "snapshot", {"path": tmp_path / "snapshots"})
+    monkeypatch.setattr(update, "Retriever", SyntheticRetriever)
+    stop_time = mbta_models.StopTime.__table__
+    first_version = synthetic_feed.SyntheticFeed(SMALL_SCALE, seed=1).feed_version
+    second_version = synthetic_feed.SyntheticFeed(SMALL_SCALE, seed=2).feed_version
+
+    # WHEN
+    loaded_version = update.update_mbta_data()
+
+    # THEN
+    assert loaded_version == first_version
+    assert partitions.partition_name(stop_time, first_version) in table_names(db)
+
+    # WHEN
+    db.session.close()
+    reloaded_version = update.update_mbta_data()
+
+    # THEN
+    assert reloaded_version is None  # Same version retrieved again
+
+    # WHEN
+    db.session.close()
+    monkeypatch.setattr(SyntheticRetriever, "seed", 2)
+    loaded_version = update.update_mbta_data()
+
+    # THEN
+    assert loaded_version == second_version
+    assert update.loaded_feed_version() == second_version
+    assert partitions.partition_name(stop_time, second_version) in table_names(db)
+    for table in partitions.partitioned_tables():
+        assert partitions.partition_name(table, first_version) not in table_names(db)
+    assert [
+        feed_info.feed_version for feed_info in db.session.query(mbta_models.FeedInfo)
+    ] == [second_version]
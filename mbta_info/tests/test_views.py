@@ -0,0 +1,44 @@
+from flaskr import queries, views, models as mbta_models
+
+
+def test_refresh_materialized_views(db, feed_info, trip: mbta_models.Trip, stop):
+    # GIVEN: a trip visiting a stop twice, so the pair is stored once
+    for stop_sequence in (1, 2):
+        db.session.add(
+            mbta_models.StopTime(
+                trip.trip_id,
+                stop_sequence * 60,
+                stop_sequence * 60,
+                stop.stop_id,
+                stop_sequence,
+                feed_version=feed_info.feed_version,
+            )
+        )
+    db.session.commit()
+    assert queries.get_stop_route_ids(stop.stop_id) == []  # Not refreshed yet
+
+    # WHEN
+    views.refresh_materialized_views(db)
+
+    # THEN
+    assert queries.get_stop_route_ids(stop.stop_id) == [trip.route_id]
+    assert queries.get_route_stop_ids(trip.route_id) == [stop.stop_id]
+
+
+def test_stop_routes_index_only(db, stop):
+    """Routes at a stop are read from the (stop_id, route_id) index without touching the view"""
+    # GIVEN
+    views.refresh_materialized_views(db)
+    db.session.execute("SET enable_seqscan = off")
+
+    # WHEN
+    plan = "\n".join(
+        row[0]
+        for row in db.session.execute(
+            "EXPLAIN SELECT route_id FROM route_stop WHERE stop_id = :stop_id",
+            {"stop_id": stop.stop_id},
+        )
+    )
+
+    # THEN
+    assert "Index Only Scan using ix_route_stop_stop_id_route_id" in plan